@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2015 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Tracks the Python memory allocations made by each OTP generate call, in each
+importable backend, via :mod:`tracemalloc` (Python 3.4+).
+
+Two numbers are reported per call:
+
+* retained: the memory blocks still alive after the call, which should only
+  be the returned OTP.
+* peak: the extra memory (in bytes) that was in use during the call, which
+  includes temporary allocations, such as per-call output buffers. Measuring
+  it needs :func:`tracemalloc.reset_peak` (Python 3.9+); on older versions,
+  it is reported as ``n/a``.
+
+With ``--check``, exits with a non-zero status if a generate call retains
+more than ``--max-blocks`` blocks, or if no backend can be loaded.
+"""
+
+from __future__ import division, print_function
+
+from oath_toolkit.tests.benchmark import (NOW, SECRET, TIME_STEP_SIZE,
+                                          argument_parser, load_backends)
+import sys
+import tracemalloc
+
+
+def parse_args(prog, args):
+    parser = argument_parser(prog, 1000, repeat=None, description=__doc__)
+    parser.add_argument('--check', action='store_true',
+                        help='Fail if a call retains too many blocks')
+    # The returned OTP is one block; the rest of the default allows for the
+    # constant overhead of the measurement loop itself.
+    parser.add_argument('--max-blocks', type=float, default=1.05,
+                        help='Maximum retained blocks per call (with --check)')
+    return parser.parse_args(args)
+
+
+def operations(oath):
+    return [
+        ('hotp_generate',
+         lambda counter: oath.hotp_generate(SECRET, counter, 6, False, -1)),
+        ('totp_generate',
+         lambda counter: oath.totp_generate(SECRET,
+                                            NOW + counter * TIME_STEP_SIZE,
+                                            TIME_STEP_SIZE, 0, 6)),
+    ]
+
+
+def measure(func, number):
+    """
+    Return the number of blocks retained per call, and the peak number of
+    extra bytes in use during a call (:data:`None` if it cannot be measured).
+    """
+    results = [None] * number
+    reset_peak = getattr(tracemalloc, 'reset_peak', None)  # Python 3.9+
+    func(0)  # warm up (lazily allocated buffers, caches, etc.)
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        peak = 0 if reset_peak is not None else None
+        for i in range(number):
+            if reset_peak is None:
+                results[i] = func(i)
+                continue
+            current = tracemalloc.get_traced_memory()[0]
+            reset_peak()
+            results[i] = func(i)
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - current)
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    stats = after.compare_to(before, 'filename')
+    blocks = sum(stat.count_diff for stat in stats)
+    return blocks / number, peak
+
+
+def main(argv):
+    args = parse_args(argv[0], argv[1:])
+    failed = False
+    print('{0:<16} {1:<14} {2:>14} {3:>12}'.format('backend', 'operation',
+                                                   'retained/call',
+                                                   'peak bytes'))
+    backends = load_backends(report=True)
+    for name, oath in backends:
+        for op_name, func in operations(oath):
+            blocks, peak = measure(func, args.number)
+            print('{0:<16} {1:<14} {2:>14.2f} {3:>12}'.format(
+                name, op_name, blocks, 'n/a' if peak is None else peak))
+            if args.check and blocks > args.max_blocks:
+                failed = True
+    if args.check and not backends:
+        print('No backend could be loaded', file=sys.stderr)
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
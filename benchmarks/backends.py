@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2015 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Compares the per-call cost of the OTP operations in each importable backend
+(Cython, CFFI, and pure Python/hashlib).
+"""
+
+from __future__ import division, print_function
+
+from oath_toolkit.tests.benchmark import (NOW, SECRET, TIME_STEP_SIZE,
+                                          argument_parser, load_backends,
+                                          time_per_call)
+import sys
+
+
+def parse_args(prog, args):
+    return argument_parser(prog, 10000, description=__doc__).parse_args(args)
+
+
+def operations(oath):
+    """
+    The benchmarked operations. The OTPs being validated are the last ones in
+    their windows, which is the worst case for a successful validation.
+    """
+    hotp = oath.hotp_generate(SECRET, 20, 6, False, -1)
+    totp = oath.totp_generate(SECRET, NOW + 10 * TIME_STEP_SIZE,
+                              TIME_STEP_SIZE, 0, 6)
+    return [
+        ('hotp_generate',
+         lambda: oath.hotp_generate(SECRET, 0, 6, False, -1)),
+        ('hotp_validate (window=20)',
+         lambda: oath.hotp_validate(SECRET, 0, 20, hotp)),
+        ('totp_generate',
+         lambda: oath.totp_generate(SECRET, NOW, TIME_STEP_SIZE, 0, 6)),
+        ('totp_validate (window=10)',
+         lambda: oath.totp_validate(SECRET, NOW, TIME_STEP_SIZE, 0, 10,
+                                    totp)),
+    ]
+
+
+def measure(func, number, repeat):
+    """Return the best time per call, in microseconds."""
+    return time_per_call(func, number, repeat) * 1e6
+
+
+def main(argv):
+    args = parse_args(argv[0], argv[1:])
+    backends = load_backends(report=True)
+    row = '{0:<28}' + ''.join(' {{{0}:>14}}'.format(i + 1)
+                              for i in range(len(backends)))
+    print(row.format('operation (us/call)', *[name for name, _ in backends]))
+    results = [(name, operations(oath)) for name, oath in backends]
+    for i, (op_name, _) in enumerate(results[0][1] if results else []):
+        timings = ['{0:.2f}'.format(measure(ops[i][1], args.number,
+                                            args.repeat))
+                   for _, ops in results]
+        print(row.format(op_name, *timings))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2015 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Compares the Base32 functions in :mod:`oath_toolkit.base32` with the
+implementations that ``OATH.base32_encode`` and ``OATH.base32_decode`` used
+previously (grouping via :func:`itertools.zip_longest`, and decoding via
+liboath), on a batch of secrets.
+
+``OATH.base32_decode`` still decodes via liboath when the backend provides
+it (see ``decode_many (liboath)``), which is faster than the pure Python
+decoder.
+"""
+
+from __future__ import division, print_function
+
+import base64
+from oath_toolkit.tests.benchmark import (argument_parser, load_backends,
+                                          time_per_call)
+import os
+import sys
+
+SECRET_SIZE = 40
+
+
+def parse_args(prog, args):
+    parser = argument_parser(prog, 10, description=__doc__)
+    parser.add_argument('-c', '--count', type=int, default=1000,
+                        help='Secrets per batch (call)')
+    return parser.parse_args(args)
+
+
+def legacy_encode(data):
+    from oath_toolkit._compat import bytify, zip_longest
+    encoded = base64.b32encode(data)
+    args = [iter(encoded)] * 4
+    encoded = b' '.join([bytify(chunk)
+                         for chunk in zip_longest(fillvalue=None, *args)])
+    return encoded.rstrip(b'=')
+
+
+def legacy_decode(data):
+    data = data.replace(b' ', b'').upper()
+    if len(data) % 8 != 0:
+        data = data.ljust((int(len(data) / 8) + 1) * 8, b'=')
+    return base64.b32decode(data)
+
+
+def load_liboath_decode():
+    for _, oath in load_backends(('cython', 'cffi')):
+        return oath.base32_decode
+
+
+def operations(count):
+    from oath_toolkit import base32
+    data = os.urandom(SECRET_SIZE * count)
+    secrets = [data[i:i + SECRET_SIZE]
+               for i in range(0, len(data), SECRET_SIZE)]
+    readable = base32.encode_many(data, SECRET_SIZE, True)
+    canonical = base32.encode_many(data, SECRET_SIZE)
+    ops = [
+        ('encode (legacy)', lambda: [legacy_encode(s) for s in secrets]),
+        ('encode', lambda: [base32.encode(s, True) for s in secrets]),
+        ('encode_many', lambda: base32.encode_many(secrets,
+                                                   human_readable=True)),
+        ('encode_many (buffer)',
+         lambda: base32.encode_many(data, SECRET_SIZE, True)),
+        ('decode (legacy)', lambda: [legacy_decode(s) for s in readable]),
+        ('decode_many', lambda: base32.decode_many(readable)),
+        ('decode_many (canonical)', lambda: base32.decode_many(canonical)),
+    ]
+    liboath_decode = load_liboath_decode()
+    if liboath_decode is not None:
+        ops.insert(5, ('decode (liboath)',
+                       lambda: [liboath_decode(s) for s in readable]))
+        # What OATH.base32_decode does with a liboath backend.
+        ops.insert(6, ('decode_many (liboath)',
+                       lambda: base32.decode_many(readable, liboath_decode)))
+    return ops
+
+
+def measure(func, number, repeat):
+    """Return the best time per batch, in milliseconds."""
+    return time_per_call(func, number, repeat) * 1e3
+
+
+def main(argv):
+    args = parse_args(argv[0], argv[1:])
+    print('{0:<28} {1:>14}'.format('base32 (ms/batch)', args.count))
+    for name, func in operations(args.count):
+        print('{0:<28} {1:>14.3f}'.format(
+            name, measure(func, args.number, args.repeat)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2015 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Compares the per-call overhead of the CFFI API mode (compiled) and ABI mode
+(``dlopen``) bindings for liboath.
+
+The API mode extension module must have been built beforehand, e.g. via
+``python setup.py build_ext --inplace``.
+"""
+
+from __future__ import division, print_function
+
+from cffi import FFI
+from oath_toolkit._cffi_build import declarations
+from oath_toolkit.tests.benchmark import (DIGITS, SECRET, argument_parser,
+                                          time_per_call)
+import os
+import sys
+
+OTP = b'755224'
+
+
+def parse_args(prog, args):
+    return argument_parser(prog, 100000, description=__doc__).parse_args(args)
+
+
+def load_abi():
+    ffi = FFI()
+    ffi.cdef(declarations)
+    try:
+        return ffi, ffi.dlopen(os.environ.get('LIBOATH_NAME', 'oath'))
+    except OSError:
+        return None, None
+
+
+def load_api():
+    try:
+        from oath_toolkit._oath_cffi import ffi, lib
+    except ImportError:
+        return None, None
+    return ffi, lib
+
+
+def operations(ffi, lib):
+    output = ffi.new('char[]', DIGITS + 1)
+    secret_length = len(SECRET)
+    return [
+        ('oath_check_version', lambda: lib.oath_check_version(b'0')),
+        ('oath_hotp_generate',
+         lambda: lib.oath_hotp_generate(SECRET, secret_length, 0, DIGITS,
+                                        False, 2 ** 32 - 1, output)),
+        ('oath_hotp_validate',
+         lambda: lib.oath_hotp_validate(SECRET, secret_length, 0, 0, OTP)),
+    ]
+
+
+def measure(func, number, repeat):
+    """Return the best time per call, in nanoseconds."""
+    return time_per_call(func, number, repeat) * 1e9
+
+
+def main(argv):
+    args = parse_args(argv[0], argv[1:])
+    results = {}
+    names = []
+    for mode, (ffi, lib) in [('abi', load_abi()), ('api', load_api())]:
+        if lib is None:
+            print('{0}: not available'.format(mode), file=sys.stderr)
+            continue
+        for name, func in operations(ffi, lib):
+            if name not in names:
+                names.append(name)
+            results[(mode, name)] = measure(func, args.number, args.repeat)
+    row = '{0:<20} {1:>12} {2:>12} {3:>8}'
+    print(row.format('call', 'abi (ns)', 'api (ns)', 'speedup'))
+    for name in names:
+        abi = results.get(('abi', name))
+        api = results.get(('api', name))
+        print(row.format(name,
+                         '{0:.0f}'.format(abi) if abi else '-',
+                         '{0:.0f}'.format(api) if api else '-',
+                         '{0:.2f}x'.format(abi / api) if abi and api else '-'))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2015 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Compares the pure Python backend with and without the key schedule cache
+(:func:`oath_toolkit.cache.enable_key_schedule_cache`), for a set of secrets
+that all fit in the cache. Only :mod:`oath_toolkit.impl_hashlib` uses it.
+"""
+
+from __future__ import division, print_function
+
+from oath_toolkit.tests.benchmark import argument_parser, time_per_call
+import os
+import sys
+
+SECRET_SIZE = 20
+
+
+def parse_args(prog, args):
+    parser = argument_parser(prog, 20, description=__doc__)
+    parser.add_argument('-s', '--secrets', type=int, default=100,
+                        help='Distinct secrets')
+    parser.add_argument('-w', '--window', type=int, default=1,
+                        help='HOTP validation window')
+    return parser.parse_args(args)
+
+
+def operations(secrets, window):
+    from oath_toolkit import impl_hashlib
+    # The OTPs at the end of the window, the worst case for validation.
+    otps = [impl_hashlib.hotp_generate(s, window, 6) for s in secrets]
+    pairs = list(zip(secrets, otps))
+    return [
+        ('hotp_generate',
+         lambda: [impl_hashlib.hotp_generate(s, 1, 6) for s in secrets]),
+        ('hotp_validate',
+         lambda: [impl_hashlib.hotp_validate(s, 0, window, otp)
+                  for s, otp in pairs]),
+    ]
+
+
+def measure(func, number, repeat):
+    """Return the best time per round, in milliseconds."""
+    return time_per_call(func, number, repeat) * 1e3
+
+
+def main(argv):
+    from oath_toolkit import cache
+    args = parse_args(argv[0], argv[1:])
+    secrets = [os.urandom(SECRET_SIZE) for _ in range(args.secrets)]
+    print('{0:<16} {1:>12} {2:>12} {3:>8}'.format(
+        'ms/round', 'uncached', 'cached', 'speedup'))
+    for name, func in operations(secrets, args.window):
+        cache.disable_key_schedule_cache()
+        uncached = measure(func, args.number, args.repeat)
+        cache.enable_key_schedule_cache(max(args.secrets, 1))
+        cached = measure(func, args.number, args.repeat)
+        cache.disable_key_schedule_cache()
+        print('{0:<16} {1:>12.3f} {2:>12.3f} {3:>7.2f}x'.format(
+            name, uncached, cached, uncached / cached))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2015 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Compares the cost of rejecting an invalid OTP via the raising validation
+functions (``*_validate``, which build and raise an :class:`OATHError`) and
+the non-raising ones (``try_*_validate``, which return an error code), in
+each importable backend.
+"""
+
+from __future__ import division, print_function
+
+from oath_toolkit.tests.benchmark import (INVALID_OTP, NOW, SECRET,
+                                          TIME_STEP_SIZE, rejecting,
+                                          argument_parser, load_backends,
+                                          time_per_call)
+import sys
+
+
+def parse_args(prog, args):
+    parser = argument_parser(prog, 10000, description=__doc__)
+    parser.add_argument('-w', '--window', type=int, default=1,
+                        help='Validation window')
+    return parser.parse_args(args)
+
+
+def operations(oath, window):
+    return [
+        ('hotp_validate', rejecting(
+            lambda: oath.hotp_validate(SECRET, 0, window, INVALID_OTP))),
+        ('try_hotp_validate',
+         lambda: oath.try_hotp_validate(SECRET, 0, window, INVALID_OTP)),
+        ('totp_validate', rejecting(
+            lambda: oath.totp_validate(SECRET, NOW, TIME_STEP_SIZE, 0, window,
+                                       INVALID_OTP))),
+        ('try_totp_validate',
+         lambda: oath.try_totp_validate(SECRET, NOW, TIME_STEP_SIZE, 0,
+                                        window, INVALID_OTP)),
+    ]
+
+
+def measure(func, number, repeat):
+    """Return the best time per call, in microseconds."""
+    return time_per_call(func, number, repeat) * 1e6
+
+
+def main(argv):
+    args = parse_args(argv[0], argv[1:])
+    backends = load_backends(report=True)
+    row = '{0:<28}' + ''.join(' {{{0}:>14}}'.format(i + 1)
+                              for i in range(len(backends)))
+    print(row.format('rejection (us/call)', *[name for name, _ in backends]))
+    results = [(name, operations(oath, args.window))
+               for name, oath in backends]
+    for i, (op_name, _) in enumerate(results[0][1] if results else []):
+        timings = ['{0:.2f}'.format(measure(ops[i][1], args.number,
+                                            args.repeat))
+                   for _, ops in results]
+        print(row.format(op_name, *timings))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2015 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Measures how TOTP validation throughput scales with the number of threads.
+
+When the backend releases the GIL around liboath calls, throughput should
+grow roughly linearly with the thread count, up to the number of cores.
+"""
+
+from __future__ import division, print_function
+
+import argparse
+from multiprocessing import cpu_count
+from oath_toolkit import OATH
+from oath_toolkit.tests.benchmark import NOW, SECRET, TIME_STEP_SIZE
+import sys
+import threading
+import time
+
+START_OFFSET = 0
+
+
+def parse_args(prog, args):
+    parser = argparse.ArgumentParser(prog, description=__doc__)
+    parser.add_argument('-n', '--iterations', type=int, default=20000,
+                        help='Validations performed by each thread')
+    parser.add_argument('-w', '--window', type=int, default=10,
+                        help='TOTP validation window')
+    parser.add_argument('-t', '--max-threads', type=int, default=cpu_count(),
+                        help='Maximum number of threads to run')
+    return parser.parse_args(args)
+
+
+def worker(oath, iterations, window, otp):
+    for _ in range(iterations):
+        oath.totp_validate(SECRET, NOW, TIME_STEP_SIZE, START_OFFSET, window,
+                           otp)
+
+
+def run(oath, num_threads, iterations, window, otp):
+    threads = [threading.Thread(target=worker,
+                                args=(oath, iterations, window, otp))
+               for _ in range(num_threads)]
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return (num_threads * iterations) / (time.time() - start)
+
+
+def main(argv):
+    args = parse_args(argv[0], argv[1:])
+    oath = OATH()
+    # The last OTP in the window, so that every validation does the most work.
+    otp = oath.totp_generate(SECRET, NOW + args.window * TIME_STEP_SIZE,
+                             TIME_STEP_SIZE, START_OFFSET, 8)
+    baseline = None
+    num_threads = 1
+    while num_threads <= args.max_threads:
+        rate = run(oath, num_threads, args.iterations, args.window, otp)
+        if baseline is None:
+            baseline = rate
+        print('{0:>3} thread(s): {1:>12.1f} validations/s ({2:.2f}x)'.format(
+            num_threads, rate, rate / baseline))
+        num_threads *= 2
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2015 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Compares TOTP validation via the TOTP window cache
+(:func:`oath_toolkit.cache.enable_totp_window_cache`) with the uncached
+backend call, for each importable backend. A miss is the first validation in
+a time step (the cache is cleared before each call, which is included in the
+timing); a hit is a repeated validation within the same time step.
+
+On a miss, the cache generates the OTPs in the window one at a time until it
+finds a match. The pure Python backend keys the HMAC once per uncached
+validation, but once per generated OTP, so its misses are cheaper with the
+key schedule cache enabled as well (``--key-schedule-cache``).
+"""
+
+from __future__ import division, print_function
+
+from oath_toolkit.tests.benchmark import (NOW, SECRET, TIME_STEP_SIZE,
+                                          argument_parser, load_backends,
+                                          time_per_call)
+import sys
+
+
+def parse_args(prog, args):
+    parser = argument_parser(prog, 2000, description=__doc__)
+    parser.add_argument('-w', '--window', type=int, default=10,
+                        help='TOTP validation window')
+    parser.add_argument('-k', '--key-schedule-cache', action='store_true',
+                        help='Enable the key schedule cache')
+    return parser.parse_args(args)
+
+
+def otps(oath, window):
+    """The OTPs being validated: nearest, farthest, and not in the window."""
+    def at(relative):
+        return oath.totp_generate(SECRET, NOW + relative * TIME_STEP_SIZE,
+                                  TIME_STEP_SIZE, 0, 6)
+    return [
+        ('current step', at(0)),
+        ('window edge', at(-window)),
+        ('invalid', b'000000' if b'000000' not in
+         [at(r) for r in range(-window, window + 1)] else b'999999'),
+    ]
+
+
+def operations(oath, window_cache, window, otp):
+    def uncached():
+        return oath.try_totp_validate(SECRET, NOW, TIME_STEP_SIZE, 0, window,
+                                      otp)
+
+    def cached():
+        return window_cache.try_validate(oath, SECRET, NOW, TIME_STEP_SIZE, 0,
+                                         window, otp)
+
+    def miss():
+        window_cache.clear()
+        return cached()
+
+    return [('uncached', uncached), ('miss', miss), ('hit', cached)]
+
+
+def measure(func, number, repeat):
+    """Return the best time per call, in microseconds."""
+    return time_per_call(func, number, repeat) * 1e6
+
+
+def main(argv):
+    from oath_toolkit import cache
+    args = parse_args(argv[0], argv[1:])
+    window_cache = cache.TOTPWindowCache()
+    if args.key_schedule_cache:
+        cache.enable_key_schedule_cache()
+    print('{0:<28} {1:>12} {2:>12} {3:>12}'.format(
+        'us/call (window={0})'.format(args.window), 'uncached', 'miss',
+        'hit'))
+    for name, oath in load_backends(report=True):
+        for label, otp in otps(oath, args.window):
+            window_cache.clear()
+            times = [measure(func, args.number, args.repeat)
+                     for _, func in operations(oath, window_cache,
+                                               args.window, otp)]
+            print('{0:<28} {1:>12.2f} {2:>12.2f} {3:>12.2f}'.format(
+                '{0}: {1}'.format(name, label), *times))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -32,16 +32,15 @@ When compared to the :class:`HOTP`/:class:`TOTP` classes:
 """
 
 from abc import ABCMeta
-import base64
+from array import array
 import hashlib
-import os
-if not os.environ.get('READTHEDOCS') and not os.environ.get('SETUP_PY'):
-    try:  # pragma: no cover
-        from . import impl_cython as oath
-    except ImportError:  # pragma: no cover
-        from . import impl_cffi as oath
-from .exc import OATHError
+from . import base32, cache
+from ._compat import compare_digest, integer_types
+from .backend import BACKENDS, get_backend, oath, set_backend  # noqa
+from .capabilities import version_info
+from .exc import OATH_INVALID_DIGITS, OATH_INVALID_OTP, OATHError
 from .metadata import DESCRIPTION, VERSION
+from .types import OTPPosition
 
 __description__ = DESCRIPTION
 __version__ = VERSION
@@ -53,6 +52,117 @@ OTP_ALGORITHMS = (
 )
 
 
+def _try_hotp_validate(secret, start_moving_factor, window, otp):
+    """
+    Validate a HOTP without raising an exception, via the HOTP look-ahead
+    cache, if it is enabled, or the backend.
+    """
+    lookahead_cache = cache.hotp_lookahead_cache
+    if lookahead_cache is not None:
+        return lookahead_cache.try_validate(oath, secret, start_moving_factor,
+                                            window, otp)
+    return oath.try_hotp_validate(secret, start_moving_factor, window, otp)
+
+
+def _hotp_validate(secret, start_moving_factor, window, otp):
+    """
+    Validate a HOTP like :func:`_try_hotp_validate`, raising an
+    :class:`OATHError` if it is invalid.
+    """
+    retval = _try_hotp_validate(secret, start_moving_factor, window, otp)
+    if retval < 0:
+        err = OATHError(oath.strerror(retval))
+        err.code = retval
+        raise err
+    return OTPPosition(absolute=None, relative=retval)
+
+
+def _matches_step(secret, now, time_step_size, start_offset, otp, relative):
+    """
+    Determine whether a TOTP is the one ``relative`` time steps away from
+    ``now``, at the cost of a single OTP generation.
+    """
+    if time_step_size <= 0:
+        time_step_size = 30
+    if not isinstance(now, integer_types):
+        now = int(now)
+    if (now - start_offset) // time_step_size + relative < 0:
+        return False
+    expected = oath.totp_generate(secret, now + relative * time_step_size,
+                                  time_step_size, start_offset, len(otp))
+    return compare_digest(expected, otp)
+
+
+def _search_nearest_first(secret, now, time_step_size, start_offset,
+                          past_window, future_window, otp):
+    """
+    Search for a TOTP in an asymmetric window, testing the time steps in
+    order of distance from ``now``, past before future (``0``, ``-1``, ``+1``,
+    ``-2``, etc.).
+    """
+    if not 6 <= len(otp) <= 8:
+        return OATH_INVALID_DIGITS, 0
+    for position in range(max(past_window, future_window) + 1):
+        for relative in (-position, position) if position else (0,):
+            if -past_window <= relative <= future_window and \
+                    _matches_step(secret, now, time_step_size, start_offset,
+                                  otp, relative):
+                return position, relative
+    return OATH_INVALID_OTP, 0
+
+
+def _try_totp_validate(secret, now, time_step_size, start_offset, window,
+                       otp, drift=0, past_window=None, future_window=None):
+    """
+    Validate a TOTP without raising an exception.
+
+    If the device is known to drift, the expected time step is tried first,
+    and the whole window is only searched if it does not match. Asymmetric
+    windows (and all windows, if liboath lacks ``oath_totp_validate2``) are
+    searched nearest-first, other windows via the TOTP window cache, if it is
+    enabled, or the backend.
+    """
+    if time_step_size is None:
+        time_step_size = -1
+    nearest_first = past_window is not None or future_window is not None or \
+        not oath.capabilities.totp_validate2
+    if past_window is None:
+        past_window = window
+    if future_window is None:
+        future_window = window
+    window_cache = cache.totp_window_cache
+    if window_cache is not None and not nearest_first:
+        return window_cache.try_validate(oath, secret, now, time_step_size,
+                                         start_offset, window, otp)
+    if drift and -past_window <= drift <= future_window and \
+            6 <= len(otp) <= 8 and \
+            _matches_step(secret, now, time_step_size, start_offset, otp,
+                          drift):
+        return abs(drift), drift
+    if nearest_first:
+        return _search_nearest_first(secret, now, time_step_size,
+                                     start_offset, past_window, future_window,
+                                     otp)
+    return oath.try_totp_validate(secret, now, time_step_size, start_offset,
+                                  window, otp)
+
+
+def _totp_validate(secret, now, time_step_size, start_offset, window, otp,
+                   drift=0, past_window=None, future_window=None):
+    """
+    Validate a TOTP like :func:`_try_totp_validate`, raising an
+    :class:`OATHError` if it is invalid.
+    """
+    retval, otp_pos = _try_totp_validate(secret, now, time_step_size,
+                                         start_offset, window, otp, drift,
+                                         past_window, future_window)
+    if retval < 0:
+        err = OATHError(oath.strerror(retval))
+        err.code = retval
+        raise err
+    return OTPPosition(absolute=retval, relative=otp_pos)
+
+
 class OTP(object):
 
     """Base class for one-time password (OTP) implementations."""
@@ -127,7 +237,7 @@ class HOTP(OTP):
         :rtype: :func:`int`
         :raise: :class:`OATHError` if invalid
         """
-        return oath.hotp_validate(self.key, counter, window, hotp)
+        return _hotp_validate(self.key, counter, window, hotp)
 
 
 class TOTP(OTP):
@@ -166,7 +276,8 @@ class TOTP(OTP):
         return oath.totp_generate(self.key, time, self.time_step, 0,
                                   self.length)
 
-    def verify(self, totp, time, window=0):
+    def verify(self, totp, time, window=0, drift=0, past_window=None,
+               future_window=None):
         """
         Verify that the given one-time password is within the range of
         generated OTPs, given ``counter`` and ``window``.
@@ -176,13 +287,20 @@ class TOTP(OTP):
         :type time: :func:`int` or :func:`long`
         :param int window: The number of OTPs before and after the start OTP
                            to test.
+        :param int drift: The expected relative position of the OTP (usually
+                          the one from the previous verification), which is
+                          tested first.
+        :param int past_window: If set, the number of OTPs before the start
+                                OTP to test, instead of ``window``.
+        :param int future_window: If set, the number of OTPs after the start
+                                  OTP to test, instead of ``window``.
         :return: The position in the OTP window, where ``0`` is the first
                  position.
         :rtype: :func:`int`
         :raise: :class:`OATHError` if invalid
         """
-        return oath.totp_validate(self.key, time, self.time_step, 0, window,
-                                  totp)
+        return _totp_validate(self.key, time, self.time_step, 0, window, totp,
+                              drift, past_window, future_window)
 
 
 class OATH(object):
@@ -200,36 +318,45 @@ class OATH(object):
 
         :rtype: :func:`bytes`
         """
-        return oath.library_version
+        return oath.capabilities.version
+
+    @property
+    def capabilities(self):
+        """
+        The features supported by the backend in use.
+
+        :rtype: :class:`oath_toolkit.types.Capabilities`
+        """
+        return oath.capabilities
 
     def check_library_version(self, version):
         """
         Determine whether the library version is greater than or equal to the
         specified version.
 
+        The library version is only parsed once, when the backend is probed.
+
         :param bytes version: The dotted version number to check
         :rtype: :func:`bool`
         """
-        return oath.check_library_version(version)
+        return oath.capabilities.version_info >= version_info(version)
 
-    @staticmethod
-    def _chunk_iterable(iterable, n, fillvalue=None):
+    def strerror(self, code):
         """
-        Collect data into fixed-length chunks or blocks.
+        Retrieve the error message for a liboath return code (``oath_rc``),
+        such as the ``code`` attribute of an :class:`OATHError`.
 
-        >>> list(OATH._chunk_iterable('ABCDEFG', 3, 'x'))
-        ['ABC', 'DEF', 'Gxx']
-
-        Copied from the Python documentation in the itertools module.
+        :param int code: The return code.
+        :rtype: :func:`bytes`
         """
-        from ._compat import zip_longest
-        args = [iter(iterable)] * n
-        return zip_longest(fillvalue=fillvalue, *args)
+        return oath.strerror(code)
 
     def base32_encode(self, data, human_readable=False):
         """
         Base32-encode data.
 
+        See also :func:`oath_toolkit.base32.encode_many`.
+
         :param data: The data to be encoded. Must be castable into a
                      :func:`bytes` object.
         :param bool human_readable: If :data:`True`, transforms the Base32
@@ -237,40 +364,26 @@ class OATH(object):
                                     characters, removing trailing ``=``.
         :rtype: bytes
         """
-        from ._compat import bytify, to_bytes
-        if not data:
-            return b''
-        encoded = base64.b32encode(to_bytes(data))
-        if human_readable:
-            chunked_iterable = self._chunk_iterable(encoded, 4)
-            encoded = b' '.join([bytify(chunk)
-                                 for chunk in chunked_iterable])
-            encoded = encoded.rstrip(b'=')
-        return encoded
+        return base32.encode(data, human_readable)
 
     def _py_base32_decode(self, data):
-        data = data.replace(b' ', b'').upper()
-        if len(data) % 8 != 0:
-            data = data.ljust((int(len(data) / 8) + 1) * 8, b'=')
-        return base64.b32decode(data)
+        return base32.decode(data)
 
     def base32_decode(self, data):
         """
         Decode Base32 data. Unlike :func:`base64.b32decode`, it handles
         human-readable Base32 strings.
 
+        Uses liboath's decoder, if the backend provides it, otherwise
+        :func:`oath_toolkit.base32.decode`.
+
         :param bytes data: The data to be decoded.
         :rtype: bytes
+        :raise: :class:`OATHError` if the data is not valid Base32
         """
-        if not data:
-            raise OATHError('Invalid base32 string')
-        elif not (data.isupper() or data.islower()):
-            raise OATHError(
-                'Base32 string cannot be both upper- and lowercased')
-        if self.check_library_version(b'2.0.0'):  # pragma: no cover
-            return oath.base32_decode(data)
-        else:  # pragma: no cover
-            return self._py_base32_decode(data)
+        if oath.capabilities.base32_decode:
+            return base32.decode(data, oath.base32_decode)
+        return base32.decode(data)
 
     def hotp_generate(self, secret, moving_factor, digits, add_checksum=False,
                       truncation_offset=-1):
@@ -313,7 +426,30 @@ class OATH(object):
         :rtype: int
         :raise: :class:`OATHError` if invalid
         """
-        return oath.hotp_validate(secret, start_moving_factor, window, otp)
+        return _hotp_validate(secret, start_moving_factor, window, otp)
+
+    def try_hotp_validate(self, secret, start_moving_factor, window, otp):
+        """
+        Validate a one-time password generated using the HOTP algorithm
+        (:rfc:`4226`).
+
+        Unlike :meth:`hotp_validate`, an invalid OTP does not raise an
+        exception, which is cheaper when most OTPs are expected to be
+        rejected (e.g., during a brute force attack).
+
+        :param bytes secret: The secret used to generate the one-time password.
+        :param int start_moving_factor: Unsigned, can be :func:`long`, in
+                                        theory. The start counter in the
+                                        OTP stream.
+        :param int window: The number of OTPs after the start offset OTP
+                           to test.
+        :param bytes otp: The one-time password to validate.
+        :return: The position in the OTP window, where ``0`` is the first
+                 position, or a negative ``oath_rc`` error code (see
+                 :meth:`strerror`) if it is invalid.
+        :rtype: int
+        """
+        return _try_hotp_validate(secret, start_moving_factor, window, otp)
 
     def totp_generate(self, secret, now, time_step_size, time_offset, digits):
         """
@@ -335,7 +471,7 @@ class OATH(object):
                                   digits)
 
     def totp_validate(self, secret, now, time_step_size, start_offset, window,
-                      otp):
+                      otp, drift=0, past_window=None, future_window=None):
         """
         Validate a one-time password generated using the TOTP algorithm
         (:rfc:`6238`).
@@ -350,10 +486,103 @@ class OATH(object):
         :param int window: The number of OTPs before and after the start OTP
                            to test.
         :param bytes otp: The one-time password to validate.
+        :param int drift: The expected relative position of the OTP (usually
+                          the one from the previous validation for the same
+                          device). If it is within the window, it is tested
+                          first, so a device with a stable clock costs a
+                          single OTP generation. The window is still centered
+                          on ``now``.
+        :param int past_window: If set, the number of OTPs before the start
+                                OTP to test, instead of ``window``.
+        :param int future_window: If set, the number of OTPs after the start
+                                  OTP to test, instead of ``window``.
+
+        If either ``past_window`` or ``future_window`` is set, the OTPs are
+        tested in order of distance from the start OTP, past before future
+        (``0``, ``-1``, ``+1``, ``-2``, etc.), instead of the order used by
+        liboath (``0``, ``+1``, ``-1``, etc.), stopping at the first match.
+
         :return: The absolute and relative positions in the OTP window, where
                  ``0`` is the first position.
         :rtype: :class:`oath_toolkit.types.OTPPosition`
         :raise: :class:`OATHError` if invalid
         """
-        return oath.totp_validate(secret, now, time_step_size, start_offset,
-                                  window, otp)
+        return _totp_validate(secret, now, time_step_size, start_offset,
+                              window, otp, drift, past_window, future_window)
+
+    def try_totp_validate(self, secret, now, time_step_size, start_offset,
+                          window, otp, drift=0, past_window=None,
+                          future_window=None):
+        """
+        Validate a one-time password generated using the TOTP algorithm
+        (:rfc:`6238`).
+
+        Unlike :meth:`totp_validate`, an invalid OTP does not raise an
+        exception, which is cheaper when most OTPs are expected to be
+        rejected (e.g., during a brute force attack).
+
+        :param bytes secret: The secret used to generate the one-time password.
+        :param int now: The UNIX timestamp (usually the current one)
+        :param time_step_size: Unsigned, the time step system parameter. If
+                               set to :data:`None`, defaults to ``30``.
+        :type time_step_size: :func:`int` or :data:`None`
+        :param int start_offset: The UNIX timestamp of when to start counting
+                                 time steps (usually should be ``0``).
+        :param int window: The number of OTPs before and after the start OTP
+                           to test.
+        :param bytes otp: The one-time password to validate.
+        :param int drift: The expected relative position of the OTP, as in
+                          :meth:`totp_validate`.
+        :param int past_window: If set, the number of OTPs before the start
+                                OTP to test, as in :meth:`totp_validate`.
+        :param int future_window: If set, the number of OTPs after the start
+                                  OTP to test, as in :meth:`totp_validate`.
+        :return: The absolute position in the OTP window (or a negative
+                 ``oath_rc`` error code, see :meth:`strerror`, if it is
+                 invalid), and the relative position.
+        :rtype: :func:`tuple`
+        """
+        return _try_totp_validate(secret, now, time_step_size, start_offset,
+                                  window, otp, drift, past_window,
+                                  future_window)
+
+    def totp_validate_many(self, secrets, otps, now, time_step_size,
+                           start_offset, window):
+        """
+        Validate a batch of one-time passwords generated using the TOTP
+        algorithm (:rfc:`6238`), in a single call to the backend.
+
+        Unlike :meth:`totp_validate`, an invalid OTP does not raise an
+        exception, which makes it suitable for draining a queue of pending
+        verifications.
+
+        :param secrets: The secrets used to generate the one-time passwords.
+        :type secrets: sequence of :func:`bytes`
+        :param otps: The one-time passwords to validate, in the same order as
+                     ``secrets``.
+        :type otps: sequence of :func:`bytes`
+        :param int now: The UNIX timestamp (usually the current one)
+        :param time_step_size: Unsigned, the time step system parameter. If
+                               set to :data:`None`, defaults to ``30``.
+        :type time_step_size: :func:`int` or :data:`None`
+        :param int start_offset: The UNIX timestamp of when to start counting
+                                 time steps (usually should be ``0``).
+        :param int window: The number of OTPs before and after the start OTP
+                           to test.
+        :return: For each OTP, the absolute position in the OTP window, or a
+                 negative ``oath_rc`` error code if it is invalid.
+        :rtype: :class:`array.array` of type ``i``
+        :raise: :class:`ValueError` if ``secrets`` and ``otps`` differ in
+                length
+        """
+        if time_step_size is None:
+            time_step_size = -1
+        if not oath.capabilities.totp_validate2:
+            if len(secrets) != len(otps):
+                raise ValueError('secrets and otps must have the same length')
+            return array('i', [_try_totp_validate(secret, now, time_step_size,
+                                                  start_offset, window,
+                                                  otp)[0]
+                               for secret, otp in zip(secrets, otps)])
+        return oath.totp_validate_many(secrets, otps, now, time_step_size,
+                                       start_offset, window)
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2015 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+CFFI_ declarations for OATH Toolkit, and the build script for the
+out-of-line (API mode) extension module used by :mod:`oath_toolkit.impl_cffi`.
+
+The declarations are shared with the ABI mode fallback, so they must not use
+any API mode-only syntax (e.g., ``...``).
+
+The extension module is compiled by ``python setup.py build_ext``.
+
+.. _CFFI: http://cffi.readthedocs.org/
+"""
+
+from cffi import FFI
+
+MODULE_NAME = 'oath_toolkit._oath_cffi'
+
+declarations = '''
+typedef _Bool bool;
+/* cffi doesn't know about time_t */
+typedef unsigned long long time_t;
+
+/* defines */
+static char *const OATH_VERSION;
+static time_t const OATH_TOTP_DEFAULT_START_TIME;
+static const int OATH_TOTP_DEFAULT_TIME_STEP_SIZE;
+
+typedef enum {
+  OATH_OK = 0,
+  OATH_CRYPTO_ERROR = -1,
+  OATH_INVALID_DIGITS = -2,
+  OATH_PRINTF_ERROR = -3,
+  OATH_INVALID_HEX = -4,
+  OATH_TOO_SMALL_BUFFER = -5,
+  OATH_INVALID_OTP = -6,
+  OATH_REPLAYED_OTP = -7,
+  OATH_BAD_PASSWORD = -8,
+  OATH_INVALID_COUNTER = -9,
+  OATH_INVALID_TIMESTAMP = -10,
+  OATH_NO_SUCH_FILE = -11,
+  OATH_UNKNOWN_USER = -12,
+  OATH_FILE_SEEK_ERROR = -13,
+  OATH_FILE_CREATE_ERROR = -14,
+  OATH_FILE_LOCK_ERROR = -15,
+  OATH_FILE_RENAME_ERROR = -16,
+  OATH_FILE_UNLINK_ERROR = -17,
+  OATH_TIME_ERROR = -18,
+  OATH_STRCMP_ERROR = -19,
+  OATH_INVALID_BASE32 = -20,
+  OATH_BASE32_OVERFLOW = -21,
+  OATH_MALLOC_ERROR = -22,
+  OATH_FILE_FLUSH_ERROR = -23,
+  OATH_FILE_SYNC_ERROR = -24,
+  OATH_FILE_CLOSE_ERROR = -25,
+  /* When adding anything here, update OATH_LAST_ERROR, errors.c
+     and tests/tst_errors.c. */
+  OATH_LAST_ERROR = -25
+} oath_rc;
+
+/* from oath-toolkit */
+const char * oath_strerror               (oath_rc err);
+const char * oath_strerror_name          (oath_rc err);
+
+/* for some reason, need to keep the following function in,
+ * or it segfaults.
+ */
+oath_rc      oath_init                   (void);
+oath_rc      oath_done                   (void);
+const char * oath_check_version          (const char *req_version);
+int          oath_base32_decode          (const char *in,
+                                          size_t inlen,
+                                          char **out,
+                                          size_t *outlen);
+oath_rc      oath_hotp_generate          (const char *secret,
+                                          size_t secret_length,
+                                          uint64_t moving_factor,
+                                          unsigned  digits,
+                                          bool add_checksum,
+                                          size_t truncation_offset,
+                                          char *output_otp);
+oath_rc      oath_hotp_validate          (const char *secret,
+                                          size_t secret_length,
+                                          uint64_t start_moving_factor,
+                                          size_t window,
+                                          const char *otp);
+oath_rc      oath_totp_generate          (const char *secret,
+                                          size_t secret_length,
+                                          time_t now,
+                                          unsigned  time_step_size,
+                                          time_t start_offset,
+                                          unsigned  digits,
+                                          char *output_otp);
+oath_rc      oath_totp_validate2         (const char *secret,
+                                          size_t secret_length,
+                                          time_t now,
+                                          unsigned  time_step_size,
+                                          time_t start_offset,
+                                          size_t window,
+                                          int *otp_pos,
+                                          const char *otp);
+'''
+
+
+def build_ffi():
+    """
+    Create the :class:`cffi.FFI` object used to compile the extension module.
+
+    Referenced by ``cffi_modules`` in ``setup.py``.
+    """
+    ffi = FFI()
+    ffi.set_source(MODULE_NAME, '#include <liboath/oath.h>',
+                   libraries=['oath'])
+    ffi.cdef(declarations)
+    return ffi
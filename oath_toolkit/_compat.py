@@ -15,6 +15,11 @@
 # limitations under the License.
 """Python 2.x/3.x compatibility code."""
 
+try:
+    from collections import OrderedDict
+except ImportError:  # pragma: no cover
+    from ordereddict import OrderedDict  # Python 2.6
+import binascii
 import itertools
 import sys
 
@@ -26,16 +31,35 @@ except NameError:  # pragma: no cover
 _py2 = sys.version_info < (3,)
 
 if _py2:  # pragma: no cover
-    from urllib import quote as url_quote
+    from urllib import quote as url_quote, unquote as url_unquote
     integer_types = (int, long)  # noqa
     to_bytes = \
         lambda s, e='utf-8': s.encode(e) if isinstance(s, unicode) else s
     zip_longest = itertools.izip_longest
+    int_to_bytes = \
+        lambda n, size: binascii.unhexlify('{0:0{1}x}'.format(n, size * 2))
 else:  # pragma: no cover
-    from urllib.parse import quote as url_quote
+    from urllib.parse import quote as url_quote, unquote as url_unquote
     integer_types = (int,)
     to_bytes = lambda s, e='utf-8': bytes(s, e) if isinstance(s, str) else s
     zip_longest = itertools.zip_longest
+    int_to_bytes = lambda n, size: n.to_bytes(size, 'big')
+
+
+try:
+    from hmac import compare_digest
+except ImportError:  # pragma: no cover
+    def compare_digest(a, b):
+        """
+        Compare two :func:`bytes` objects in constant time (for Python
+        versions older than 2.7.7/3.3).
+        """
+        if len(a) != len(b):
+            return False
+        result = 0
+        for x, y in zip(bytearray(a), bytearray(b)):
+            result |= x ^ y
+        return result == 0
 
 
 def bytify(chunk):
@@ -48,4 +72,6 @@ def bytify(chunk):
     else:  # pragma: no cover
         return bytes(chunk)
 
-__all__ = ('bytify', 'integer_types', 'to_bytes', 'url_quote', 'zip_longest')
+__all__ = ('OrderedDict', 'bytify', 'compare_digest', 'int_to_bytes',
+           'integer_types', 'to_bytes', 'url_quote', 'url_unquote',
+           'zip_longest')
@@ -0,0 +1,425 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2013, 2014 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+A minimal QR code encoder, for byte mode data only.
+
+It produces the same modules as :class:`qrcode.QRCode` with the data added
+as a single byte mode segment (including the choice of mask pattern), but
+without importing the :mod:`qrcode` package, which imports Pillow if it is
+installed.
+"""
+
+from ._compat import int_to_bytes
+import binascii
+
+#: The error correction levels, with the same values as the
+#: ``qrcode.ERROR_CORRECT_*`` constants.
+ERROR_CORRECT_L = 1
+ERROR_CORRECT_M = 0
+ERROR_CORRECT_Q = 3
+ERROR_CORRECT_H = 2
+
+# The position of each error correction level in _RS_BLOCKS.
+_LEVEL_INDEX = {ERROR_CORRECT_L: 0, ERROR_CORRECT_M: 1, ERROR_CORRECT_Q: 2,
+                ERROR_CORRECT_H: 3}
+
+# Per version, then per error correction level (L, M, Q, H): the number of
+# error correction codewords per block, the number of blocks in the first
+# group, their number of data codewords, and the number of blocks in the
+# second group (which have one more data codeword each). From ISO/IEC 18004,
+# table 9.
+_RS_BLOCKS = (
+    ((7, 1, 19, 0), (10, 1, 16, 0), (13, 1, 13, 0), (17, 1, 9, 0)),
+    ((10, 1, 34, 0), (16, 1, 28, 0), (22, 1, 22, 0), (28, 1, 16, 0)),
+    ((15, 1, 55, 0), (26, 1, 44, 0), (18, 2, 17, 0), (22, 2, 13, 0)),
+    ((20, 1, 80, 0), (18, 2, 32, 0), (26, 2, 24, 0), (16, 4, 9, 0)),
+    ((26, 1, 108, 0), (24, 2, 43, 0), (18, 2, 15, 2), (22, 2, 11, 2)),
+    ((18, 2, 68, 0), (16, 4, 27, 0), (24, 4, 19, 0), (28, 4, 15, 0)),
+    ((20, 2, 78, 0), (18, 4, 31, 0), (18, 2, 14, 4), (26, 4, 13, 1)),
+    ((24, 2, 97, 0), (22, 2, 38, 2), (22, 4, 18, 2), (26, 4, 14, 2)),
+    ((30, 2, 116, 0), (22, 3, 36, 2), (20, 4, 16, 4), (24, 4, 12, 4)),
+    ((18, 2, 68, 2), (26, 4, 43, 1), (24, 6, 19, 2), (28, 6, 15, 2)),
+    ((20, 4, 81, 0), (30, 1, 50, 4), (28, 4, 22, 4), (24, 3, 12, 8)),
+    ((24, 2, 92, 2), (22, 6, 36, 2), (26, 4, 20, 6), (28, 7, 14, 4)),
+    ((26, 4, 107, 0), (22, 8, 37, 1), (24, 8, 20, 4), (22, 12, 11, 4)),
+    ((30, 3, 115, 1), (24, 4, 40, 5), (20, 11, 16, 5), (24, 11, 12, 5)),
+    ((22, 5, 87, 1), (24, 5, 41, 5), (30, 5, 24, 7), (24, 11, 12, 7)),
+    ((24, 5, 98, 1), (28, 7, 45, 3), (24, 15, 19, 2), (30, 3, 15, 13)),
+    ((28, 1, 107, 5), (28, 10, 46, 1), (28, 1, 22, 15), (28, 2, 14, 17)),
+    ((30, 5, 120, 1), (26, 9, 43, 4), (28, 17, 22, 1), (28, 2, 14, 19)),
+    ((28, 3, 113, 4), (26, 3, 44, 11), (26, 17, 21, 4), (26, 9, 13, 16)),
+    ((28, 3, 107, 5), (26, 3, 41, 13), (30, 15, 24, 5), (28, 15, 15, 10)),
+    ((28, 4, 116, 4), (26, 17, 42, 0), (28, 17, 22, 6), (30, 19, 16, 6)),
+    ((28, 2, 111, 7), (28, 17, 46, 0), (30, 7, 24, 16), (24, 34, 13, 0)),
+    ((30, 4, 121, 5), (28, 4, 47, 14), (30, 11, 24, 14), (30, 16, 15, 14)),
+    ((30, 6, 117, 4), (28, 6, 45, 14), (30, 11, 24, 16), (30, 30, 16, 2)),
+    ((26, 8, 106, 4), (28, 8, 47, 13), (30, 7, 24, 22), (30, 22, 15, 13)),
+    ((28, 10, 114, 2), (28, 19, 46, 4), (28, 28, 22, 6), (30, 33, 16, 4)),
+    ((30, 8, 122, 4), (28, 22, 45, 3), (30, 8, 23, 26), (30, 12, 15, 28)),
+    ((30, 3, 117, 10), (28, 3, 45, 23), (30, 4, 24, 31), (30, 11, 15, 31)),
+    ((30, 7, 116, 7), (28, 21, 45, 7), (30, 1, 23, 37), (30, 19, 15, 26)),
+    ((30, 5, 115, 10), (28, 19, 47, 10), (30, 15, 24, 25), (30, 23, 15, 25)),
+    ((30, 13, 115, 3), (28, 2, 46, 29), (30, 42, 24, 1), (30, 23, 15, 28)),
+    ((30, 17, 115, 0), (28, 10, 46, 23), (30, 10, 24, 35), (30, 19, 15, 35)),
+    ((30, 17, 115, 1), (28, 14, 46, 21), (30, 29, 24, 19), (30, 11, 15, 46)),
+    ((30, 13, 115, 6), (28, 14, 46, 23), (30, 44, 24, 7), (30, 59, 16, 1)),
+    ((30, 12, 121, 7), (28, 12, 47, 26), (30, 39, 24, 14), (30, 22, 15, 41)),
+    ((30, 6, 121, 14), (28, 6, 47, 34), (30, 46, 24, 10), (30, 2, 15, 64)),
+    ((30, 17, 122, 4), (28, 29, 46, 14), (30, 49, 24, 10), (30, 24, 15, 46)),
+    ((30, 4, 122, 18), (28, 13, 46, 32), (30, 48, 24, 14), (30, 42, 15, 32)),
+    ((30, 20, 117, 4), (28, 40, 47, 7), (30, 43, 24, 22), (30, 10, 15, 67)),
+    ((30, 19, 118, 6), (28, 18, 47, 31), (30, 34, 24, 34), (30, 20, 15, 61)),
+)
+
+_MODE_8BIT_BYTE = 4
+_PAD_BYTES = (0xec, 0x11)
+_G15 = 0x537
+_G15_MASK = 0x5412
+_G18 = 0x1f25
+
+# Exponent and logarithm tables of GF(256), with the polynomial 0x11d.
+_EXP = [0] * 512
+_LOG = [0] * 256
+_value = 1
+for _i in range(255):
+    _EXP[_i] = _value
+    _LOG[_value] = _i
+    _value <<= 1
+    if _value & 0x100:
+        _value ^= 0x11d
+for _i in range(255, 512):
+    _EXP[_i] = _EXP[_i - 255]
+del _i, _value
+
+_MASKS = (
+    lambda i, j: (i + j) % 2 == 0,
+    lambda i, j: i % 2 == 0,
+    lambda i, j: j % 3 == 0,
+    lambda i, j: (i + j) % 3 == 0,
+    lambda i, j: (i // 2 + j // 3) % 2 == 0,
+    lambda i, j: (i * j) % 2 + (i * j) % 3 == 0,
+    lambda i, j: ((i * j) % 2 + (i * j) % 3) % 2 == 0,
+    lambda i, j: ((i * j) % 3 + (i + j) % 2) % 2 == 0,
+)
+
+# Per version, the modules of the function patterns (the others are None).
+_TEMPLATES = {}
+_GENERATORS = {}
+
+
+def _blocks(version, error_correction):
+    ec_count, count1, data1, count2 = \
+        _RS_BLOCKS[version - 1][_LEVEL_INDEX[error_correction]]
+    return ec_count, [data1] * count1 + [data1 + 1] * count2
+
+
+def capacity(version, error_correction):
+    """
+    The number of bytes that fit in a QR code version, in byte mode.
+
+    :rtype: :func:`int`
+    """
+    data_bits = 8 * sum(_blocks(version, error_correction)[1])
+    # The mode indicator, then the character count indicator.
+    data_bits -= 4 + (8 if version < 10 else 16)
+    return data_bits // 8
+
+
+def _bit_length(number):
+    length = 0
+    while number:
+        length += 1
+        number >>= 1
+    return length
+
+
+def _bch(data, generator, shift):
+    """Append the BCH code of ``data`` to it."""
+    digits = _bit_length(generator)
+    remainder = data << shift
+    while _bit_length(remainder) >= digits:
+        remainder ^= generator << (_bit_length(remainder) - digits)
+    return (data << shift) | remainder
+
+
+def _alignment_positions(version):
+    if version == 1:
+        return []
+    count = version // 7 + 2
+    if version == 32:
+        step = 26
+    else:
+        step = (version * 4 + count * 2 + 1) // (count * 2 - 2) * 2
+    last = version * 4 + 10
+    return [6] + [last - i * step for i in range(count - 2, -1, -1)]
+
+
+def _finder_pattern(modules, row, col):
+    """Draw a finder pattern and its separator."""
+    size = len(modules)
+    for r in range(max(-1, -row), min(8, size - row)):
+        for c in range(max(-1, -col), min(8, size - col)):
+            modules[row + r][col + c] = (
+                (0 <= r <= 6 and c in (0, 6)) or
+                (0 <= c <= 6 and r in (0, 6)) or
+                (2 <= r <= 4 and 2 <= c <= 4))
+
+
+def _alignment_pattern(modules, row, col):
+    for r in range(-2, 3):
+        for c in range(-2, 3):
+            modules[row + r][col + c] = (
+                r in (-2, 2) or c in (-2, 2) or r == c == 0)
+
+
+def _template(version):
+    """The finder, alignment, and timing patterns of a version."""
+    try:
+        return _TEMPLATES[version]
+    except KeyError:
+        pass
+    size = version * 4 + 17
+    modules = [[None] * size for _ in range(size)]
+    for row, col in ((0, 0), (size - 7, 0), (0, size - 7)):
+        _finder_pattern(modules, row, col)
+    positions = _alignment_positions(version)
+    for row in positions:
+        for col in positions:
+            # Skip the positions that overlap the finder patterns.
+            if modules[row][col] is None:
+                _alignment_pattern(modules, row, col)
+    for i in range(8, size - 8):
+        if modules[i][6] is None:
+            modules[i][6] = i % 2 == 0
+        if modules[6][i] is None:
+            modules[6][i] = i % 2 == 0
+    _TEMPLATES[version] = modules
+    return modules
+
+
+def _generator(degree):
+    """The Reed-Solomon generator polynomial, as logarithms."""
+    try:
+        return _GENERATORS[degree]
+    except KeyError:
+        pass
+    poly = [1]
+    for i in range(degree):
+        product = [0] * (len(poly) + 1)
+        for j, coefficient in enumerate(poly):
+            product[j] ^= coefficient
+            if coefficient:
+                product[j + 1] ^= _EXP[_LOG[coefficient] + i]
+        poly = product
+    _GENERATORS[degree] = [_LOG[coefficient] for coefficient in poly[1:]]
+    return _GENERATORS[degree]
+
+
+def _error_correction(data, degree):
+    generator = _generator(degree)
+    remainder = [0] * degree
+    for byte in data:
+        factor = byte ^ remainder.pop(0)
+        remainder.append(0)
+        if factor:
+            log = _LOG[factor]
+            for i, coefficient in enumerate(generator):
+                remainder[i] ^= _EXP[coefficient + log]
+    return remainder
+
+
+def _codewords(data, version, error_correction):
+    """The interleaved data and error correction codewords."""
+    ec_count, data_counts = _blocks(version, error_correction)
+    bit_limit = 8 * sum(data_counts)
+    count_bits = 8 if version < 10 else 16
+    bits = _MODE_8BIT_BYTE << count_bits | len(data)
+    if data:
+        bits = bits << 8 * len(data) | int(binascii.hexlify(data), 16)
+    length = 4 + count_bits + 8 * len(data)
+    if length > bit_limit:
+        raise ValueError('Too much data for a version {0} QR code'.format(
+            version))
+    # The terminator, then zeros up to a byte boundary.
+    padding = min(bit_limit - length, 4)
+    padding += -(length + padding) % 8
+    bits <<= padding
+    length += padding
+    buf = bytearray(int_to_bytes(bits, length // 8))
+    for i in range((bit_limit - length) // 8):
+        buf.append(_PAD_BYTES[i % 2])
+    blocks = []
+    offset = 0
+    for count in data_counts:
+        blocks.append(buf[offset:offset + count])
+        offset += count
+    ec_blocks = [_error_correction(block, ec_count) for block in blocks]
+    codewords = []
+    for i in range(max(data_counts)):
+        codewords.extend(block[i] for block in blocks if i < len(block))
+    for i in range(ec_count):
+        codewords.extend(block[i] for block in ec_blocks)
+    return codewords
+
+
+def _format_information(modules, error_correction, mask, test):
+    size = len(modules)
+    bits = _bch(error_correction << 3 | mask, _G15, 10) ^ _G15_MASK
+    for i in range(15):
+        dark = not test and (bits >> i) & 1 == 1
+        if i < 6:
+            modules[i][8] = dark
+        elif i < 8:
+            modules[i + 1][8] = dark
+        else:
+            modules[size - 15 + i][8] = dark
+        if i < 8:
+            modules[8][size - i - 1] = dark
+        elif i < 9:
+            modules[8][15 - i] = dark
+        else:
+            modules[8][14 - i] = dark
+    modules[size - 8][8] = not test
+
+
+def _version_information(modules, version, test):
+    size = len(modules)
+    bits = _bch(version, _G18, 12)
+    for i in range(18):
+        dark = not test and (bits >> i) & 1 == 1
+        modules[i // 3][i % 3 + size - 11] = dark
+        modules[i % 3 + size - 11][i // 3] = dark
+
+
+def _place_data(modules, codewords, mask):
+    """Lay out the codewords in the remaining modules, and mask them."""
+    size = len(modules)
+    masked = _MASKS[mask]
+    count = len(codewords)
+    index = 0
+    upward = True
+    col = size - 1
+    while col > 0:
+        if col == 6:
+            col -= 1
+        rows = range(size - 1, -1, -1) if upward else range(size)
+        for row in rows:
+            for c in (col, col - 1):
+                if modules[row][c] is not None:
+                    continue
+                byte = index >> 3
+                dark = byte < count and \
+                    (codewords[byte] >> (7 - (index & 7))) & 1 == 1
+                modules[row][c] = dark != masked(row, c)
+                index += 1
+        upward = not upward
+        col -= 2
+
+
+def _place(version, error_correction, codewords, mask, test):
+    """
+    Lay out the format information and the data for a mask pattern. When
+    testing the mask patterns, the format and version information is left
+    light, as :class:`qrcode.QRCode` does.
+    """
+    modules = [list(row) for row in _template(version)]
+    _format_information(modules, error_correction, mask, test)
+    if version >= 7:
+        _version_information(modules, version, test)
+    _place_data(modules, codewords, mask)
+    return modules
+
+
+def _runs_penalty(lines, size):
+    penalty = 0
+    for line in lines:
+        previous = line[0]
+        length = 0
+        for dark in line:
+            if dark == previous:
+                length += 1
+            else:
+                if length >= 5:
+                    penalty += length - 2
+                length = 1
+                previous = dark
+        if length >= 5:
+            penalty += length - 2
+    return penalty
+
+
+def _finder_penalty(lines, size):
+    penalty = 0
+    for line in lines:
+        col = 0
+        while col < size - 10:
+            if (not line[col + 1] and line[col + 4] and not line[col + 5] and
+                    line[col + 6] and not line[col + 9] and
+                    (line[col] and line[col + 2] and line[col + 3] and
+                     not line[col + 7] and not line[col + 8] and
+                     not line[col + 10] or
+                     not line[col] and not line[col + 2] and
+                     not line[col + 3] and line[col + 7] and
+                     line[col + 8] and line[col + 10])):
+                penalty += 40
+            # Neither pattern can start at the next column if this one ends
+            # in a dark module.
+            col += 2 if line[col + 10] else 1
+    return penalty
+
+
+def _penalty(modules):
+    """
+    Rate a mask pattern, as :func:`qrcode.util.lost_point` does (ISO/IEC
+    18004, section 8.8.2).
+    """
+    size = len(modules)
+    columns = list(zip(*modules))
+    penalty = _runs_penalty(modules, size) + _runs_penalty(columns, size)
+    for row in range(size - 1):
+        top, bottom = modules[row], modules[row + 1]
+        for col in range(size - 1):
+            if top[col] == top[col + 1] == bottom[col] == bottom[col + 1]:
+                penalty += 3
+    penalty += _finder_penalty(modules, size)
+    penalty += _finder_penalty(columns, size)
+    dark = sum(map(sum, modules))
+    penalty += int(abs(float(dark) / (size * size) * 100 - 50) / 5) * 10
+    return penalty
+
+
+def encode(data, version, error_correction=ERROR_CORRECT_M):
+    """
+    Encode data as a QR code, in byte mode.
+
+    :param bytes data: The data.
+    :param int version: The QR code version, from 1 to 40.
+    :param int error_correction: One of the ``ERROR_CORRECT_*`` constants.
+    :return: The rows of modules (without a border), where :data:`True` is a
+             dark module.
+    :rtype: :func:`list` of :func:`list` of :func:`bool`
+    :raise: :class:`ValueError` if the data does not fit
+    """
+    if not 1 <= version <= 40:
+        raise ValueError('Invalid version: {0}'.format(version))
+    codewords = _codewords(bytes(data), version, error_correction)
+    best = None
+    for mask in range(8):
+        penalty = _penalty(_place(version, error_correction, codewords, mask,
+                                  True))
+        if best is None or penalty < best[0]:
+            best = (penalty, mask)
+    return _place(version, error_correction, codewords, best[1], False)
@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2013, 2014 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Selection and lazy loading of the backend that implements the OTP
+algorithms: :mod:`oath_toolkit.impl_cython`, :mod:`oath_toolkit.impl_cffi`
+(both of which use liboath), or :mod:`oath_toolkit.impl_hashlib`.
+
+The backend is not imported (and liboath is not loaded) until it is first
+used. By default, the first importable backend in :data:`BACKENDS` is used.
+It can be chosen via the ``OATH_TOOLKIT_BACKEND`` environment variable, or
+:func:`set_backend`.
+
+If the backend is set to ``auto``, every importable backend is benchmarked
+briefly (see :func:`calibrate`), and the fastest one is used. The result is
+saved to a profile (see :func:`profile_path`), so that the calibration only
+runs once per host and interpreter, or again when the set of importable
+backends changes.
+"""
+
+from .capabilities import probe
+from .metadata import VERSION
+from importlib import import_module
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import timeit
+
+#: The backends, in order of preference.
+BACKENDS = ('cython', 'cffi', 'hashlib')
+#: The environment variable which selects a backend.
+ENVIRONMENT_VARIABLE = 'OATH_TOOLKIT_BACKEND'
+#: The backend name which selects the fastest backend.
+AUTO = 'auto'
+#: The environment variable which overrides the path to the profile.
+PROFILE_VARIABLE = 'OATH_TOOLKIT_PROFILE'
+
+_SECRET = b'\x31\x32\x33\x34\x35\x36\x37\x38\x39\x30' * 2
+_NOW = 1111111109
+
+_lock = threading.RLock()
+
+
+class LazyBackend(object):
+    """
+    Stand-in for the backend module, which loads it on first use.
+
+    Once the backend is loaded, the module's namespace is copied into the
+    proxy, so that attribute lookups are as fast as they are on the module
+    itself. The :class:`oath_toolkit.types.Capabilities` of the backend are
+    available as the ``capabilities`` attribute.
+    """
+
+    def __getattr__(self, name):
+        # Only called for attributes that are not in the namespace yet.
+        if name.startswith('__') or 'capabilities' in self.__dict__:
+            raise AttributeError(name)
+        load(self)
+        try:
+            return self.__dict__[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __repr__(self):
+        name = self.__dict__.get('__name__')
+        return '<LazyBackend {0}>'.format(name or '(not loaded)')
+
+    def install(self, module):
+        """Replace the namespace of the proxy with the module's."""
+        namespace = dict(module.__dict__)
+        namespace['capabilities'] = probe(module)
+        self.__dict__.clear()
+        self.__dict__.update(namespace)
+
+
+#: The backend in use.
+oath = LazyBackend()
+
+
+def _import(name):
+    if name not in BACKENDS:
+        raise ValueError('Unknown backend {0!r} (expected one of: {1})'
+                         .format(name, ', '.join(BACKENDS)))
+    return import_module('oath_toolkit.impl_' + name)
+
+
+def calibrate(names=BACKENDS, duration=0.02, repeat=3):
+    """
+    Benchmark the importable backends on a typical workload: generating a
+    HOTP, and rejecting an invalid TOTP in a window of 1.
+
+    :param names: The backends to benchmark.
+    :param float duration: The minimum duration of a measurement, in seconds.
+    :param int repeat: The number of measurements per backend (the best one
+                       is kept).
+    :return: The time per iteration, in seconds, per backend name.
+    :rtype: :func:`dict`
+    """
+    timings = {}
+    for name in names:
+        try:
+            module = _import(name)
+        except (ImportError, OSError):
+            continue
+
+        def workload(module=module):
+            module.hotp_generate(_SECRET, 0, 6, False, -1)
+            module.try_totp_validate(_SECRET, _NOW, 30, 0, 1, b'000000')
+
+        timer = timeit.Timer(workload)
+        number = 1
+        while timer.timeit(number) < duration / 10:
+            number *= 2
+        number = max(1, int(number * 10))
+        timings[name] = min(timer.repeat(repeat, number)) / number
+    return timings
+
+
+def profile_path():
+    """
+    The path to the profile that stores the results of the calibration: the
+    value of ``OATH_TOOLKIT_PROFILE`` if it is set, otherwise
+    ``oath_toolkit/backend.json`` in the user's cache directory.
+
+    :rtype: :func:`str`
+    """
+    path = os.environ.get(PROFILE_VARIABLE)
+    if path:
+        return path
+    cache_dir = os.environ.get('XDG_CACHE_HOME') or \
+        os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_dir, 'oath_toolkit', 'backend.json')
+
+
+def _profile_key():
+    """Identify the interpreter and package version that a profile is for."""
+    return '{0} {1} {2} {3}'.format(platform.python_implementation(),
+                                    platform.python_version(),
+                                    sys.executable, VERSION)
+
+
+def _read_profile(path):
+    try:
+        with open(path) as f:
+            profile = json.load(f)
+    except (IOError, OSError, ValueError):
+        return {}
+    return profile if isinstance(profile, dict) else {}
+
+
+def _write_profile(path, profile):
+    """
+    Write the profile atomically, ignoring errors (e.g. a read-only home
+    directory).
+    """
+    directory = os.path.dirname(path) or '.'
+    try:
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(profile, f, indent=2, sort_keys=True)
+        if os.name == 'nt' and os.path.exists(path):  # pragma: no cover
+            os.remove(path)
+        os.rename(tmp_path, path)
+    except (IOError, OSError):
+        pass
+
+
+def _importable():
+    """The importable backends, by name."""
+    modules = {}
+    for name in BACKENDS:
+        try:
+            modules[name] = _import(name)
+        except (ImportError, OSError):
+            pass
+    return modules
+
+
+def _fastest():
+    """
+    Determine the fastest backend, from the profile or via :func:`calibrate`.
+
+    The profile entry records which backends were importable when it was
+    calibrated, so that building or installing another one (e.g. liboath)
+    triggers a new calibration.
+    """
+    path = profile_path()
+    profile = _read_profile(path)
+    key = _profile_key()
+    entry = profile.get(key)
+    modules = _importable()
+    names = sorted(modules)
+    if isinstance(entry, dict) and entry.get('backends') == names and \
+            entry.get('backend') in modules:
+        return modules[entry['backend']]
+    timings = calibrate(names)
+    name = min(timings, key=timings.get)
+    profile[key] = {'backend': name, 'backends': names, 'timings': timings}
+    _write_profile(path, profile)
+    return modules[name]
+
+
+def load(proxy=oath):
+    """
+    Load the backend into the proxy, unless it already is loaded.
+
+    :raise: :class:`ImportError` or :class:`OSError` if the backend selected
+            via ``OATH_TOOLKIT_BACKEND`` cannot be loaded
+    """
+    with _lock:
+        if 'capabilities' in proxy.__dict__:
+            return
+        name = os.environ.get(ENVIRONMENT_VARIABLE)
+        if name == AUTO:
+            proxy.install(_fastest())
+            return
+        elif name:
+            proxy.install(_import(name))
+            return
+        for name in BACKENDS[:-1]:
+            try:  # pragma: no cover
+                proxy.install(_import(name))
+                return
+            except (ImportError, OSError):  # not built, or no liboath
+                pass
+        proxy.install(_import(BACKENDS[-1]))
+
+
+def set_backend(name):
+    """
+    Switch to another backend.
+
+    :param str name: One of :data:`BACKENDS`, or :data:`AUTO` to use the
+                     fastest one.
+    :return: The capabilities of the backend.
+    :rtype: :class:`oath_toolkit.types.Capabilities`
+    :raise: :class:`ValueError` if the backend is unknown, or
+            :class:`ImportError`/:class:`OSError` if it cannot be loaded
+    """
+    module = _fastest() if name == AUTO else _import(name)
+    with _lock:
+        oath.install(module)
+    return oath.capabilities
+
+
+def get_backend():
+    """
+    Determine which backend is in use, loading it if necessary.
+
+    :return: One of :data:`BACKENDS`.
+    :rtype: :func:`str`
+    """
+    return oath.capabilities.backend.rpartition('.impl_')[2]
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2013, 2014 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Base32 encoding and decoding of secrets, including the human-readable format
+(lowercase or uppercase, space-separated groups of 4 characters, without
+padding) used by authenticator apps.
+"""
+
+from ._compat import int_to_bytes, to_bytes
+from .exc import OATH_INVALID_BASE32, OATHError
+from base64 import b32encode
+
+#: The number of characters per group in human-readable Base32 strings.
+GROUP_SIZE = 4
+
+ALPHABET = b'ABCDEFGHIJKLMNOPQRSTUVWXYZ234567'
+# Maps the Base32 alphabet (in either case) onto the digits that int() uses
+# for base 32, and everything else onto an invalid digit.
+_INT_DIGITS = bytearray(b'!' * 256)
+for _char, _digit in zip(bytearray(ALPHABET),
+                         bytearray(b'0123456789abcdefghijklmnopqrstuv')):
+    _INT_DIGITS[_char] = _INT_DIGITS[ord(chr(_char).lower())] = _digit
+_INT_DIGITS = bytes(_INT_DIGITS)
+del _char, _digit
+# The valid number of padding characters, per the number of characters in
+# the last quantum.
+_PADDING = (0, 6, 4, 3, 1)
+
+
+def _error(message):
+    err = OATHError(message)
+    err.code = OATH_INVALID_BASE32
+    return err
+
+
+def _group(encoded):
+    """Split a Base32 string into space-separated groups, without padding."""
+    encoded = encoded.rstrip(b'=')
+    return b' '.join([encoded[i:i + GROUP_SIZE]
+                      for i in range(0, len(encoded), GROUP_SIZE)])
+
+
+def encode(data, human_readable=False):
+    """
+    Base32-encode data.
+
+    :param data: The data to be encoded. Must be castable into a
+                 :func:`bytes` object.
+    :param bool human_readable: If :data:`True`, transforms the Base32 string
+                                into space-separated chunks of 4 characters,
+                                removing trailing ``=``.
+    :rtype: bytes
+    """
+    if not data:
+        return b''
+    encoded = b32encode(to_bytes(data))
+    if human_readable:
+        return _group(encoded)
+    return encoded
+
+
+def encode_many(data, size=None, human_readable=False):
+    """
+    Base32-encode several pieces of data.
+
+    :param data: Either an iterable of data to be encoded, or (if ``size`` is
+                 set) a single bytes-like object to be split into pieces of
+                 ``size`` bytes.
+    :param int size: The size of each piece of ``data``, in bytes. When it is
+                     a multiple of 5, ``data`` is encoded in a single call,
+                     then split.
+    :param bool human_readable: See :func:`encode`.
+    :rtype: :func:`list` of :func:`bytes`
+    :raise: :class:`ValueError` if the length of ``data`` is not a multiple
+            of ``size``
+    """
+    if size is None:
+        return [encode(item, human_readable) for item in data]
+    data = bytes(data) if isinstance(data, bytearray) else to_bytes(data)
+    if size <= 0 or len(data) % size:
+        raise ValueError('The data cannot be split into {0}-byte pieces'
+                         .format(size))
+    if size % 5:
+        return [encode(data[i:i + size], human_readable)
+                for i in range(0, len(data), size)]
+    # 5 bytes are encoded into 8 characters without padding, so the pieces
+    # line up with the encoded string.
+    encoded = b32encode(data)
+    step = size // 5 * 8
+    pieces = [encoded[i:i + step] for i in range(0, len(encoded), step)]
+    if human_readable:
+        return [_group(piece) for piece in pieces]
+    return pieces
+
+
+def _canonicalize(data):
+    """
+    Transform a human-readable Base32 string into a padded one, without
+    spaces.
+    """
+    data = data.replace(b' ', b'')
+    return data + b'=' * (-len(data) % 8)
+
+
+def _b32decode(data):
+    """
+    Decode a padded Base32 string, in either case.
+
+    The whole string is parsed by :func:`int` in base 32, instead of one
+    8-character quantum at a time.
+    """
+    if len(data) % 8:
+        raise ValueError('Incorrect padding')
+    stripped = data.rstrip(b'=')
+    if len(data) - len(stripped) not in _PADDING:
+        raise ValueError('Incorrect padding')
+    bits = len(stripped) * 5
+    size = bits // 8
+    value = int(stripped.translate(_INT_DIGITS), 32)
+    return int_to_bytes(value >> (bits - size * 8), size)
+
+
+def decode(data, decoder=None):
+    """
+    Decode Base32 data. Unlike :func:`base64.b32decode`, it handles
+    human-readable Base32 strings.
+
+    Canonical strings (padded, without spaces) are decoded as-is.
+
+    :param bytes data: The data to be decoded.
+    :param decoder: If set, decodes the (validated) data instead of the pure
+                    Python decoder, e.g. the ``base32_decode`` function of a
+                    liboath backend.
+    :type decoder: callable
+    :rtype: bytes
+    :raise: :class:`OATHError` if the data is not valid Base32
+    """
+    if not data:
+        raise _error('Invalid base32 string')
+    data = to_bytes(data)
+    if data.upper() != data and data.lower() != data:
+        raise _error('Base32 string cannot be both upper- and lowercased')
+    if decoder is not None:
+        return decoder(data)
+    if len(data) % 8 or b' ' in data:
+        data = _canonicalize(data)
+    try:
+        return _b32decode(data)
+    except (TypeError, ValueError):
+        raise _error('Invalid base32 string')
+
+
+def decode_many(data, decoder=None):
+    """
+    Decode several Base32 strings.
+
+    :param data: The strings to be decoded.
+    :type data: iterable of :func:`bytes`
+    :param decoder: See :func:`decode`.
+    :rtype: :func:`list` of :func:`bytes`
+    :raise: :class:`OATHError` if any string is not valid Base32
+    """
+    return [decode(item, decoder) for item in data]
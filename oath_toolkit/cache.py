@@ -0,0 +1,530 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2015 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Opt-in, in-process caches for the OTP hot paths.
+
+All of the caches are disabled by default. Except for the key schedule
+cache, secrets are not used as cache keys directly; they are identified by
+their :func:`fingerprint` instead.
+
+Key schedule cache
+    Stores the keyed HMAC state (the inner and outer padded key digests) per
+    secret, so that repeated calls for the same secret skip the key setup.
+    Only the pure Python backend (:mod:`oath_toolkit.impl_hashlib`) computes
+    HMACs in Python; liboath keys the HMAC internally on every call, so the
+    Cython and CFFI backends are unaffected by it. Enabled via
+    :func:`enable_key_schedule_cache`.
+
+TOTP window cache
+    Stores, per secret and time step, the valid OTPs in the validation
+    window along with their positions, generated nearest-first as far as
+    validations have needed. Repeated validations in the same time step
+    (retries, double submissions) become a dictionary lookup instead of up
+    to ``2 * window + 1`` HMACs. Enabled via
+    :func:`enable_totp_window_cache`.
+
+HOTP look-ahead cache
+    Stores, per secret, the OTPs for the counters in the validation window,
+    mapped to their counters. When the start counter moves forward, only the
+    OTPs for the counters that enter the window are generated, so a
+    validation is a dictionary lookup instead of up to ``window + 1`` HMACs.
+    Enabled via :func:`enable_hotp_lookahead_cache`.
+
+QR image cache
+    Stores rendered QR code images, keyed by a digest of the provisioning URI
+    and the rendering options, so that reloading an enrollment page does not
+    re-render the image. Used by :func:`oath_toolkit.qrcode.render`. Enabled
+    via :func:`enable_qr_image_cache`.
+"""
+
+from ._compat import OrderedDict, integer_types
+from collections import deque
+from .exc import OATH_INVALID_OTP, OATHError
+from .types import CacheStats, OTPPosition
+import hashlib
+import threading
+import time
+
+#: The active key schedule cache, if enabled.
+key_schedule_cache = None
+#: The active TOTP window cache, if enabled.
+totp_window_cache = None
+#: The active HOTP look-ahead cache, if enabled.
+hotp_lookahead_cache = None
+#: The active QR image cache, if enabled.
+qr_image_cache = None
+
+
+def fingerprint(secret):
+    """
+    Compute the identifier of a secret, for use as a cache key.
+
+    :param bytes secret: The secret.
+    :rtype: :func:`bytes`
+    """
+    return hashlib.sha256(secret).digest()
+
+
+class LRUCache(object):
+
+    """
+    A thread-safe mapping with least recently used (LRU) eviction, and an
+    optional time to live (TTL) for each entry.
+
+    :param int maxsize: The maximum number of entries.
+    :param ttl: The number of seconds after which an entry expires. If
+                :data:`None`, entries only expire via eviction.
+    :type ttl: :func:`int`, :func:`float`, or :data:`None`
+    :param callable timer: Returns the current time, in seconds.
+    """
+
+    def __init__(self, maxsize=1024, ttl=None, timer=time.time):
+        if maxsize < 1:
+            raise ValueError('maxsize must be positive')
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.timer = timer
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None, now=None):
+        """
+        Retrieve an entry, marking it as the most recently used.
+
+        :param now: The current time. Defaults to the timer's.
+        :return: The cached value, or ``default`` if it is missing or expired.
+        """
+        with self._lock:
+            try:
+                expires, value = self._data.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            if expires is not None and \
+                    expires <= (self.timer() if now is None else now):
+                self.misses += 1
+                return default
+            self._data[key] = (expires, value)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, expires=None, now=None):
+        """
+        Add or replace an entry, evicting the least recently used entry if
+        the cache is full. Expired entries are removed from the least
+        recently used end of the cache, up to the first one that has not
+        expired.
+
+        :param expires: When the entry expires. Defaults to the current time
+                        plus the TTL, if any.
+        :type expires: :func:`int`, :func:`float`, or :data:`None`
+        :param now: The current time. Defaults to the timer's.
+        """
+        if now is None:
+            now = self.timer()
+        if expires is None and self.ttl is not None:
+            expires = now + self.ttl
+        with self._lock:
+            data = self._data
+            data.pop(key, None)
+            data[key] = (expires, value)
+            while len(data) > self.maxsize:
+                data.popitem(last=False)
+                self.evictions += 1
+            while data:
+                oldest = next(iter(data))
+                oldest_expires = data[oldest][0]
+                if oldest_expires is None or oldest_expires > now:
+                    break
+                del data[oldest]
+
+    def delete(self, key):
+        """Remove an entry, if it exists."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """Remove all entries and reset the statistics."""
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        """
+        The cache statistics.
+
+        :rtype: :class:`oath_toolkit.types.CacheStats`
+        """
+        return CacheStats(hits=self.hits, misses=self.misses,
+                          evictions=self.evictions, size=len(self._data),
+                          maxsize=self.maxsize)
+
+
+class KeyScheduleCache(LRUCache):
+
+    """
+    An :class:`LRUCache` of keyed HMAC states, keyed by the secrets
+    themselves.
+
+    Unlike the other caches, the secrets are not fingerprinted: the key setup
+    that the cache saves costs about as much as hashing the secret with
+    SHA-256, whereas a dictionary lookup of a :func:`bytes` object is much
+    cheaper. The keyed state is derived from the secret, so caching it keeps
+    the equivalent of the secret in memory anyway.
+
+    :param int maxsize: The maximum number of secrets.
+    :param ttl: The number of seconds a keyed state is kept.
+    :type ttl: :func:`int`, :func:`float`, or :data:`None`
+    :param callable timer: Returns the current time, in seconds.
+    """
+
+    def get_or_set(self, secret, factory):
+        """
+        Retrieve the keyed state for a secret, creating it if necessary.
+
+        :param secret: The secret.
+        :type secret: :func:`bytes` or :func:`bytearray`
+        :param callable factory: Creates the keyed state from the secret.
+        """
+        if not isinstance(secret, bytes):
+            secret = bytes(secret)
+        keyed = self.get(secret)
+        if keyed is None:
+            keyed = factory(secret)
+            self.set(secret, keyed)
+        return keyed
+
+
+class _TOTPWindow(object):
+
+    """
+    The OTPs in a TOTP validation window, generated on demand in the same
+    order that liboath searches it, so that the first match wins in case of
+    collisions.
+    """
+
+    __slots__ = ['step', 'size', 'searched', 'positions', 'lock']
+
+    def __init__(self, step, window):
+        self.step = step
+        self.size = 2 * window + 1
+        # The number of window positions generated so far.
+        self.searched = 0
+        # OTP -> relative position
+        self.positions = {}
+        self.lock = threading.Lock()
+
+    def find(self, generate, otp):
+        """
+        Look up an OTP, generating the rest of the window until it is found.
+
+        :param callable generate: Generates the OTP for a time step.
+        :param bytes otp: The one-time password to look up.
+        :return: The relative position, or :data:`None` if it is invalid.
+        """
+        positions = self.positions
+        with self.lock:
+            relative = positions.get(otp)
+            while relative is None and self.searched < self.size:
+                index = self.searched
+                self.searched += 1
+                # 0, +1, -1, +2, -2, ...
+                candidate = (index + 1) // 2 if index % 2 else -(index // 2)
+                if self.step + candidate < 0:
+                    continue
+                code = generate(self.step + candidate)
+                if code not in positions:
+                    positions[code] = candidate
+                    if code == otp:
+                        relative = candidate
+            return relative
+
+
+class TOTPWindowCache(LRUCache):
+
+    """
+    Caches the valid OTPs in a TOTP validation window, for one time step.
+
+    Entries are keyed by the time step, and expire when the step rolls over
+    (measured by the timestamps being validated): they are never returned
+    afterwards, and are removed as later entries are added.
+
+    The OTPs in a window are generated nearest-first, only until the one
+    being validated is found; the rest of the window is filled in by later
+    lookups. With the pure Python backend, a miss keys the HMAC for each
+    generated OTP, so enable the key schedule cache as well.
+
+    :param int maxsize: The maximum number of (secret, time step) entries.
+    """
+
+    def __init__(self, maxsize=1024):
+        super(TOTPWindowCache, self).__init__(maxsize)
+
+    def try_validate(self, backend, secret, now, time_step_size,
+                     start_offset, window, otp):
+        """
+        Validate a one-time password generated using the TOTP algorithm
+        (:rfc:`6238`), with the same semantics as the backend's
+        ``try_totp_validate`` function.
+
+        :param backend: The backend module used to generate OTPs on a cache
+                        miss.
+        :param bytes secret: The secret used to generate the one-time
+                             password.
+        :param int now: The UNIX timestamp (usually the current one)
+        :param int time_step_size: The time step system parameter. If set to
+                                   a negative value, defaults to ``30``.
+        :param int start_offset: The UNIX timestamp of when to start counting
+                                 time steps (usually should be ``0``).
+        :param int window: The number of OTPs before and after the start OTP
+                           to test.
+        :param bytes otp: The one-time password to validate.
+        :return: The absolute position in the OTP window (or a negative
+                 ``oath_rc`` error code if it is invalid), and the relative
+                 position.
+        :rtype: :func:`tuple`
+        """
+        if not 6 <= len(otp) <= 8:
+            # Let the backend return the appropriate error code.
+            return backend.try_totp_validate(secret, now, time_step_size,
+                                             start_offset, window, otp)
+        if time_step_size is None or time_step_size <= 0:
+            time_step_size = 30
+        if not isinstance(now, integer_types):
+            now = int(now)
+        step = (now - start_offset) // time_step_size
+        key = (fingerprint(secret), time_step_size, start_offset, window,
+               len(otp))
+        # The validation's timestamp is the clock: entries expire at the end
+        # of their time step.
+        table = self.get(key + (step,), now=now)
+        if table is None:
+            table = _TOTPWindow(step, window)
+            self.delete(key + (step - 1,))
+            self.set(key + (step,), table,
+                     expires=start_offset + (step + 1) * time_step_size,
+                     now=now)
+        if not isinstance(otp, bytes):
+            otp = bytes(bytearray(otp))
+        digits = len(otp)
+
+        def generate(counter):
+            # A TOTP is the HOTP for the time step counter.
+            return backend.hotp_generate(secret, counter, digits, False, -1)
+
+        relative = table.find(generate, otp)
+        if relative is None:
+            return OATH_INVALID_OTP, 0
+        return abs(relative), relative
+
+    def validate(self, backend, secret, now, time_step_size, start_offset,
+                 window, otp):
+        """
+        Validate a one-time password generated using the TOTP algorithm
+        (:rfc:`6238`), with the same semantics as the backend's
+        ``totp_validate`` function. The parameters are the same as
+        :meth:`try_validate`.
+
+        :rtype: :class:`oath_toolkit.types.OTPPosition`
+        :raise: :class:`OATHError` if invalid
+        """
+        retval, otp_pos = self.try_validate(backend, secret, now,
+                                            time_step_size, start_offset,
+                                            window, otp)
+        if retval < 0:
+            err = OATHError(backend.strerror(retval))
+            err.code = retval
+            raise err
+        return OTPPosition(absolute=retval, relative=otp_pos)
+
+
+class _LookAheadTable(object):
+
+    """The OTPs for consecutive counters, starting at ``start``."""
+
+    __slots__ = ['start', 'codes', 'counters', 'lock']
+
+    def __init__(self, start):
+        self.start = start
+        self.codes = deque()
+        # OTP -> ascending counters (OTPs may collide within a window)
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def reset(self, start):
+        self.start = start
+        self.codes.clear()
+        self.counters.clear()
+
+    def pop(self):
+        """Remove the OTP for the first counter."""
+        code = self.codes.popleft()
+        counters = self.counters[code]
+        counters.pop(0)
+        if not counters:
+            del self.counters[code]
+        self.start += 1
+
+    def append(self, code):
+        """Add the OTP for the counter after the last one."""
+        self.counters.setdefault(code, []).append(self.start +
+                                                  len(self.codes))
+        self.codes.append(code)
+
+
+class HOTPLookAheadCache(LRUCache):
+
+    """
+    Caches the OTPs in a HOTP validation window, advancing incrementally as
+    the start counter moves forward.
+
+    :param int maxsize: The maximum number of (secret, digits) entries.
+    """
+
+    def __init__(self, maxsize=1024):
+        super(HOTPLookAheadCache, self).__init__(maxsize)
+
+    def try_validate(self, backend, secret, start_moving_factor, window, otp):
+        """
+        Validate a one-time password generated using the HOTP algorithm
+        (:rfc:`4226`), with the same semantics as the backend's
+        ``try_hotp_validate`` function.
+
+        :param backend: The backend module used to generate OTPs for the
+                        counters that are not cached yet.
+        :param bytes secret: The secret used to generate the one-time
+                             password.
+        :param int start_moving_factor: The start counter in the OTP stream.
+        :param int window: The number of OTPs after the start offset OTP
+                           to test.
+        :param bytes otp: The one-time password to validate.
+        :return: The position in the OTP window, where ``0`` is the first
+                 position, or a negative ``oath_rc`` error code if it is
+                 invalid.
+        :rtype: :func:`int`
+        """
+        digits = len(otp)
+        if not 6 <= digits <= 8:
+            # Let the backend return the appropriate error code.
+            return backend.try_hotp_validate(secret, start_moving_factor,
+                                             window, otp)
+        if not isinstance(otp, bytes):
+            otp = bytes(bytearray(otp))
+        key = (fingerprint(secret), digits)
+        table = self.get(key)
+        if table is None:
+            table = _LookAheadTable(start_moving_factor)
+            self.set(key, table)
+        with table.lock:
+            if not table.start <= start_moving_factor < \
+                    table.start + len(table.codes):
+                # The counter moved backwards, or past the cached window.
+                table.reset(start_moving_factor)
+            while table.start < start_moving_factor:
+                table.pop()
+            while len(table.codes) <= window:
+                table.append(backend.hotp_generate(
+                    secret, table.start + len(table.codes), digits, False,
+                    -1))
+            counters = table.counters.get(otp)
+            # The table may be longer than the window, if a larger one was
+            # used before.
+            if counters is None or counters[0] - start_moving_factor > window:
+                return OATH_INVALID_OTP
+            return counters[0] - start_moving_factor
+
+
+def enable_key_schedule_cache(maxsize=1024, ttl=None):
+    """
+    Enable (or replace) the key schedule cache. It only speeds up the pure
+    Python backend (:mod:`oath_toolkit.impl_hashlib`).
+
+    :param int maxsize: The maximum number of secrets to cache.
+    :param ttl: The number of seconds a keyed HMAC state is kept.
+    :type ttl: :func:`int`, :func:`float`, or :data:`None`
+    :rtype: :class:`KeyScheduleCache`
+    """
+    global key_schedule_cache
+    key_schedule_cache = KeyScheduleCache(maxsize, ttl)
+    return key_schedule_cache
+
+
+def disable_key_schedule_cache():
+    """Disable the key schedule cache, discarding its contents."""
+    global key_schedule_cache
+    key_schedule_cache = None
+
+
+def enable_totp_window_cache(maxsize=1024):
+    """
+    Enable (or replace) the TOTP window cache.
+
+    :param int maxsize: The maximum number of (secret, time step) entries.
+    :rtype: :class:`TOTPWindowCache`
+    """
+    global totp_window_cache
+    totp_window_cache = TOTPWindowCache(maxsize)
+    return totp_window_cache
+
+
+def disable_totp_window_cache():
+    """Disable the TOTP window cache, discarding its contents."""
+    global totp_window_cache
+    totp_window_cache = None
+
+
+def enable_hotp_lookahead_cache(maxsize=1024):
+    """
+    Enable (or replace) the HOTP look-ahead cache.
+
+    :param int maxsize: The maximum number of (secret, digits) entries.
+    :rtype: :class:`HOTPLookAheadCache`
+    """
+    global hotp_lookahead_cache
+    hotp_lookahead_cache = HOTPLookAheadCache(maxsize)
+    return hotp_lookahead_cache
+
+
+def disable_hotp_lookahead_cache():
+    """Disable the HOTP look-ahead cache, discarding its contents."""
+    global hotp_lookahead_cache
+    hotp_lookahead_cache = None
+
+
+def enable_qr_image_cache(maxsize=1024, ttl=None):
+    """
+    Enable (or replace) the QR image cache.
+
+    :param int maxsize: The maximum number of images to cache.
+    :param ttl: The number of seconds an image is kept.
+    :type ttl: :func:`int`, :func:`float`, or :data:`None`
+    :rtype: :class:`LRUCache`
+    """
+    global qr_image_cache
+    qr_image_cache = LRUCache(maxsize, ttl)
+    return qr_image_cache
+
+
+def disable_qr_image_cache():
+    """Disable the QR image cache, discarding its contents."""
+    global qr_image_cache
+    qr_image_cache = None
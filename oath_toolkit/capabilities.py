@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2013, 2014 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Detection of the features that a backend (and the version of liboath it is
+built against) supports.
+
+Each backend is probed once per process; the API dispatches on the cached
+results instead of calling ``oath_check_version`` on every call.
+"""
+
+from ._compat import to_bytes
+from .types import Capabilities
+import re
+import threading
+
+# The liboath versions which introduced each feature, from liboath's NEWS.
+TOTP_VALIDATE2_VERSION = (1, 12, 0)
+BASE32_VERSION = (2, 0, 0)
+
+#: The HMAC algorithms the backends generate OTPs with. liboath 2.6.0 added
+#: SHA-256/SHA-512 TOTPs (``oath_totp_generate2``), but no backend wraps them.
+ALGORITHMS = ('sha1',)
+
+_probed = {}
+_lock = threading.Lock()
+
+
+def version_info(version):
+    """
+    Parse a dotted version number.
+
+    >>> version_info(b'2.6.1')
+    (2, 6, 1)
+
+    :param bytes version: The version number.
+    :rtype: :func:`tuple` of :func:`int`
+    """
+    return tuple(int(match.group()) for match in
+                 re.finditer(br'\d+', to_bytes(version).split(b'-')[0]))
+
+
+def _has_symbol(backend, name):
+    """
+    Determine whether a function declared by the backend is exported by
+    liboath. Only the CFFI backend in ABI mode resolves symbols at runtime;
+    the others fail to build or import if a symbol is missing.
+    """
+    lib = getattr(backend, 'c', None)
+    if lib is None:
+        return True
+    try:
+        getattr(lib, name)
+    except AttributeError:
+        return False
+    return True
+
+
+def _probe(backend):
+    version = to_bytes(backend.library_version)
+    info = version_info(version)
+    return Capabilities(
+        backend=backend.__name__, version=version, version_info=info,
+        base32_decode=(hasattr(backend, 'base32_decode') and
+                       info >= BASE32_VERSION and
+                       _has_symbol(backend, 'oath_base32_decode')),
+        totp_validate2=(info >= TOTP_VALIDATE2_VERSION and
+                        _has_symbol(backend, 'oath_totp_validate2')),
+        algorithms=ALGORITHMS)
+
+
+def probe(backend):
+    """
+    Retrieve the capabilities of a backend, probing it on the first call.
+
+    :param backend: One of the ``oath_toolkit.impl_*`` modules.
+    :rtype: :class:`oath_toolkit.types.Capabilities`
+    """
+    try:
+        return _probed[backend.__name__]
+    except KeyError:
+        with _lock:
+            capabilities = _probed.get(backend.__name__)
+            if capabilities is None:
+                capabilities = _probed[backend.__name__] = _probe(backend)
+        return capabilities
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-cdef extern from 'liboath/oath.h':
+cdef extern from 'liboath/oath.h' nogil:
     ctypedef unsigned long time_t
     ctypedef unsigned long uint64_t
     ctypedef bint bool
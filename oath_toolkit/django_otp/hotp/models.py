@@ -14,7 +14,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from django.db.models import BigIntegerField, F
+from django.db.models import BigIntegerField
 from django.utils.translation import gettext_lazy as __
 from ..models import OToolkitDevice
 
@@ -45,12 +45,18 @@ class OToolkitHOTPDevice(OToolkitDevice):
         verbose_name = u'OATH Toolkit HOTP Device'
 
     def verify_token(self, token):
-        verified = self._do_verify_token(token, self.oath.hotp_validate,
-                                         self.counter)
-        if verified is not False:
-            self.counter = F('counter') + verified.relative + 1
-            self.save()
-            # Update the counter value in this instance
-            self.counter = self.__class__.objects.get(pk=self.pk).counter
-            verified = True
-        return verified
+        counter = self.counter
+        position = self._do_verify_token(token, self.oath.try_hotp_validate,
+                                         counter)
+        if position < 0:
+            return False
+        # Compare-and-set: if another request advanced the counter since this
+        # instance was loaded, no row matches and the token is rejected, so
+        # each token can only be used once.
+        new_counter = counter + position + 1
+        updated = self.__class__.objects.filter(
+            pk=self.pk, counter=counter).update(counter=new_counter)
+        if not updated:
+            return False
+        self.counter = new_counter
+        return True
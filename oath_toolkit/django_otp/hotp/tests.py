@@ -66,3 +66,20 @@ class HOTPTest(TestCase):
 
     def test_bad_value(self):
         self.assert_token_not_verified(b'123456')
+
+    def test_single_query(self):
+        with self.assertNumQueries(1):
+            self.assert_token_verified(self.tokens[0], 1)
+
+    def test_concurrent_verification(self):
+        # Two requests which loaded the device before either verified it.
+        other = self.device.__class__.objects.get(pk=self.device.pk)
+        self.assert_token_verified(self.tokens[0], 1)
+        self.assertFalse(other.verify_token(self.tokens[0]))
+        self.assertFalse(other.verify_token(self.tokens[1]))
+        self.assertEqual(1, self.device.__class__.objects.get(
+            pk=self.device.pk).counter)
+
+    def test_replay(self):
+        self.assert_token_verified(self.tokens[0], 1)
+        self.assertFalse(self.device.verify_token(self.tokens[0]))
@@ -17,22 +17,61 @@
 
 from binascii import hexlify, unhexlify
 from django.contrib.sites.models import get_current_site
+from django.db import transaction
 from django.db.models import BinaryField, PositiveSmallIntegerField
-from django_otp.models import Device
-from oath_toolkit import OATH, qrcode
-from oath_toolkit._compat import to_bytes
-from oath_toolkit.exc import OATHError
-from random import SystemRandom
-
-ASCII_MIN = 0
-ASCII_MAX = 127
+from django_otp.models import Device, DeviceManager
+from oath_toolkit import OATH, qrcode, uri
+import os
+
 SECRET_SIZE = 40
-rand = SystemRandom()
 
 
 def _random_data():
-    return b''.join([to_bytes(chr(rand.randint(ASCII_MIN, ASCII_MAX)), 'ascii')
-                    for _ in range(SECRET_SIZE)])
+    return os.urandom(SECRET_SIZE)
+
+
+class OToolkitDeviceManager(DeviceManager):
+
+    """
+    Manager for :class:`OToolkitDevice` subclasses.
+    """
+
+    def bulk_provision(self, users, issuer, batch_size=1000, **fields):
+        r"""
+        Create one device per user, with random secrets, in batches.
+
+        All of the secrets are read from the operating system's random number
+        generator in a single call, then sliced per device.
+
+        :param users: The users to create devices for.
+        :type users: iterable of user model instances
+        :param str issuer: The issuer name used in the provisioning URIs.
+        :param int batch_size: The maximum number of devices to insert per
+                               query.
+        :param \*\*fields: Additional field values for every device (e.g.,
+                           ``name``, ``digits``, ``window``).
+        :return: The provisioning URIs (see :func:`oath_toolkit.uri.generate`),
+                 in the same order as ``users``.
+        :rtype: :func:`list` of :func:`str`
+        """
+        users = list(users)
+        data = os.urandom(SECRET_SIZE * len(users))
+        builder = uri.URIBuilder(self.model.oath_type, issuer)
+        uris = []
+        with transaction.atomic(using=self.db):
+            for start in range(0, len(users), batch_size):
+                devices = []
+                for i, user in enumerate(users[start:start + batch_size],
+                                         start):
+                    offset = i * SECRET_SIZE
+                    device = self.model(
+                        user=user, secret=data[offset:offset + SECRET_SIZE],
+                        **fields)
+                    devices.append(device)
+                    uris.append(builder(device.secret, user.username,
+                                        getattr(device, 'counter', None)))
+                self.bulk_create(devices)
+        return uris
 
 
 class OToolkitDevice(Device):
@@ -77,6 +116,8 @@ class OToolkitDevice(Device):
     window = PositiveSmallIntegerField(default=1)
     digits = PositiveSmallIntegerField(default=6, choices=[(6, 6), (8, 8)])
 
+    objects = OToolkitDeviceManager()
+
     class Meta:
         abstract = True
 
@@ -91,6 +132,21 @@ class OToolkitDevice(Device):
                                self.user.username, site.name,
                                border=2, box_size=4)
 
+    def secret_qrcode_image(self, request, image_format='png'):
+        """
+        Rendered QR code image based on the secret, cached if the QR image
+        cache is enabled (see
+        :func:`oath_toolkit.cache.enable_qr_image_cache`).
+
+        :param str image_format: One of the keys of
+                                 :data:`oath_toolkit.qrcode.CONTENT_TYPES`.
+        :rtype: :class:`oath_toolkit.types.QRImage`
+        """
+        site = get_current_site(request)
+        return qrcode.render(self.oath_type, self.secret, self.user.username,
+                             site.name, getattr(self, 'counter', None),
+                             image_format, border=2, box_size=4)
+
     @property
     def secret_base32(self):
         """
@@ -123,12 +179,15 @@ class OToolkitDevice(Device):
             self._oath = OATH()
         return self._oath
 
-    def _do_verify_token(self, token, validator_func, *args):
+    def _do_verify_token(self, token, validator_func, *args, **kwargs):
+        """
+        Validate a token via one of the non-raising ``OATH.try_*_validate``
+        methods, and return its result.
+        """
         token = bytes(token)
         if len(token) != self.digits:
             token = token.rjust(self.digits, b'0')
         args += (self.window, token)
-        try:
-            return validator_func(bytes(self.secret), *args)
-        except OATHError:
-            return False
+        # BinaryField values may be memoryviews, which the backends accept
+        # without copying.
+        return validator_func(self.secret, *args, **kwargs)
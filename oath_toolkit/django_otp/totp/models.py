@@ -14,7 +14,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from django.db.models import BigIntegerField, PositiveSmallIntegerField
+from django.db.models import (
+    BigIntegerField, PositiveSmallIntegerField, SmallIntegerField)
 from django.utils.translation import gettext_lazy as __
 from time import time
 from ..models import OToolkitDevice
@@ -46,6 +47,36 @@ class OToolkitTOTPDevice(OToolkitDevice):
         Defaults to ``0``.
 
         :type: :class:`django.db.models.BigIntegerField`
+
+    .. attribute:: drift
+
+        The number of time steps by which the device's clock was off during
+        the last successful verification. That time step is tested first,
+        before the rest of the window. In
+        :class:`django_otp.plugins.otp_totp.models.TOTPDevice`, this field is
+        named ``drift``.
+
+        Defaults to ``0``.
+
+        This app has no migrations, so ``syncdb`` does not add this field to
+        a table created by an earlier version. Add it manually:
+
+        .. code-block:: sql
+
+            ALTER TABLE totp_otoolkittotpdevice
+                ADD COLUMN drift smallint NOT NULL DEFAULT 0;
+
+        :type: :class:`django.db.models.SmallIntegerField`
+
+    .. attribute:: replay_store
+
+        If set, rejects tokens that were already accepted, without a database
+        query. Shared by every device of the class, which are identified by
+        their ``persistent_id``.
+
+        Defaults to :data:`None`.
+
+        :type: :class:`oath_toolkit.replay.ReplayStore`
     """
 
     select_name = __(u'Time-based OTP (TOTP) generator')
@@ -53,14 +84,29 @@ class OToolkitTOTPDevice(OToolkitDevice):
 
     time_step_size = PositiveSmallIntegerField(default=30)
     start_offset = BigIntegerField(default=0)
+    drift = SmallIntegerField(default=0)
+
+    replay_store = None
 
     class Meta:
         verbose_name = u'OATH Toolkit TOTP Device'
 
     def verify_token(self, token):
-        verified = self._do_verify_token(token, self.oath.totp_validate,
-                                         time(), self.time_step_size,
-                                         self.start_offset)
-        if verified is not False:
-            verified = True
-        return verified
+        now = time()
+        retval, otp_pos = self._do_verify_token(token,
+                                                self.oath.try_totp_validate,
+                                                now, self.time_step_size,
+                                                self.start_offset,
+                                                drift=self.drift)
+        if retval < 0:
+            return False
+        if self.replay_store is not None and \
+                not self.replay_store.accept_totp(self.persistent_id, otp_pos,
+                                                  now, self.time_step_size,
+                                                  self.start_offset,
+                                                  self.window):
+            return False
+        if otp_pos != self.drift:
+            self.drift = otp_pos
+            self.save(update_fields=['drift'])
+        return True
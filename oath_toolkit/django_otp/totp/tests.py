@@ -32,6 +32,8 @@
 from django.db import IntegrityError
 from django.test.client import RequestFactory
 from django_otp.tests import TestCase
+from oath_toolkit.django_otp.views import qrcode_response
+from oath_toolkit.replay import ReplayStore
 from oath_toolkit.tests import unittest
 from qrcode.image.base import BaseImage
 import sys
@@ -81,6 +83,18 @@ class TOTPTest(TestCase):
         qrcode = self.device.secret_qrcode(request)
         self.assertIsInstance(qrcode, BaseImage)
 
+    @skipIfPy32
+    def test_qrcode_response(self):
+        response = qrcode_response(self.factory.get('/'), self.device)
+        self.assertEqual(200, response.status_code)
+        self.assertEqual('image/png', response['Content-Type'])
+        etag = response['ETag']
+        response = qrcode_response(
+            self.factory.get('/', HTTP_IF_NONE_MATCH='W/' + etag),
+            self.device)
+        self.assertEqual(304, response.status_code)
+        self.assertEqual(etag, response['ETag'])
+
     def test_single(self):
         results = [self.device.verify_token(token) for token in self.tokens]
 
@@ -91,3 +105,37 @@ class TOTPTest(TestCase):
         results = [self.device.verify_token(token) for token in self.tokens]
 
         self.assertEqual(results, [False] * 2 + [True] * 3 + [False] * 5)
+
+    def test_replay(self):
+        OToolkitTOTPDevice.replay_store = ReplayStore()
+        try:
+            self.assertTrue(self.device.verify_token(self.tokens[3]))
+            self.assertFalse(self.device.verify_token(self.tokens[3]))
+        finally:
+            OToolkitTOTPDevice.replay_store = None
+
+    def test_drift(self):
+        self.device.window = 1
+        self.assertTrue(self.device.verify_token(self.tokens[4]))
+        self.assertEqual(1, self.device.drift)
+        self.assertTrue(self.device.verify_token(self.tokens[4]))
+        self.assertTrue(self.device.verify_token(self.tokens[2]))
+        self.assertEqual(-1, self.device.drift)
+
+    def test_bulk_provision(self):
+        users = [self.create_user(name, 'password')
+                 for name in ('bob', 'carol', 'dave')]
+        uris = OToolkitTOTPDevice.objects.bulk_provision(
+            users, 'Example', batch_size=2, name='Phone')
+        self.assertEqual(3, len(uris))
+        devices = OToolkitTOTPDevice.objects.filter(
+            user__in=users).order_by('user__username')
+        secrets = set()
+        for user, device, uri in zip(users, devices, uris):
+            self.assertEqual(user, device.user)
+            self.assertEqual('Phone', device.name)
+            self.assertEqual(40, len(device.secret))
+            secrets.add(bytes(device.secret))
+            self.assertTrue(uri.startswith(
+                'otpauth://totp/Example:{0}?secret='.format(user.username)))
+        self.assertEqual(3, len(secrets))
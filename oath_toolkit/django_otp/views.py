@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2014 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""View helpers for OATH Toolkit-based OTP Devices."""
+
+from django.http import HttpResponse, HttpResponseNotModified
+
+
+def _etag_matches(etag, if_none_match):
+    """
+    Determine whether an ``If-None-Match`` header value matches an entity tag
+    (using the weak comparison function, as specified by :rfc:`7232`).
+    """
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate == '*':
+            return True
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def qrcode_response(request, device, image_format='png'):
+    """
+    Serve the QR code image of a device's secret.
+
+    The image is rendered via :meth:`~oath_toolkit.django_otp.models.\
+OToolkitDevice.secret_qrcode_image` (and therefore cached, if the QR image
+    cache is enabled). Conditional ``GET`` requests whose ``If-None-Match``
+    header matches the image's ``ETag`` receive a ``304 Not Modified``
+    response without a body.
+
+    :param request: The current request.
+    :type request: :class:`django.http.HttpRequest`
+    :param device: The device whose secret is encoded in the QR code.
+    :type device: :class:`~oath_toolkit.django_otp.models.OToolkitDevice`
+    :param str image_format: One of the keys of
+                             :data:`oath_toolkit.qrcode.CONTENT_TYPES`.
+    :rtype: :class:`django.http.HttpResponse`
+    """
+    image = device.secret_qrcode_image(request, image_format)
+    etag = '"{0}"'.format(image.etag)
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match and _etag_matches(etag, if_none_match):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(image.data, content_type=image.content_type)
+    response['ETag'] = etag
+    # The image contains the secret: never store it in shared caches, and
+    # always revalidate it.
+    response['Cache-Control'] = 'private, no-cache'
+    return response
@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2015 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Bulk generation of enrollment kits: the provisioning URI and QR code of each
+user's device, written to a directory or a ZIP archive.
+
+The QR codes are rendered in a pool of worker processes, in bounded batches,
+so that memory usage does not depend on the number of users.
+
+The kits contain the users' secrets, so the files (and the ZIP archive) are
+only readable by their owner, as is the output directory if it is created.
+"""
+
+from __future__ import absolute_import, division
+
+from . import qrcode, uri
+from .types import EnrollmentStats
+import io
+from itertools import islice
+import multiprocessing
+import os
+import re
+import shutil
+import tempfile
+import time
+import zipfile
+
+MANIFEST_NAME = 'manifest.csv'
+FILE_MODE = 0o600
+DIRECTORY_MODE = 0o700
+_UNSAFE_FILENAME_CHARS = re.compile(r'[^A-Za-z0-9._@-]')
+
+
+def _open_private(path):
+    """
+    Open a file for writing in binary mode, only readable by its owner.
+    """
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC |
+                 getattr(os, 'O_BINARY', 0), FILE_MODE)
+    try:
+        # The mode only applies to new files.
+        os.chmod(path, FILE_MODE)
+        return os.fdopen(fd, 'wb')
+    except Exception:
+        os.close(fd)
+        raise
+
+
+class DirectoryWriter(object):
+
+    """
+    Writes enrollment kit files to a directory, which is created if needed.
+
+    :param str path: The directory.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        #: Where the temporary files of the kits are written.
+        self.directory = path
+        if not os.path.isdir(path):
+            os.makedirs(path, DIRECTORY_MODE)
+
+    def write(self, name, data):
+        with _open_private(os.path.join(self.path, name)) as f:
+            f.write(data)
+
+    def write_file(self, name, path):
+        with open(path, 'rb') as src:
+            with _open_private(os.path.join(self.path, name)) as dst:
+                shutil.copyfileobj(src, dst)
+
+    def close(self):
+        pass
+
+
+class ZipWriter(object):
+
+    """
+    Writes enrollment kit files to a ZIP archive.
+
+    QR code images are already compressed, so the files are stored as-is.
+
+    :param str path: The archive file.
+    """
+
+    def __init__(self, path):
+        #: Where the temporary files of the kits are written.
+        self.directory = os.path.dirname(os.path.abspath(path))
+        self.file = _open_private(path)
+        self.archive = zipfile.ZipFile(self.file, 'w', zipfile.ZIP_STORED)
+
+    def write(self, name, data):
+        info = zipfile.ZipInfo(name, time.localtime()[:6])
+        info.external_attr = FILE_MODE << 16
+        self.archive.writestr(info, data)
+
+    def write_file(self, name, path):
+        self.archive.write(path, name, zipfile.ZIP_DEFLATED)
+
+    def close(self):
+        try:
+            self.archive.close()
+        finally:
+            self.file.close()
+
+
+def _writer_for(output):
+    if output.lower().endswith('.zip'):
+        return ZipWriter(output)
+    return DirectoryWriter(output)
+
+
+def _csv_row(fields):
+    return u','.join(u'"{0}"'.format(field.replace(u'"', u'""'))
+                     for field in fields) + u'\n'
+
+
+def _render(job):
+    """
+    Render one enrollment kit. Runs in a worker process.
+
+    :return: The index of the entry, and the QR code image data.
+    """
+    index, oath_uri, kwargs = job
+    image = qrcode.from_uri(oath_uri, **kwargs)
+    stream = io.BytesIO()
+    image.save(stream)
+    return index, stream.getvalue()
+
+
+def filename(index, user, extension='.png'):
+    """
+    Compute the name of the QR code file of an entry.
+
+    :param int index: The position of the entry.
+    :param str user: The username.
+    :param str extension: The file extension of the image format.
+    :rtype: :func:`str`
+    """
+    return '{0:06d}_{1}{2}'.format(index, _UNSAFE_FILENAME_CHARS.sub(
+        '_', user), extension)
+
+
+def _temporary_manifest(writer):
+    """
+    Create the temporary file of the manifest, next to the output.
+
+    The manifest holds the secrets, so it is never written to the shared
+    temporary directory.
+
+    :return: The file descriptor and path of the temporary file.
+    """
+    try:
+        return tempfile.mkstemp(prefix='.manifest-', suffix='.csv',
+                                dir=writer.directory)
+    except Exception:
+        writer.close()
+        raise
+
+
+def _cleanup(pool, completed, fd, manifest, manifest_path, writer):
+    """
+    Stop the worker processes, and remove the temporary manifest.
+    """
+    try:
+        if pool is not None:
+            # Do not wait for the pending renders if something failed.
+            if completed:
+                pool.close()
+            else:
+                pool.terminate()
+            pool.join()
+    finally:
+        if manifest is None:
+            os.close(fd)
+        elif not manifest.closed:
+            manifest.close()
+        os.remove(manifest_path)
+        writer.close()
+
+
+def generate(entries, output, issuer, key_type='totp', counter=None,
+             processes=None, batch_size=256, progress=None, extension='.png',
+             **kwargs):
+    r"""
+    Generate the enrollment kits for many users.
+
+    Each QR code is written to its own file (see :func:`filename`), and a
+    ``manifest.csv`` file lists the file name, username, and provisioning URI
+    of every entry.
+
+    :param entries: The users and their secret keys.
+    :type entries: iterable of ``(user, secret)`` tuples
+    :param str output: The output directory, or ZIP archive if it ends with
+                       ``.zip``.
+    :param str issuer: issuer name
+    :param str key_type: the auth type, either ``totp`` or ``hotp``
+    :param counter: initial counter value (HOTP only, defaults to ``0``)
+    :type counter: :func:`int` or :data:`None`
+    :param processes: The number of worker processes. If :data:`None`, uses
+                      one per CPU. If ``0``, renders in the current process.
+    :type processes: :func:`int` or :data:`None`
+    :param int batch_size: The maximum number of entries being rendered (and
+                           held in memory) at once.
+    :param callable progress: If specified, called with the
+                              :class:`oath_toolkit.types.EnrollmentStats`
+                              after each batch.
+    :param str extension: The file extension of the image format.
+    :param \*\*kwargs: Arguments passed to :func:`oath_toolkit.qrcode.from_uri`
+    :rtype: :class:`oath_toolkit.types.EnrollmentStats`
+    """
+    if key_type == 'hotp' and counter is None:
+        counter = 0
+    entries = iter(entries)
+    builder = uri.URIBuilder(key_type, issuer)
+    writer = _writer_for(output)
+    # The manifest is streamed to a temporary file, then copied to the output
+    # once complete.
+    fd, manifest_path = _temporary_manifest(writer)
+    manifest = pool = None
+    count = size = 0
+    completed = False
+    start = time.time()
+    stats = EnrollmentStats(count=0, bytes=0, elapsed=0.0, rate=0.0)
+    try:
+        manifest = io.open(fd, 'w', encoding='utf-8')
+        manifest.write(_csv_row([u'filename', u'user', u'uri']))
+        if processes != 0:
+            pool = multiprocessing.Pool(processes)
+        while True:
+            entries_batch = list(islice(entries, batch_size))
+            if not entries_batch:
+                break
+            users = [user for user, _ in entries_batch]
+            batch = [(count + i, builder(secret, user, counter), kwargs)
+                     for i, (user, secret) in enumerate(entries_batch)]
+            if pool is None:
+                results = map(_render, batch)
+            else:
+                results = pool.imap_unordered(_render, batch)
+            for index, data in results:
+                user, oath_uri = users[index - count], batch[index - count][1]
+                name = filename(index, user, extension)
+                writer.write(name, data)
+                manifest.write(_csv_row([name, user, oath_uri]))
+                size += len(data)
+            count += len(batch)
+            elapsed = time.time() - start
+            stats = EnrollmentStats(count=count, bytes=size, elapsed=elapsed,
+                                    rate=count / elapsed if elapsed else 0.0)
+            if progress is not None:
+                progress(stats)
+        manifest.close()
+        writer.write_file(MANIFEST_NAME, manifest_path)
+        completed = True
+    finally:
+        _cleanup(pool, completed, fd, manifest, manifest_path, writer)
+    return stats
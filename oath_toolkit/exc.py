@@ -15,6 +15,14 @@
 # limitations under the License.
 """Exceptions that are specific to :mod:`oath_toolkit`."""
 
+# Return codes (``oath_rc``) from liboath that are used outside of the
+# backends.
+OATH_OK = 0
+OATH_INVALID_DIGITS = -2
+OATH_INVALID_OTP = -6
+OATH_REPLAYED_OTP = -7
+OATH_INVALID_BASE32 = -20
+
 
 class OATHError(Exception):
 
@@ -18,6 +18,9 @@ CFFI_-based bindings for OATH Toolkit.
 
 Most of the docs and declarations come from the OATH Toolkit docs_.
 
+If the out-of-line (API mode) extension module built by ``setup.py`` is
+available, it is used. Otherwise, liboath is loaded at runtime in ABI mode.
+
 .. _CFFI: http://cffi.readthedocs.org/
 .. _docs: http://www.nongnu.org/oath-toolkit/liboath-api/liboath-oath.html
 """
@@ -28,100 +31,28 @@ from ._compat import integer_types, to_bytes
 from .exc import OATHError
 from .types import OTPPosition
 
+from array import array
 import atexit
 from cffi import FFI
 import os
+import threading
 
 LIBRARY_NAME = os.environ.get('LIBOATH_NAME', 'oath')
-
-declarations = '''
-typedef _Bool bool;
-/* cffi doesn't know about time_t */
-typedef unsigned long long time_t;
-
-/* defines */
-static char *const OATH_VERSION;
-static time_t const OATH_TOTP_DEFAULT_START_TIME;
-static const int OATH_TOTP_DEFAULT_TIME_STEP_SIZE;
-
-typedef enum {
-  OATH_OK = 0,
-  OATH_CRYPTO_ERROR = -1,
-  OATH_INVALID_DIGITS = -2,
-  OATH_PRINTF_ERROR = -3,
-  OATH_INVALID_HEX = -4,
-  OATH_TOO_SMALL_BUFFER = -5,
-  OATH_INVALID_OTP = -6,
-  OATH_REPLAYED_OTP = -7,
-  OATH_BAD_PASSWORD = -8,
-  OATH_INVALID_COUNTER = -9,
-  OATH_INVALID_TIMESTAMP = -10,
-  OATH_NO_SUCH_FILE = -11,
-  OATH_UNKNOWN_USER = -12,
-  OATH_FILE_SEEK_ERROR = -13,
-  OATH_FILE_CREATE_ERROR = -14,
-  OATH_FILE_LOCK_ERROR = -15,
-  OATH_FILE_RENAME_ERROR = -16,
-  OATH_FILE_UNLINK_ERROR = -17,
-  OATH_TIME_ERROR = -18,
-  OATH_STRCMP_ERROR = -19,
-  OATH_INVALID_BASE32 = -20,
-  OATH_BASE32_OVERFLOW = -21,
-  OATH_MALLOC_ERROR = -22,
-  OATH_FILE_FLUSH_ERROR = -23,
-  OATH_FILE_SYNC_ERROR = -24,
-  OATH_FILE_CLOSE_ERROR = -25,
-  /* When adding anything here, update OATH_LAST_ERROR, errors.c
-     and tests/tst_errors.c. */
-  OATH_LAST_ERROR = -25
-} oath_rc;
-
-/* from oath-toolkit */
-const char * oath_strerror               (oath_rc err);
-const char * oath_strerror_name          (oath_rc err);
-
-/* for some reason, need to keep the following function in,
- * or it segfaults.
- */
-oath_rc      oath_init                   (void);
-oath_rc      oath_done                   (void);
-const char * oath_check_version          (const char *req_version);
-int          oath_base32_decode          (const char *in,
-                                          size_t inlen,
-                                          char **out,
-                                          size_t *outlen);
-oath_rc      oath_hotp_generate          (const char *secret,
-                                          size_t secret_length,
-                                          uint64_t moving_factor,
-                                          unsigned  digits,
-                                          bool add_checksum,
-                                          size_t truncation_offset,
-                                          char *output_otp);
-oath_rc      oath_hotp_validate          (const char *secret,
-                                          size_t secret_length,
-                                          uint64_t start_moving_factor,
-                                          size_t window,
-                                          const char *otp);
-oath_rc      oath_totp_generate          (const char *secret,
-                                          size_t secret_length,
-                                          time_t now,
-                                          unsigned  time_step_size,
-                                          time_t start_offset,
-                                          unsigned  digits,
-                                          char *output_otp);
-oath_rc      oath_totp_validate2         (const char *secret,
-                                          size_t secret_length,
-                                          time_t now,
-                                          unsigned  time_step_size,
-                                          time_t start_offset,
-                                          size_t window,
-                                          int *otp_pos,
-                                          const char *otp);
-'''
-
-_ffi = FFI()
-_ffi.cdef(declarations)
-c = _ffi.dlopen(LIBRARY_NAME)
+# Room for the OTP (at most 8 digits), a checksum digit (older liboath
+# versions), and the NUL terminator.
+OUTPUT_SIZE = 10
+
+try:
+    # API mode: the extension module compiled by setup.py.
+    from ._oath_cffi import ffi as _ffi, lib as c
+    ffi_mode = 'api'
+except ImportError:
+    # ABI mode: parse the declarations and load liboath at runtime.
+    from ._cffi_build import declarations
+    _ffi = FFI()
+    _ffi.cdef(declarations)
+    c = _ffi.dlopen(LIBRARY_NAME)
+    ffi_mode = 'abi'
 
 
 def _handle_retval(retval, positive_ok=False):
@@ -147,6 +78,52 @@ atexit.register(c.oath_done)
 library_version = _ffi.string(c.oath_check_version(b'0'))
 
 
+def strerror(code):
+    """
+    Retrieve the error message for an ``oath_rc`` return code.
+
+    :param int code: The return code.
+    :rtype: :func:`bytes`
+    """
+    return _ffi.string(c.oath_strerror(_ffi.cast('oath_rc', code)))
+
+
+_local = threading.local()
+
+
+def _output_buffer():
+    """
+    Retrieve the output buffer for generated OTPs. It is allocated once per
+    thread, and reused for every call.
+    """
+    try:
+        return _local.output
+    except AttributeError:
+        _local.output = output = _ffi.new('char[]', OUTPUT_SIZE)
+        return output
+
+
+def _secret_buffer(secret):
+    """
+    Pass a secret to liboath without copying it: :func:`bytes` objects are
+    passed as-is, other bytes-like objects (:func:`bytearray`,
+    :class:`memoryview`, :mod:`mmap`, etc.) via :meth:`FFI.from_buffer`.
+    """
+    if isinstance(secret, bytes):
+        return secret
+    return _ffi.from_buffer(to_bytes(secret))
+
+
+def _otp_string(otp):
+    """
+    Convert a one-time password to the NUL-terminated string that liboath
+    expects.
+    """
+    if isinstance(otp, bytes):
+        return otp
+    return bytes(bytearray(to_bytes(otp)))
+
+
 def check_library_version(version):
     """
     Determine whether the library version is greater than or equal to the
@@ -197,12 +174,32 @@ def hotp_generate(secret, moving_factor, digits, add_checksum=False,
     """
     if truncation_offset < 0:
         truncation_offset = (2 ** 32) - 1
-    generated = _ffi.new('char *')
-    secret = to_bytes(secret)
+    generated = _output_buffer()
+    secret = _secret_buffer(secret)
     retval = c.oath_hotp_generate(secret, len(secret), moving_factor, digits,
                                   add_checksum, truncation_offset, generated)
     _handle_retval(retval)
-    return _ffi.string(generated, digits)
+    return _ffi.buffer(generated, digits)[:]
+
+
+def try_hotp_validate(secret, start_moving_factor, window, otp):
+    """
+    Validate a one-time password generated using the HOTP algorithm
+    (:rfc:`4226`), without raising an exception if it is invalid.
+
+    :param bytes secret: The secret used to generate the one-time password.
+    :param int start_moving_factor: Unsigned, can be :func:`long`, in theory.
+                                    The start counter in the OTP stream.
+    :param int window: The number of OTPs after the start offset OTP
+                       to test.
+    :param bytes otp: The one-time password to validate.
+    :return: The position in the OTP window, where ``0`` is the first position,
+             or a negative ``oath_rc`` error code if it is invalid.
+    :rtype: :func:`int`
+    """
+    secret = _secret_buffer(secret)
+    return c.oath_hotp_validate(secret, len(secret), start_moving_factor,
+                                window, _otp_string(otp))
 
 
 def hotp_validate(secret, start_moving_factor, window, otp):
@@ -220,8 +217,7 @@ def hotp_validate(secret, start_moving_factor, window, otp):
     :rtype: :class:`oath_toolkit.types.OTPPosition`
     :raise: :class:`OATHError` if invalid
     """
-    retval = c.oath_hotp_validate(secret, len(secret), start_moving_factor,
-                                  window, otp)
+    retval = try_hotp_validate(secret, start_moving_factor, window, otp)
     _handle_retval(retval, True)
     return OTPPosition(absolute=None, relative=retval)
 
@@ -243,14 +239,46 @@ def totp_generate(secret, now, time_step_size, time_offset, digits):
     """
     if time_step_size < 0:
         time_step_size = 30  # c.OATH_TOTP_DEFAULT_TIME_STEP_SIZE
-    generated = _ffi.new('char *')
-    secret = to_bytes(secret)
+    generated = _output_buffer()
+    secret = _secret_buffer(secret)
     if not isinstance(now, integer_types):
         now = int(now)
     retval = c.oath_totp_generate(secret, len(secret), now, time_step_size,
                                   time_offset, digits, generated)
     _handle_retval(retval)
-    return _ffi.string(generated, digits)
+    return _ffi.buffer(generated, digits)[:]
+
+
+def try_totp_validate(secret, now, time_step_size, start_offset, window,
+                      otp):
+    """
+    Validate a one-time password generated using the TOTP algorithm
+    (:rfc:`6238`), without raising an exception if it is invalid.
+
+    :param bytes secret: The secret used to generate the one-time password.
+    :param int now: The UNIX timestamp (usually the current one)
+    :param int time_step_size: Unsigned, the time step system parameter. If
+                               set to a negative value, defaults to ``30``.
+    :param int start_offset: The UNIX timestamp of when to start counting time
+                             steps (usually should be ``0``).
+    :param int window: The number of OTPs before and after the start OTP
+                       to test.
+    :param bytes otp: The one-time password to validate.
+    :return: The absolute position in the OTP window (or a negative
+             ``oath_rc`` error code if it is invalid), and the relative
+             position.
+    :rtype: :func:`tuple`
+    """
+    if time_step_size < 0:
+        time_step_size = 30  # c.OATH_TOTP_DEFAULT_TIME_STEP_SIZE
+    addr_otp_pos = _ffi.new('int *')
+    if not isinstance(now, integer_types):
+        now = int(now)
+    secret = _secret_buffer(secret)
+    retval = c.oath_totp_validate2(secret, len(secret), now, time_step_size,
+                                   start_offset, window, addr_otp_pos,
+                                   _otp_string(otp))
+    return retval, addr_otp_pos[0]
 
 
 def totp_validate(secret, now, time_step_size, start_offset, window, otp):
@@ -272,12 +300,47 @@ def totp_validate(secret, now, time_step_size, start_offset, window, otp):
     :rtype: :class:`oath_toolkit.types.OTPPosition`
     :raise: :class:`OATHError` if invalid
     """
+    retval, otp_pos = try_totp_validate(secret, now, time_step_size,
+                                        start_offset, window, otp)
+    _handle_retval(retval, True)
+    return OTPPosition(absolute=retval, relative=otp_pos)
+
+
+def totp_validate_many(secrets, otps, now, time_step_size, start_offset,
+                       window):
+    """
+    Validate a batch of one-time passwords generated using the TOTP algorithm
+    (:rfc:`6238`), in a single call.
+
+    Unlike :func:`totp_validate`, an invalid OTP does not raise an exception.
+
+    :param secrets: The secrets used to generate the one-time passwords.
+    :type secrets: sequence of :func:`bytes`
+    :param otps: The one-time passwords to validate, in the same order as
+                 ``secrets``.
+    :type otps: sequence of :func:`bytes`
+    :param int now: The UNIX timestamp (usually the current one)
+    :param int time_step_size: Unsigned, the time step system parameter. If
+                               set to a negative value, defaults to ``30``.
+    :param int start_offset: The UNIX timestamp of when to start counting time
+                             steps (usually should be ``0``).
+    :param int window: The number of OTPs before and after the start OTP
+                       to test.
+    :return: For each OTP, the absolute position in the OTP window, or a
+             negative ``oath_rc`` error code if it is invalid.
+    :rtype: :class:`array.array` of type ``i``
+    :raise: :class:`ValueError` if ``secrets`` and ``otps`` differ in length
+    """
+    if len(secrets) != len(otps):
+        raise ValueError('secrets and otps must have the same length')
     if time_step_size < 0:
         time_step_size = 30  # c.OATH_TOTP_DEFAULT_TIME_STEP_SIZE
     addr_otp_pos = _ffi.new('int *')
     if not isinstance(now, integer_types):
         now = int(now)
-    retval = c.oath_totp_validate2(secret, len(secret), now, time_step_size,
-                                   start_offset, window, addr_otp_pos, otp)
-    _handle_retval(retval, True)
-    return OTPPosition(absolute=retval, relative=addr_otp_pos[0])
+    validate = c.oath_totp_validate2
+    return array('i', [validate(secret, len(secret), now, time_step_size,
+                                start_offset, window, addr_otp_pos,
+                                _otp_string(otp))
+                       for secret, otp in zip(map(_secret_buffer, secrets),
+                                              otps)])
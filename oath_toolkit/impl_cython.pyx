@@ -1,8 +1,12 @@
 # -*- coding: utf-8 -*-
 
 from oath_toolkit cimport coath_toolkit as c
+from cpython cimport array
+from cython.parallel cimport prange
 from libc cimport stdlib
+from libc.string cimport memcpy
 
+import array
 import atexit
 
 from .exc import OATHError
@@ -31,6 +35,50 @@ cdef int _handle_retval(int retval, bint positive_ok) except -1:
 
 library_version = c.oath_check_version('0')
 
+cdef array.array _int_array_template = array.array('i', [])
+
+# liboath accepts at most 8 digits, and NUL-terminates the generated OTP.
+DEF MAX_DIGITS = 8
+# Room for the OTP, a checksum digit (older liboath versions), and the NUL.
+DEF OUTPUT_SIZE = MAX_DIGITS + 2
+DEF DYNAMIC_TRUNCATION = 4294967295
+
+cdef const char* _buffer_ptr(const unsigned char[::1] data) except NULL:
+    """
+    Retrieve a pointer to the contents of a contiguous buffer (:func:`bytes`,
+    :func:`bytearray`, :class:`memoryview`, :mod:`mmap`, etc.), without
+    copying it.
+    """
+    if data is None:
+        raise TypeError('a bytes-like object is required, not None')
+    if data.shape[0] == 0:
+        return ''
+    return <const char*>&data[0]
+
+cdef int _copy_otp(const unsigned char[::1] otp, char* output) except? -1:
+    """
+    Copy a one-time password into a buffer of ``MAX_DIGITS + 1`` bytes, as
+    liboath expects a NUL-terminated string.
+
+    :return: ``OATH_OK``, or ``OATH_INVALID_DIGITS`` if it is too long.
+    """
+    cdef const char* c_otp = _buffer_ptr(otp)
+    cdef Py_ssize_t length = otp.shape[0]
+    if length > MAX_DIGITS:
+        return c.OATH_INVALID_DIGITS
+    memcpy(output, c_otp, length)
+    output[length] = 0
+    return c.OATH_OK
+
+cpdef bytes strerror(int code):
+    """
+    Retrieve the error message for an ``oath_rc`` return code.
+
+    :param int code: The return code.
+    :rtype: :func:`bytes`
+    """
+    return c.oath_strerror(code)
+
 cpdef bint check_library_version(bytes version):
     cdef const char *result = c.oath_check_version(version)
     return NULL != result
@@ -46,26 +94,31 @@ IF LIBOATH_VERSION >= (2, 0, 0):
         :param bytes data: The data to be decoded.
         :rtype: bytes
         """
+        cdef const char* c_data = data
+        cdef size_t data_len = len(data)
         cdef char* output = NULL
         cdef size_t output_len = 0
+        cdef int retval
         cdef bytes py_string
-        _handle_retval(c.oath_base32_decode(<bytes>data, len(data), &output,
-                                            &output_len),
-                    False)
+        with nogil:
+            retval = c.oath_base32_decode(c_data, data_len, &output,
+                                          &output_len)
+        _handle_retval(retval, False)
         try:
             py_string = <bytes>output[:output_len]
         finally:
             stdlib.free(output)
         return py_string
 
-cpdef bytes hotp_generate(bytes secret, unsigned long long moving_factor,
+cpdef bytes hotp_generate(const unsigned char[::1] secret,
+                          unsigned long long moving_factor,
                           unsigned int digits, bint add_checksum,
                           int truncation_offset):
     """
     Generate a one-time password using the HOTP algorithm (:rfc:`4226`).
 
-    :param bytes secret: The secret string used to generate the one-time
-                         password.
+    :param secret: The secret string used to generate the one-time password.
+    :type secret: :func:`bytes` or another contiguous bytes-like object
     :param int moving_factor: unsigned, can be :func:`long`, in theory.
     :param int digits: unsigned, the number of digits of the one-time
                        password.
@@ -77,44 +130,84 @@ cpdef bytes hotp_generate(bytes secret, unsigned long long moving_factor,
     :return: one-time password
     :rtype: :func:`bytes`
     """
-    cdef char* generated = ''
+    cdef char generated[OUTPUT_SIZE]
+    cdef const char* c_secret = _buffer_ptr(secret)
+    cdef size_t secret_length = secret.shape[0]
+    cdef int retval
+    if digits > MAX_DIGITS:
+        _handle_retval(c.OATH_INVALID_DIGITS, False)
     if truncation_offset < 0:
         truncation_offset = (2 ** 32) - 1
-    retval = c.oath_hotp_generate(secret, len(secret), moving_factor, digits,
-                                  add_checksum, truncation_offset, generated)
+    with nogil:
+        retval = c.oath_hotp_generate(c_secret, secret_length, moving_factor,
+                                      digits, add_checksum, truncation_offset,
+                                      generated)
     _handle_retval(retval, False)
-    return <bytes>generated
+    return <bytes>generated[:digits]
+
+cpdef try_hotp_validate(const unsigned char[::1] secret,
+                        unsigned long long start_moving_factor,
+                        unsigned int window, const unsigned char[::1] otp):
+    """
+    Validate a one-time password generated using the HOTP algorithm
+    (:rfc:`4226`), without raising an exception if it is invalid.
+
+    :param secret: The secret used to generate the one-time password.
+    :type secret: :func:`bytes` or another contiguous bytes-like object
+    :param int start_moving_factor: unsigned, can be :func:`long`, in
+                                    theory. The start counter in the
+                                    OTP stream.
+    :param int window: The number of OTPs after the start offset OTP
+                        to test.
+    :param otp: The one-time password to validate.
+    :type otp: :func:`bytes` or another contiguous bytes-like object
+    :return: The position in the OTP window, where ``0`` is the first
+             position, or a negative ``oath_rc`` error code if it is invalid.
+    :rtype: :func:`int`
+    """
+    cdef const char* c_secret = _buffer_ptr(secret)
+    cdef size_t secret_length = secret.shape[0]
+    cdef char c_otp[MAX_DIGITS + 1]
+    cdef int retval = _copy_otp(otp, c_otp)
+    if retval == c.OATH_OK:
+        with nogil:
+            retval = c.oath_hotp_validate(c_secret, secret_length,
+                                          start_moving_factor, window, c_otp)
+    return retval
 
-cpdef hotp_validate(bytes secret, unsigned long long start_moving_factor,
-                    unsigned int window, bytes otp):
+cpdef hotp_validate(const unsigned char[::1] secret,
+                    unsigned long long start_moving_factor,
+                    unsigned int window, const unsigned char[::1] otp):
     """
     Validate a one-time password generated using the HOTP algorithm
     (:rfc:`4226`).
 
-    :param bytes secret: The secret used to generate the one-time password.
+    :param secret: The secret used to generate the one-time password.
+    :type secret: :func:`bytes` or another contiguous bytes-like object
     :param int start_moving_factor: unsigned, can be :func:`long`, in
                                     theory. The start counter in the
                                     OTP stream.
     :param int window: The number of OTPs after the start offset OTP
                         to test.
-    :param bytes otp: The one-time password to validate.
+    :param otp: The one-time password to validate.
+    :type otp: :func:`bytes` or another contiguous bytes-like object
     :return: The position in the OTP window, where ``0`` is the first
                 position.
     :rtype: :class:`oath_toolkit.types.OTPPosition`
     :raise: :class:`OATHError` if invalid
     """
-    retval = c.oath_hotp_validate(secret, len(secret), start_moving_factor,
-                                  window, otp)
+    retval = try_hotp_validate(secret, start_moving_factor, window, otp)
     _handle_retval(retval, True)
     return OTPPosition(absolute=None, relative=retval)
 
-cpdef bytes totp_generate(bytes secret, unsigned long now, int time_step_size,
-                          unsigned long time_offset, unsigned int digits):
+cpdef bytes totp_generate(const unsigned char[::1] secret, unsigned long now,
+                          int time_step_size, unsigned long time_offset,
+                          unsigned int digits):
     """
     Generate a one-time password using the TOTP algorithm (:rfc:`6238`).
 
-    :param bytes secret: The secret string used to generate the one-time
-                            password.
+    :param secret: The secret string used to generate the one-time password.
+    :type secret: :func:`bytes` or another contiguous bytes-like object
     :param int now: The UNIX timestamp (usually the current one)
     :param int time_step_size: Unsigned, the time step system parameter. If
                                set to a negative value, defaults to ``30``.
@@ -124,21 +217,68 @@ cpdef bytes totp_generate(bytes secret, unsigned long now, int time_step_size,
     :return: one-time password
     :rtype: :func:`bytes`
     """
-    cdef char* generated = ''
+    cdef char generated[OUTPUT_SIZE]
+    cdef const char* c_secret = _buffer_ptr(secret)
+    cdef size_t secret_length = secret.shape[0]
+    cdef int retval
+    if digits > MAX_DIGITS:
+        _handle_retval(c.OATH_INVALID_DIGITS, False)
     if time_step_size < 0:
         time_step_size = c.OATH_TOTP_DEFAULT_TIME_STEP_SIZE
-    retval = c.oath_totp_generate(secret, len(secret), now, time_step_size,
-                                  time_offset, digits, generated)
+    with nogil:
+        retval = c.oath_totp_generate(c_secret, secret_length, now,
+                                      time_step_size, time_offset, digits,
+                                      generated)
     _handle_retval(retval, False)
-    return <bytes>generated
+    return <bytes>generated[:digits]
+
+cpdef tuple try_totp_validate(const unsigned char[::1] secret,
+                              unsigned long now, int time_step_size,
+                              unsigned long start_offset, unsigned int window,
+                              const unsigned char[::1] otp):
+    """
+    Validate a one-time password generated using the TOTP algorithm
+    (:rfc:`6238`), without raising an exception if it is invalid.
+
+    :param secret: The secret used to generate the one-time password.
+    :type secret: :func:`bytes` or another contiguous bytes-like object
+    :param int now: The UNIX timestamp (usually the current one)
+    :param int time_step_size: Unsigned, the time step system parameter. If
+                               set to a negative value, defaults to ``30``.
+    :param int start_offset: The UNIX timestamp of when to start counting
+                             time steps (usually should be ``0``).
+    :param int window: The number of OTPs before and after the start OTP
+                        to test.
+    :param otp: The one-time password to validate.
+    :type otp: :func:`bytes` or another contiguous bytes-like object
+    :return: The absolute position in the OTP window (or a negative
+             ``oath_rc`` error code if it is invalid), and the relative
+             position.
+    :rtype: :func:`tuple`
+    """
+    cdef int otp_pos = 0
+    cdef const char* c_secret = _buffer_ptr(secret)
+    cdef size_t secret_length = secret.shape[0]
+    cdef char c_otp[MAX_DIGITS + 1]
+    cdef int retval = _copy_otp(otp, c_otp)
+    if time_step_size < 0:
+        time_step_size = c.OATH_TOTP_DEFAULT_TIME_STEP_SIZE
+    if retval == c.OATH_OK:
+        with nogil:
+            retval = c.oath_totp_validate2(c_secret, secret_length, now,
+                                           time_step_size, start_offset,
+                                           window, &otp_pos, c_otp)
+    return retval, otp_pos
 
-cpdef totp_validate(bytes secret, unsigned long now, int time_step_size,
-                    unsigned long start_offset, unsigned int window, bytes otp):
+cpdef totp_validate(const unsigned char[::1] secret, unsigned long now,
+                    int time_step_size, unsigned long start_offset,
+                    unsigned int window, const unsigned char[::1] otp):
     """
     Validate a one-time password generated using the TOTP algorithm
     (:rfc:`6238`).
 
-    :param bytes secret: The secret used to generate the one-time password.
+    :param secret: The secret used to generate the one-time password.
+    :type secret: :func:`bytes` or another contiguous bytes-like object
     :param int now: The UNIX timestamp (usually the current one)
     :param int time_step_size: Unsigned, the time step system parameter. If
                                set to a negative value, defaults to ``30``.
@@ -146,17 +286,182 @@ cpdef totp_validate(bytes secret, unsigned long now, int time_step_size,
                              time steps (usually should be ``0``).
     :param int window: The number of OTPs before and after the start OTP
                         to test.
-    :param bytes otp: The one-time password to validate.
+    :param otp: The one-time password to validate.
+    :type otp: :func:`bytes` or another contiguous bytes-like object
     :return: The absolute and relative positions in the OTP window, where
                 ``0`` is the first position.
     :rtype: :class:`oath_toolkit.types.OTPPosition`
     :raise: :class:`OATHError` if invalid
     """
+    retval, otp_pos = try_totp_validate(secret, now, time_step_size,
+                                        start_offset, window, otp)
+    _handle_retval(retval, True)
+    return OTPPosition(absolute=retval, relative=otp_pos)
+
+cpdef array.array totp_validate_many(secrets, otps, unsigned long now,
+                                     int time_step_size,
+                                     unsigned long start_offset,
+                                     unsigned int window):
+    """
+    Validate a batch of one-time passwords generated using the TOTP algorithm
+    (:rfc:`6238`), in a single call.
+
+    Unlike :func:`totp_validate`, an invalid OTP does not raise an exception.
+
+    :param secrets: The secrets used to generate the one-time passwords.
+    :type secrets: sequence of contiguous bytes-like objects
+    :param otps: The one-time passwords to validate, in the same order as
+                 ``secrets``.
+    :type otps: sequence of contiguous bytes-like objects
+    :param int now: The UNIX timestamp (usually the current one)
+    :param int time_step_size: Unsigned, the time step system parameter. If
+                               set to a negative value, defaults to ``30``.
+    :param int start_offset: The UNIX timestamp of when to start counting
+                             time steps (usually should be ``0``).
+    :param int window: The number of OTPs before and after the start OTP
+                        to test.
+    :return: For each OTP, the absolute position in the OTP window, or a
+             negative ``oath_rc`` error code if it is invalid.
+    :rtype: :class:`array.array` of type ``i``
+    :raise: :class:`ValueError` if ``secrets`` and ``otps`` differ in length
+    """
+    cdef Py_ssize_t i
+    cdef Py_ssize_t count = len(secrets)
+    cdef const unsigned char[::1] secret
+    cdef const char* c_secret
+    cdef size_t secret_length
+    cdef char c_otp[MAX_DIGITS + 1]
     cdef int otp_pos
-    cdef int* c_otp_pos = &otp_pos
+    cdef int retval
+    cdef array.array results
+    if len(otps) != count:
+        raise ValueError('secrets and otps must have the same length')
     if time_step_size < 0:
         time_step_size = c.OATH_TOTP_DEFAULT_TIME_STEP_SIZE
-    retval = c.oath_totp_validate2(secret, len(secret), now, time_step_size,
-                                   start_offset, window, c_otp_pos, otp)
-    _handle_retval(retval, True)
-    return OTPPosition(absolute=retval, relative=otp_pos)
+    results = array.clone(_int_array_template, count, zero=False)
+    for i in range(count):
+        secret = secrets[i]
+        c_secret = _buffer_ptr(secret)
+        secret_length = secret.shape[0]
+        retval = _copy_otp(otps[i], c_otp)
+        if retval == c.OATH_OK:
+            with nogil:
+                retval = c.oath_totp_validate2(c_secret, secret_length, now,
+                                               time_step_size, start_offset,
+                                               window, &otp_pos, c_otp)
+        results.data.as_ints[i] = retval
+    return results
+
+cdef list _collect_range(char* output, int* retvals, Py_ssize_t count,
+                         unsigned int digits):
+    """
+    Check the return values of a bulk generation, then convert the output
+    buffer into a list of one-time passwords.
+    """
+    cdef Py_ssize_t i
+    cdef size_t stride = digits + 1
+    for i in range(count):
+        _handle_retval(retvals[i], False)
+    return [<bytes>output[i * stride:i * stride + digits]
+            for i in range(count)]
+
+cpdef list hotp_generate_range(const unsigned char[::1] secret,
+                               unsigned long long start_counter,
+                               Py_ssize_t count, unsigned int digits):
+    """
+    Generate consecutive one-time passwords using the HOTP algorithm
+    (:rfc:`4226`).
+
+    The OTPs are computed in parallel (via OpenMP, if it was enabled at build
+    time) without holding the GIL.
+
+    :param secret: The secret string used to generate the one-time
+                   passwords.
+    :type secret: :func:`bytes` or another contiguous bytes-like object
+    :param int start_counter: unsigned, can be :func:`long`, in theory. The
+                              counter of the first OTP to generate.
+    :param int count: The number of OTPs to generate.
+    :param int digits: unsigned, the number of digits of each one-time
+                       password.
+    :return: ``count`` one-time passwords, starting at ``start_counter``.
+    :rtype: :func:`list` of :func:`bytes`
+    :raise: :class:`OATHError` if any OTP could not be generated
+    """
+    cdef const char* c_secret = _buffer_ptr(secret)
+    cdef size_t secret_length = secret.shape[0]
+    cdef size_t stride = digits + 1
+    cdef char* output
+    cdef int* retvals
+    cdef Py_ssize_t i
+    if count <= 0:
+        return []
+    if digits > MAX_DIGITS:
+        _handle_retval(c.OATH_INVALID_DIGITS, False)
+    output = <char*>stdlib.malloc(count * stride)
+    retvals = <int*>stdlib.malloc(count * sizeof(int))
+    try:
+        if output == NULL or retvals == NULL:
+            raise MemoryError()
+        with nogil:
+            for i in prange(count, schedule='static'):
+                retvals[i] = c.oath_hotp_generate(c_secret, secret_length,
+                                                  start_counter + i, digits,
+                                                  False, DYNAMIC_TRUNCATION,
+                                                  output + i * stride)
+        return _collect_range(output, retvals, count, digits)
+    finally:
+        stdlib.free(output)
+        stdlib.free(retvals)
+
+cpdef list totp_generate_range(const unsigned char[::1] secret,
+                               unsigned long start_time,
+                               Py_ssize_t steps, int time_step_size,
+                               unsigned long time_offset,
+                               unsigned int digits):
+    """
+    Generate the one-time passwords for consecutive time steps using the TOTP
+    algorithm (:rfc:`6238`).
+
+    The OTPs are computed in parallel (via OpenMP, if it was enabled at build
+    time) without holding the GIL.
+
+    :param secret: The secret string used to generate the one-time
+                   passwords.
+    :type secret: :func:`bytes` or another contiguous bytes-like object
+    :param int start_time: The UNIX timestamp of the first OTP to generate.
+    :param int steps: The number of OTPs (time steps) to generate.
+    :param int time_step_size: Unsigned, the time step system parameter. If
+                               set to a negative value, defaults to ``30``.
+    :param int time_offset: The UNIX timestamp of when to start counting
+                            time steps (usually should be ``0``).
+    :param int digits: The number of digits of each one-time password.
+    :return: ``steps`` one-time passwords, starting at ``start_time``.
+    :rtype: :func:`list` of :func:`bytes`
+    :raise: :class:`OATHError` if any OTP could not be generated
+    """
+    cdef const char* c_secret = _buffer_ptr(secret)
+    cdef size_t secret_length = secret.shape[0]
+    cdef size_t stride = digits + 1
+    cdef char* output
+    cdef int* retvals
+    cdef Py_ssize_t i
+    if steps <= 0:
+        return []
+    if digits > MAX_DIGITS:
+        _handle_retval(c.OATH_INVALID_DIGITS, False)
+    if time_step_size < 0:
+        time_step_size = c.OATH_TOTP_DEFAULT_TIME_STEP_SIZE
+    output = <char*>stdlib.malloc(steps * stride)
+    retvals = <int*>stdlib.malloc(steps * sizeof(int))
+    try:
+        if output == NULL or retvals == NULL:
+            raise MemoryError()
+        with nogil:
+            for i in prange(steps, schedule='static'):
+                retvals[i] = c.oath_totp_generate(
+                    c_secret, secret_length, start_time + i * time_step_size,
+                    time_step_size, time_offset, digits, output + i * stride)
+        return _collect_range(output, retvals, steps, digits)
+    finally:
+        stdlib.free(output)
+        stdlib.free(retvals)
@@ -0,0 +1,378 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2015 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Pure Python implementation of the liboath API, based on :mod:`hmac` and
+:mod:`hashlib`. Used when liboath is not installed.
+
+The keyed HMAC-SHA1 state (the digests of the inner and outer padded keys) is
+computed once per secret, then copied for every counter in a validation
+window, instead of re-keying the HMAC each time. It can also be kept across
+calls via :func:`oath_toolkit.cache.enable_key_schedule_cache`.
+"""
+
+from __future__ import division
+
+from . import base32, cache
+from ._compat import compare_digest, integer_types, to_bytes
+from .capabilities import version_info
+from .exc import (
+    OATH_INVALID_BASE32, OATH_INVALID_DIGITS, OATH_INVALID_OTP, OATH_OK,
+    OATH_REPLAYED_OTP, OATHError)
+from .types import OTPPosition
+
+from array import array
+import hashlib
+import hmac
+import struct
+
+#: The version of liboath whose API (and behavior) this module implements.
+library_version = b'2.0.0'
+_library_version_info = version_info(library_version)
+
+# From liboath/errors.c
+_ERROR_MESSAGES = {
+    OATH_OK: b'Successful return',
+    -1: b'Internal error in crypto functions',
+    OATH_INVALID_DIGITS: b'Unsupported number of OTP digits',
+    -3: b'Error from system printf call',
+    -4: b'Hex string is invalid',
+    -5: b'The output buffer is too small',
+    OATH_INVALID_OTP: b'The OTP is not valid',
+    OATH_REPLAYED_OTP: b'The OTP has been replayed',
+    -8: b'The password does not match',
+    -9: b'The counter value is corrupt',
+    -10: b'The timestamp is corrupt',
+    -11: b'The supplied filename does not exist',
+    -12: b'Cannot find information about user',
+    -13: b'System error when seeking in file',
+    -14: b'System error when creating file',
+    -15: b'System error when locking file',
+    -16: b'System error when renaming file',
+    -17: b'System error when removing file',
+    -18: b'System error for time manipulation',
+    -19: b'A strcmp callback returned an error',
+    OATH_INVALID_BASE32: b'Base32 string is invalid',
+    -21: b'Base32 encoding would overflow',
+    -22: b'Memory allocation failed',
+    -23: b'System error when flushing file buffer',
+    -24: b'System error when syncing physical data',
+    -25: b'System error when closing file',
+}
+
+DEFAULT_TIME_STEP_SIZE = 30
+# liboath only supports 6, 7, or 8 digit OTPs.
+_MODULI = {6: 10 ** 6, 7: 10 ** 7, 8: 10 ** 8}
+_COUNTER = struct.Struct('>Q')
+_COUNTER_MASK = 2 ** 64 - 1
+
+
+def _handle_retval(retval, positive_ok=False):
+    """
+    Handle the ``oath_rc`` return value from a function call.
+
+    :type retval: int
+    :param bool positive_ok: Whether positive integers are acceptable (as is
+                             the case in validation functions), or throw
+                             exceptions.
+    :raises: :class:`OATHError` containing error message on non-OK
+             return value.
+    """
+    if retval != OATH_OK and (not positive_ok or retval < 0):
+        err = OATHError(strerror(retval))
+        err.code = retval
+        raise err
+
+
+def strerror(code):
+    """
+    Retrieve the error message for an ``oath_rc`` return code.
+
+    :param int code: The return code.
+    :rtype: :func:`bytes`
+    """
+    return _ERROR_MESSAGES.get(code, b'Unknown error')
+
+
+def check_library_version(version):
+    """
+    Determine whether the library version is greater than or equal to the
+    specified version.
+
+    :param bytes version: The dotted version number to check
+    :rtype: :func:`bool`
+    """
+    return _library_version_info >= version_info(version)
+
+
+def base32_decode(data):
+    """
+    Decode Base32 data.
+
+    Unlike :func:`base64.b32decode`, it handles human-readable Base32 strings.
+
+    :param bytes data: The data to be decoded.
+    :rtype: bytes
+    """
+    return base32.decode(data)
+
+
+def _new_hmac(secret):
+    return hmac.new(secret, digestmod=hashlib.sha1)
+
+
+def _keyed_hmac(secret):
+    """
+    Create the keyed HMAC-SHA1 state for a secret, or retrieve it from the
+    key schedule cache, if enabled. It must not be updated directly; use
+    :func:`_hotp` instead, which works on a copy.
+    """
+    secret = to_bytes(secret)
+    if not isinstance(secret, (bytes, bytearray)):
+        # hmac only accepts bytes and bytearray keys (it copies them into the
+        # padded key blocks anyway).
+        secret = bytearray(secret)
+    key_cache = cache.key_schedule_cache
+    if key_cache is None:
+        return _new_hmac(secret)
+    return key_cache.get_or_set(secret, _new_hmac)
+
+
+def _hotp(keyed, counter, digits, truncation_offset=-1):
+    """
+    Compute a HOTP value (:rfc:`4226`, section 5.3) from a keyed HMAC state.
+    """
+    mac = keyed.copy()
+    mac.update(_COUNTER.pack(counter & _COUNTER_MASK))
+    digest = bytearray(mac.digest())
+    if 0 <= truncation_offset < len(digest) - 4:
+        offset = truncation_offset
+    else:
+        offset = digest[-1] & 0x0f
+    code = ((digest[offset] & 0x7f) << 24 |
+            digest[offset + 1] << 16 |
+            digest[offset + 2] << 8 |
+            digest[offset + 3])
+    return ('%0*d' % (digits, code % _MODULI[digits])).encode('ascii')
+
+
+def _totp_counter(now, time_step_size, start_offset):
+    if time_step_size <= 0:
+        time_step_size = DEFAULT_TIME_STEP_SIZE
+    if not isinstance(now, integer_types):
+        now = int(now)
+    return (now - start_offset) // time_step_size
+
+
+def _totp_search(keyed, counter, window, otp):
+    """
+    Search for a TOTP in the window around a counter, in the same order as
+    liboath (the current time step, then one step after, one step before,
+    two steps after, etc.).
+
+    :return: The ``oath_rc``-style return value (the absolute position in
+             the OTP window, or an error code), and the relative position.
+    :rtype: :func:`tuple`
+    """
+    digits = len(otp)
+    if digits not in _MODULI:
+        return OATH_INVALID_DIGITS, 0
+    if compare_digest(_hotp(keyed, counter, digits), otp):
+        return 0, 0
+    for position in range(1, window + 1):
+        if compare_digest(_hotp(keyed, counter + position, digits), otp):
+            return position, position
+        if counter >= position and \
+                compare_digest(_hotp(keyed, counter - position, digits), otp):
+            return position, -position
+    return OATH_INVALID_OTP, 0
+
+
+def hotp_generate(secret, moving_factor, digits, add_checksum=False,
+                  truncation_offset=None):
+    """
+    Generate a one-time password using the HOTP algorithm (:rfc:`4226`).
+
+    :param bytes secret: The secret string used to generate the one-time
+                         password.
+    :param int moving_factor: unsigned, can be :func:`long`, in theory. A
+                              counter indicating where in OTP stream to
+                              generate an OTP.
+    :param int digits: unsigned, the number of digits of the one-time
+                       password.
+    :param bool add_checksum: Whether to add a checksum digit (ignored, like
+                              in liboath).
+    :param int truncation_offset: A truncation offset to use, if not set to a
+                                  negative value (which means dynamic
+                                  truncation).
+    :return: one-time password
+    :rtype: :func:`bytes`
+    """
+    if digits not in _MODULI:
+        _handle_retval(OATH_INVALID_DIGITS)
+    if truncation_offset is None:
+        truncation_offset = -1
+    return _hotp(_keyed_hmac(secret), moving_factor, digits,
+                 truncation_offset)
+
+
+def try_hotp_validate(secret, start_moving_factor, window, otp):
+    """
+    Validate a one-time password generated using the HOTP algorithm
+    (:rfc:`4226`), without raising an exception if it is invalid.
+
+    :param bytes secret: The secret used to generate the one-time password.
+    :param int start_moving_factor: Unsigned, can be :func:`long`, in theory.
+                                    The start counter in the OTP stream.
+    :param int window: The number of OTPs after the start offset OTP
+                       to test.
+    :param bytes otp: The one-time password to validate.
+    :return: The position in the OTP window, where ``0`` is the first position,
+             or a negative ``oath_rc`` error code if it is invalid.
+    :rtype: :func:`int`
+    """
+    otp = to_bytes(otp)
+    digits = len(otp)
+    if digits not in _MODULI:
+        return OATH_INVALID_DIGITS
+    keyed = _keyed_hmac(secret)
+    for position in range(window + 1):
+        if compare_digest(_hotp(keyed, start_moving_factor + position,
+                                digits), otp):
+            return position
+    return OATH_INVALID_OTP
+
+
+def hotp_validate(secret, start_moving_factor, window, otp):
+    """
+    Validate a one-time password generated using the HOTP algorithm
+    (:rfc:`4226`).
+
+    :param bytes secret: The secret used to generate the one-time password.
+    :param int start_moving_factor: Unsigned, can be :func:`long`, in theory.
+                                    The start counter in the OTP stream.
+    :param int window: The number of OTPs after the start offset OTP
+                       to test.
+    :param bytes otp: The one-time password to validate.
+    :return: The position in the OTP window, where ``0`` is the first position.
+    :rtype: :class:`oath_toolkit.types.OTPPosition`
+    :raise: :class:`OATHError` if invalid
+    """
+    retval = try_hotp_validate(secret, start_moving_factor, window, otp)
+    _handle_retval(retval, True)
+    return OTPPosition(absolute=None, relative=retval)
+
+
+def totp_generate(secret, now, time_step_size, time_offset, digits):
+    """
+    Generate a one-time password using the TOTP algorithm (:rfc:`6238`).
+
+    :param bytes secret: The secret string used to generate the one-time
+                         password.
+    :param int now: The UNIX timestamp (usually the current one)
+    :param int time_step_size: Unsigned, the time step system parameter. If
+                               set to a negative value, defaults to ``30``.
+    :param int time_offset: The UNIX timestamp of when to start counting
+                            time steps (usually should be ``0``).
+    :param int digits: The number of digits of the one-time password.
+    :return: one-time password
+    :rtype: :func:`bytes`
+    """
+    if digits not in _MODULI:
+        _handle_retval(OATH_INVALID_DIGITS)
+    counter = _totp_counter(now, time_step_size, time_offset)
+    return _hotp(_keyed_hmac(secret), counter, digits)
+
+
+def try_totp_validate(secret, now, time_step_size, start_offset, window,
+                      otp):
+    """
+    Validate a one-time password generated using the TOTP algorithm
+    (:rfc:`6238`), without raising an exception if it is invalid.
+
+    :param bytes secret: The secret used to generate the one-time password.
+    :param int now: The UNIX timestamp (usually the current one)
+    :param int time_step_size: Unsigned, the time step system parameter. If
+                               set to a negative value, defaults to ``30``.
+    :param int start_offset: The UNIX timestamp of when to start counting time
+                             steps (usually should be ``0``).
+    :param int window: The number of OTPs before and after the start OTP
+                       to test.
+    :param bytes otp: The one-time password to validate.
+    :return: The absolute position in the OTP window (or a negative
+             ``oath_rc`` error code if it is invalid), and the relative
+             position.
+    :rtype: :func:`tuple`
+    """
+    counter = _totp_counter(now, time_step_size, start_offset)
+    return _totp_search(_keyed_hmac(secret), counter, window, to_bytes(otp))
+
+
+def totp_validate(secret, now, time_step_size, start_offset, window, otp):
+    """
+    Validate a one-time password generated using the TOTP algorithm
+    (:rfc:`6238`).
+
+    :param bytes secret: The secret used to generate the one-time password.
+    :param int now: The UNIX timestamp (usually the current one)
+    :param int time_step_size: Unsigned, the time step system parameter. If
+                               set to a negative value, defaults to ``30``.
+    :param int start_offset: The UNIX timestamp of when to start counting time
+                             steps (usually should be ``0``).
+    :param int window: The number of OTPs before and after the start OTP
+                       to test.
+    :param bytes otp: The one-time password to validate.
+    :return: The absolute and relative positions in the OTP window, where ``0``
+             is the first position.
+    :rtype: :class:`oath_toolkit.types.OTPPosition`
+    :raise: :class:`OATHError` if invalid
+    """
+    retval, otp_pos = try_totp_validate(secret, now, time_step_size,
+                                        start_offset, window, otp)
+    _handle_retval(retval, True)
+    return OTPPosition(absolute=retval, relative=otp_pos)
+
+
+def totp_validate_many(secrets, otps, now, time_step_size, start_offset,
+                       window):
+    """
+    Validate a batch of one-time passwords generated using the TOTP algorithm
+    (:rfc:`6238`), in a single call.
+
+    Unlike :func:`totp_validate`, an invalid OTP does not raise an exception.
+
+    :param secrets: The secrets used to generate the one-time passwords.
+    :type secrets: sequence of :func:`bytes`
+    :param otps: The one-time passwords to validate, in the same order as
+                 ``secrets``.
+    :type otps: sequence of :func:`bytes`
+    :param int now: The UNIX timestamp (usually the current one)
+    :param int time_step_size: Unsigned, the time step system parameter. If
+                               set to a negative value, defaults to ``30``.
+    :param int start_offset: The UNIX timestamp of when to start counting time
+                             steps (usually should be ``0``).
+    :param int window: The number of OTPs before and after the start OTP
+                       to test.
+    :return: For each OTP, the absolute position in the OTP window, or a
+             negative ``oath_rc`` error code if it is invalid.
+    :rtype: :class:`array.array` of type ``i``
+    :raise: :class:`ValueError` if ``secrets`` and ``otps`` differ in length
+    """
+    if len(secrets) != len(otps):
+        raise ValueError('secrets and otps must have the same length')
+    counter = _totp_counter(now, time_step_size, start_offset)
+    return array('i', [_totp_search(_keyed_hmac(secret), counter, window,
+                                    to_bytes(otp))[0]
+                       for secret, otp in zip(secrets, otps)])
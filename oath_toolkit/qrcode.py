@@ -16,11 +16,38 @@
 
 from __future__ import absolute_import
 
-import os
-from . import uri
+from bisect import bisect_left
+import hashlib
+import io
+import struct
+import zlib
+from . import _qrencode, cache, uri
+from ._qrencode import ERROR_CORRECT_M
+from .types import QRImage
 
-if not os.environ.get('READTHEDOCS'):
-    from qrcode import QRCode
+#: The supported image formats of :func:`render`, and their MIME types.
+CONTENT_TYPES = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+
+#: The :class:`qrcode.QRCode` constructor arguments that :func:`render`
+#: handles without importing :mod:`qrcode` (and therefore Pillow).
+FAST_OPTIONS = frozenset(['version', 'error_correction', 'box_size',
+                          'border'])
+
+#: For each error correction level, the number of bytes (in 8-bit byte mode)
+#: that fit in each QR code version. Filled in by :func:`_capacities`.
+_CAPACITIES = {}
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+SVG_TEMPLATE = u'''\
+<?xml version="1.0" encoding="UTF-8"?>
+<svg xmlns="http://www.w3.org/2000/svg" version="1.1" \
+width="{size}" height="{size}" viewBox="0 0 {width} {width}">\
+<rect width="{width}" height="{width}" fill="#fff"/>\
+<path d="{path}" fill="#000"/></svg>
+'''
 
 
 def generate(key_type, key, user, issuer, counter=None, **kwargs):
@@ -40,9 +67,229 @@ def generate(key_type, key, user, issuer, counter=None, **kwargs):
     :returns: an image object
     :rtype: :class:`qrcode.image.base.BaseImage`
     """
+    return from_uri(uri.generate(key_type, key, user, issuer, counter),
+                    **kwargs)
+
+
+def from_uri(oath_uri, **kwargs):
+    r"""
+    Generate a QR code for a provisioning URI, e.g. one generated by a
+    :class:`oath_toolkit.uri.URIBuilder`.
+
+    :param str oath_uri: The provisioning URI.
+    :param \*\*kwargs: Arguments passed to the :class:`qrcode.QRCode`
+                       constructor
+    :returns: an image object
+    :rtype: :class:`qrcode.image.base.BaseImage`
+    """
+    # Imported here, as the qrcode package imports Pillow (if installed).
+    from qrcode import QRCode
     qr = QRCode(**kwargs)
-    oath_uri = uri.generate(key_type, key, user, issuer, counter)
     qr.add_data(oath_uri)
     if kwargs.get('version') is None:
         qr.make(fit=True)
     return qr.make_image()
+
+
+def _digest(oath_uri, image_format, kwargs):
+    """
+    Identify a rendered image by its URI and rendering options, without
+    exposing the secret it contains.
+    """
+    options = repr(sorted(kwargs.items()))
+    data = u'\0'.join([oath_uri, image_format, options]).encode('utf-8')
+    return hashlib.sha256(data).hexdigest()
+
+
+def render(key_type, key, user, issuer, counter=None, image_format='png',
+           **kwargs):
+    r"""
+    Render a QR code suitable for Google Authenticator into image data.
+
+    If only the arguments in :data:`FAST_OPTIONS` are given, the image is
+    written directly from the QR code's modules (see :func:`modules`),
+    without importing :mod:`qrcode` (or Pillow). Otherwise, it is rendered by
+    the :mod:`qrcode` image factory.
+
+    If the QR image cache is enabled (see
+    :func:`oath_toolkit.cache.enable_qr_image_cache`), the rendered images are
+    cached.
+
+    :param str key_type: the auth type, either ``totp`` or ``hotp``
+    :param str key: the secret key
+    :param str user: the username
+    :param str issuer: issuer name
+    :param counter: initial counter value (HOTP only)
+    :type counter: :func:`int` or :data:`None`
+    :param str image_format: One of the keys of :data:`CONTENT_TYPES`.
+    :param \*\*kwargs: Arguments passed to the :class:`qrcode.QRCode`
+                       constructor
+    :returns: The image data, its MIME type, and an identifier suitable for
+              an HTTP ``ETag``.
+    :rtype: :class:`oath_toolkit.types.QRImage`
+    """
+    if image_format not in CONTENT_TYPES:
+        raise ValueError('Unsupported image format: {0}'.format(image_format))
+    oath_uri = uri.generate(key_type, key, user, issuer, counter)
+    etag = _digest(oath_uri, image_format, kwargs)
+    image_cache = cache.qr_image_cache
+    if image_cache is not None:
+        image = image_cache.get(etag)
+        if image is not None:
+            return image
+    if FAST_OPTIONS.issuperset(kwargs):
+        data = _render_fast(oath_uri, image_format, **kwargs)
+    else:
+        data = _render_image(key_type, key, user, issuer, counter,
+                             image_format, **kwargs)
+    image = QRImage(data=data, content_type=CONTENT_TYPES[image_format],
+                    etag=etag)
+    if image_cache is not None:
+        image_cache.set(etag, image)
+    return image
+
+
+def _render_image(key_type, key, user, issuer, counter, image_format,
+                  **kwargs):
+    """Render a QR code via :func:`generate` and the :mod:`qrcode` images."""
+    if image_format == 'svg':
+        from qrcode.image.svg import SvgPathImage
+        kwargs.setdefault('image_factory', SvgPathImage)
+    stream = io.BytesIO()
+    generate(key_type, key, user, issuer, counter, **kwargs).save(stream)
+    return stream.getvalue()
+
+
+def _capacities(error_correction):
+    """
+    Compute the byte mode capacity of every QR code version, for the given
+    error correction level.
+    """
+    try:
+        return _CAPACITIES[error_correction]
+    except KeyError:
+        capacities = [_qrencode.capacity(version, error_correction)
+                      for version in range(1, 41)]
+        _CAPACITIES[error_correction] = capacities
+        return capacities
+
+
+def fit_version(length, error_correction=None):
+    """
+    Determine the smallest QR code version that holds ``length`` bytes of data
+    in byte mode.
+
+    :param int length: The length of the data, in bytes.
+    :param int error_correction: One of the ``qrcode.ERROR_CORRECT_*``
+                                 constants. Defaults to ``ERROR_CORRECT_M``.
+    :rtype: :func:`int`
+    :raise: :class:`ValueError` if the data does not fit in a QR code
+    """
+    if error_correction is None:
+        error_correction = ERROR_CORRECT_M
+    version = bisect_left(_capacities(error_correction), length) + 1
+    if version > 40:
+        raise ValueError('Too much data for a QR code: {0} bytes'.format(
+            length))
+    return version
+
+
+def modules(oath_uri, version=None, error_correction=None):
+    """
+    Compute the modules of the QR code for an ``otpauth`` URI.
+
+    The URI is encoded in byte mode, so that the version can be picked from
+    :func:`fit_version` instead of searching for the best fit. The modules
+    are the same as those of a :class:`qrcode.QRCode` with the URI added as
+    byte mode data, but :mod:`qrcode` is not used to compute them.
+
+    :param str oath_uri: The URI to encode.
+    :param int version: The QR code version. Defaults to the smallest one
+                        that fits the URI.
+    :param int error_correction: One of the ``qrcode.ERROR_CORRECT_*``
+                                 constants. Defaults to ``ERROR_CORRECT_M``.
+    :return: The rows of modules (without a border), where :data:`True` is a
+             dark module.
+    :rtype: :func:`list` of :func:`list` of :func:`bool`
+    """
+    data = oath_uri.encode('utf-8')
+    if error_correction is None:
+        error_correction = ERROR_CORRECT_M
+    if version is None:
+        version = fit_version(len(data), error_correction)
+    return _qrencode.encode(data, version, error_correction)
+
+
+def _png_chunk(chunk_type, data):
+    chunk = chunk_type + data
+    return (struct.pack('>I', len(data)) + chunk +
+            struct.pack('>I', zlib.crc32(chunk) & 0xffffffff))
+
+
+def to_png(rows, box_size=10, border=4):
+    """
+    Write QR code modules as a 1-bit grayscale PNG image.
+
+    :param rows: The output of :func:`modules`.
+    :param int box_size: The size of a module, in pixels.
+    :param int border: The width of the quiet zone, in modules.
+    :rtype: :func:`bytes`
+    """
+    width = (len(rows) + 2 * border) * box_size
+    padding = '1' * (-width % 8)
+    quiet = '1' * (border * box_size)
+    blank = bytes(bytearray([0xff] * ((width + 7) // 8)))
+    scanlines = []
+    for row in [None] * border + rows + [None] * border:
+        if row is None:
+            packed = blank
+        else:
+            bits = ''.join(['0' * box_size if dark else '1' * box_size
+                            for dark in row])
+            bits = quiet + bits + quiet + padding
+            packed = bytes(bytearray([int(bits[i:i + 8], 2)
+                                      for i in range(0, len(bits), 8)]))
+        # Filter type 0 (none), then the pixels.
+        scanlines.extend([b'\x00' + packed] * box_size)
+    header = struct.pack('>IIBBBBB', width, width, 1, 0, 0, 0, 0)
+    return b''.join([PNG_SIGNATURE,
+                     _png_chunk(b'IHDR', header),
+                     _png_chunk(b'IDAT', zlib.compress(b''.join(scanlines))),
+                     _png_chunk(b'IEND', b'')])
+
+
+def to_svg(rows, box_size=10, border=4):
+    """
+    Write QR code modules as an SVG image, with one path for the dark modules.
+
+    :param rows: The output of :func:`modules`.
+    :param int box_size: The size of a module, in pixels.
+    :param int border: The width of the quiet zone, in modules.
+    :rtype: :func:`bytes`
+    """
+    width = len(rows) + 2 * border
+    path = []
+    for y, row in enumerate(rows, border):
+        x = 0
+        count = len(row)
+        while x < count:
+            if not row[x]:
+                x += 1
+                continue
+            start = x
+            while x < count and row[x]:
+                x += 1
+            # One rectangle per horizontal run of dark modules.
+            path.append(u'M{0} {1}h{2}v1h-{2}z'.format(start + border, y,
+                                                       x - start))
+    svg = SVG_TEMPLATE.format(size=width * box_size, width=width,
+                              path=u''.join(path))
+    return svg.encode('utf-8')
+
+
+def _render_fast(oath_uri, image_format, version=None, error_correction=None,
+                 box_size=10, border=4):
+    """Render a QR code straight from its modules."""
+    rows = modules(oath_uri, version, error_correction)
+    writer = to_svg if image_format == 'svg' else to_png
+    return writer(rows, box_size, border)
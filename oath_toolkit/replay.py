@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2015 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+In-process replay protection for time-based one-time passwords.
+
+A valid TOTP stays valid for the rest of its time step (and for the steps in
+the validation window), so it can be replayed unless the accepted ones are
+remembered. :class:`ReplayStore` remembers them in memory, without a database
+round trip per login.
+"""
+
+from __future__ import division
+
+from ._compat import integer_types
+import threading
+import time
+
+DEFAULT_TIME_STEP_SIZE = 30
+
+
+class ReplayStore(object):
+
+    """
+    Remembers the accepted (device ID, absolute time step) pairs, until the
+    corresponding OTPs fall out of every validation window.
+
+    Entries are placed in a timing wheel of ``slots`` buckets, each covering
+    ``resolution`` seconds, according to when they expire. Buckets are
+    emptied lazily, when the wheel turns past them, so adding, checking and
+    expiring an entry are all constant time.
+
+    A store can be shared by devices with different time step sizes, as long
+    as their OTPs expire within ``slots * resolution`` seconds.
+
+    :param int slots: The number of buckets in the wheel.
+    :param int resolution: The number of seconds covered by each bucket.
+    :param int maxsize: The maximum number of entries. When the store is full,
+                        the entries that would expire the soonest are dropped
+                        early.
+    :param callable timer: Returns the current time, in seconds.
+    """
+
+    def __init__(self, slots=64, resolution=DEFAULT_TIME_STEP_SIZE,
+                 maxsize=100000, timer=time.time):
+        if slots < 1 or resolution < 1 or maxsize < 1:
+            raise ValueError('slots, resolution and maxsize must be positive')
+        self.slots = slots
+        self.resolution = resolution
+        self.maxsize = maxsize
+        self.timer = timer
+        self.evictions = 0
+        self._wheel = [set() for _ in range(slots)]
+        self._ticks = {}
+        self._tick = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._ticks)
+
+    def __contains__(self, key):
+        with self._lock:
+            self._advance(self._current_tick())
+            return key in self._ticks
+
+    def _current_tick(self):
+        return int(self.timer() // self.resolution)
+
+    def _expire(self, tick):
+        bucket = self._wheel[tick % self.slots]
+        for key in bucket:
+            del self._ticks[key]
+        bucket.clear()
+
+    def _advance(self, tick):
+        """Empty the buckets that the wheel has turned past."""
+        if self._tick is not None and tick > self._tick:
+            if tick - self._tick >= self.slots:
+                for bucket in self._wheel:
+                    bucket.clear()
+                self._ticks.clear()
+            else:
+                for expired in range(self._tick, tick):
+                    self._expire(expired)
+        if self._tick is None or tick > self._tick:
+            self._tick = tick
+
+    def _evict(self):
+        """Drop the entries that would expire the soonest."""
+        for tick in range(self._tick, self._tick + self.slots):
+            bucket = self._wheel[tick % self.slots]
+            if bucket:
+                self.evictions += len(bucket)
+                self._expire(tick)
+                return
+
+    def accept(self, device_id, step, expires):
+        """
+        Record that the OTP of a device for a given time step was accepted,
+        unless it already was.
+
+        :param device_id: A hashable, stable identifier for the device.
+        :param int step: The absolute time step of the OTP.
+        :param expires: The UNIX timestamp from which the OTP is no longer
+                        valid.
+        :type expires: :func:`int` or :func:`float`
+        :return: :data:`False` if the OTP is a replay, :data:`True` otherwise.
+        :rtype: :func:`bool`
+        :raise: :class:`ValueError` if ``expires`` is beyond the span of the
+                wheel.
+        """
+        key = (device_id, step)
+        with self._lock:
+            current = self._current_tick()
+            self._advance(current)
+            if key in self._ticks:
+                return False
+            # The last tick during which the OTP is valid.
+            tick = int(-(-expires // self.resolution)) - 1
+            if tick < current:
+                # Already expired, so it cannot be replayed.
+                return True
+            if tick >= current + self.slots:
+                raise ValueError('The OTP expires beyond the span of the '
+                                 'replay store')
+            if len(self._ticks) >= self.maxsize:
+                self._evict()
+            self._ticks[key] = tick
+            self._wheel[tick % self.slots].add(key)
+            return True
+
+    def accept_totp(self, device_id, otp_pos, now, time_step_size,
+                    start_offset, window):
+        """
+        Record that a TOTP was accepted, unless it already was. The parameters
+        are the same as the ones used to validate it.
+
+        :param device_id: A hashable, stable identifier for the device.
+        :param int otp_pos: The relative position of the OTP in the window, as
+                            returned by the validation function.
+        :param int now: The UNIX timestamp used for validation.
+        :param time_step_size: The time step system parameter. If set to a
+                               negative value or :data:`None`, defaults to
+                               ``30``.
+        :type time_step_size: :func:`int` or :data:`None`
+        :param int start_offset: The UNIX timestamp of when to start counting
+                                 time steps.
+        :param int window: The number of OTPs before and after the start OTP
+                           that are tested.
+        :return: :data:`False` if the OTP is a replay, :data:`True` otherwise.
+        :rtype: :func:`bool`
+        """
+        if time_step_size is None or time_step_size <= 0:
+            time_step_size = DEFAULT_TIME_STEP_SIZE
+        if not isinstance(now, integer_types):
+            now = int(now)
+        step = (now - start_offset) // time_step_size + otp_pos
+        # The OTP is accepted until the current step is past step + window.
+        expires = start_offset + (step + window + 1) * time_step_size
+        return self.accept(device_id, step, expires)
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            for bucket in self._wheel:
+                bucket.clear()
+            self._ticks.clear()
+            self.evictions = 0
@@ -0,0 +1,303 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2013, 2014 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Benchmarks the backends (generating and validating HOTPs and TOTPs, at
+several window sizes, for both valid and invalid OTPs), Base32 and URIs.
+
+The results are emitted as JSON, keyed by names which are stable across
+releases (e.g. ``cffi.totp_validate.window_10.invalid``), so that they can be
+compared with a baseline from a previous run::
+
+    python -m oath_toolkit.tests.benchmark --output current.json \\
+        --baseline baseline.json --threshold 0.2
+
+The exit code is ``1`` if any benchmark is slower than its baseline by more
+than the threshold.
+
+The focused benchmarks in the ``benchmarks`` directory of the source tree
+share the constants and helpers defined here (:data:`SECRET`,
+:func:`load_backends`, :func:`time_per_call`, and :func:`argument_parser`).
+"""
+
+from __future__ import division, print_function
+
+import argparse
+from importlib import import_module
+import json
+import platform
+import sys
+import timeit
+
+from .. import base32, uri
+from ..backend import BACKENDS
+from ..exc import OATHError
+from ..metadata import VERSION
+from .fixtures import OTK_SECRET
+
+#: The version of the JSON output format.
+FORMAT = 1
+SECRET = OTK_SECRET
+WINDOWS = (0, 1, 10)
+NOW = 1111111109
+TIME_STEP_SIZE = 30
+DIGITS = 6
+INVALID_OTP = b'000000'
+
+
+def rejecting(validate):
+    """Wrap a raising validation function, swallowing the exception."""
+    def func():
+        try:
+            validate()
+        except OATHError:
+            pass
+    return func
+
+
+def backend_cases(name, oath):
+    """
+    The benchmarks for a backend. The valid OTPs are the last ones in their
+    windows, which is the worst case for a successful validation.
+
+    :rtype: :func:`list` of (name, callable) pairs
+    """
+    cases = [
+        ('hotp_generate',
+         lambda: oath.hotp_generate(OTK_SECRET, 0, DIGITS, False, -1)),
+        ('totp_generate',
+         lambda: oath.totp_generate(OTK_SECRET, NOW, TIME_STEP_SIZE, 0,
+                                    DIGITS)),
+    ]
+    for window in WINDOWS:
+        hotp = oath.hotp_generate(OTK_SECRET, window, DIGITS, False, -1)
+        totp = oath.totp_generate(OTK_SECRET, NOW + window * TIME_STEP_SIZE,
+                                  TIME_STEP_SIZE, 0, DIGITS)
+        suffix = '.window_{0}'.format(window)
+        cases.extend([
+            ('hotp_validate' + suffix + '.valid',
+             lambda hotp=hotp, window=window:
+             oath.hotp_validate(OTK_SECRET, 0, window, hotp)),
+            ('hotp_validate' + suffix + '.invalid', rejecting(
+                lambda window=window:
+                oath.hotp_validate(OTK_SECRET, 0, window, INVALID_OTP))),
+            ('totp_validate' + suffix + '.valid',
+             lambda totp=totp, window=window:
+             oath.totp_validate(OTK_SECRET, NOW, TIME_STEP_SIZE, 0, window,
+                                totp)),
+            ('totp_validate' + suffix + '.invalid', rejecting(
+                lambda window=window:
+                oath.totp_validate(OTK_SECRET, NOW, TIME_STEP_SIZE, 0,
+                                   window, INVALID_OTP))),
+        ])
+    return [(name + '.' + case_name, func) for case_name, func in cases]
+
+
+def common_cases():
+    """
+    The benchmarks which do not depend on the backend.
+
+    :rtype: :func:`list` of (name, callable) pairs
+    """
+    encoded = base32.encode(OTK_SECRET)
+    readable = base32.encode(OTK_SECRET, True)
+    oath_uri = uri.generate('totp', OTK_SECRET, 'alice@example.com',
+                            'Example')
+    build = uri.URIBuilder('totp', 'Example')
+    return [
+        ('base32.encode', lambda: base32.encode(OTK_SECRET)),
+        ('base32.encode.human_readable',
+         lambda: base32.encode(OTK_SECRET, True)),
+        ('base32.decode', lambda: base32.decode(encoded)),
+        ('base32.decode.human_readable', lambda: base32.decode(readable)),
+        ('uri.generate',
+         lambda: uri.generate('totp', OTK_SECRET, 'alice@example.com',
+                              'Example')),
+        ('uri.builder', lambda: build(OTK_SECRET, 'alice@example.com')),
+        ('uri.parse', lambda: uri.parse(oath_uri)),
+    ]
+
+
+def load_backends(backends=BACKENDS, report=False):
+    """
+    Import the backends which are available.
+
+    :param backends: The names of the backends to import.
+    :param bool report: Whether to print the unavailable backends to standard
+                        error.
+    :rtype: :func:`list` of (name, module) pairs
+    """
+    result = []
+    for name in backends:
+        try:
+            result.append((name, import_module('oath_toolkit.impl_' + name)))
+        except (ImportError, OSError):
+            if report:
+                print('{0}: not available'.format(name), file=sys.stderr)
+    return result
+
+
+def cases(backends=BACKENDS):
+    """
+    All of the benchmarks, for the importable backends.
+
+    :rtype: :func:`list` of (name, callable) pairs
+    """
+    result = []
+    for name, oath in load_backends(backends):
+        result.extend(backend_cases(name, oath))
+    return result + common_cases()
+
+
+def time_per_call(func, number, repeat):
+    """
+    Measure the time per call of a function, with a fixed number of calls per
+    measurement.
+
+    :return: The best time per call, in seconds.
+    :rtype: :func:`float`
+    """
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+def measure(func, duration, repeat):
+    """
+    Measure the time per call of a function. The number of calls per
+    measurement is calibrated so that each one takes at least ``duration``
+    seconds.
+
+    :return: The best time per call, in seconds, and the number of calls per
+             measurement.
+    :rtype: :func:`tuple`
+    """
+    timer = timeit.Timer(func)
+    number = 1
+    while timer.timeit(number) < duration / 10:
+        number *= 2
+    number *= 10
+    return min(timer.repeat(repeat, number)) / number, number
+
+
+def run(backends=BACKENDS, duration=0.05, repeat=5, match=None):
+    """
+    Run the benchmarks.
+
+    :param backends: The backends to benchmark (if importable).
+    :param float duration: The minimum duration of a measurement, in seconds.
+    :param int repeat: The number of measurements per benchmark (the best one
+                       is kept).
+    :param str match: If set, only run the benchmarks whose name contains it.
+    :return: The JSON-serializable results.
+    :rtype: :func:`dict`
+    """
+    results = {}
+    for name, func in cases(backends):
+        if match and match not in name:
+            continue
+        seconds, number = measure(func, duration, repeat)
+        results[name] = {'seconds': seconds, 'number': number}
+    return {
+        'format': FORMAT,
+        'version': VERSION,
+        'python': '{0} {1}'.format(platform.python_implementation(),
+                                   platform.python_version()),
+        'results': results,
+    }
+
+
+def compare(current, baseline, threshold):
+    """
+    Find the benchmarks which regressed compared to a baseline. Benchmarks
+    which are missing from either run are ignored.
+
+    :param dict current: The output of :func:`run`.
+    :param dict baseline: The output of :func:`run`, from a previous run.
+    :param float threshold: The tolerated slowdown, e.g. ``0.2`` for 20%.
+    :return: The name, baseline time, current time, and ratio, of each
+             regression, slowest first.
+    :rtype: :func:`list` of :func:`tuple`
+    """
+    regressions = []
+    for name, result in current['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            continue
+        ratio = result['seconds'] / base['seconds']
+        if ratio > 1 + threshold:
+            regressions.append((name, base['seconds'], result['seconds'],
+                                ratio))
+    return sorted(regressions, key=lambda regression: -regression[3])
+
+
+def argument_parser(prog, number, repeat=5, description=None):
+    """
+    The command line parser of a focused benchmark, with the options which
+    set the number of calls per measurement, and the number of measurements
+    (unless ``repeat`` is :data:`None`).
+    """
+    parser = argparse.ArgumentParser(prog, description=description)
+    parser.add_argument('-n', '--number', type=int, default=number,
+                        help='Calls per measurement')
+    if repeat is not None:
+        parser.add_argument('-r', '--repeat', type=int, default=repeat,
+                            help='Measurements per operation (best is kept)')
+    return parser
+
+
+def parse_args(prog, args):
+    parser = argparse.ArgumentParser(prog)
+    parser.add_argument('-o', '--output',
+                        help='Write the results to this file, instead of '
+                             'standard output')
+    parser.add_argument('-b', '--baseline',
+                        help='Compare the results with those in this file')
+    parser.add_argument('-t', '--threshold', type=float, default=0.2,
+                        help='Tolerated slowdown compared to the baseline '
+                             '(default: %(default)s)')
+    parser.add_argument('-d', '--duration', type=float, default=0.05,
+                        help='Minimum seconds per measurement')
+    parser.add_argument('-r', '--repeat', type=int, default=5,
+                        help='Measurements per benchmark (best is kept)')
+    parser.add_argument('-k', '--match',
+                        help='Only run benchmarks whose name contains this')
+    parser.add_argument('--backend', dest='backends', action='append',
+                        choices=BACKENDS,
+                        help='Benchmark this backend (default: all)')
+    return parser.parse_args(args)
+
+
+def main(argv):
+    args = parse_args(argv[0], argv[1:])
+    results = run(args.backends or BACKENDS, args.duration, args.repeat,
+                  args.match)
+    output = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    if not args.baseline:
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold)
+    for name, base, current, ratio in regressions:
+        print('{0}: {1:.3g}s -> {2:.3g}s ({3:+.0%})'.format(
+            name, base, current, ratio - 1), file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
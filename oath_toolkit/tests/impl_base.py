@@ -20,7 +20,7 @@ from platform import python_implementation
 import sys
 import time
 from . import unittest
-from ..exc import OATHError
+from ..exc import OATH_INVALID_OTP, OATHError
 from .fixtures import (
     DEFAULT_TIME_STEP_SIZE, DIGITS, HOTP_VECTORS, OTK_SECRET, SECRET,
     TOTPG_VECTORS, TOTPV_VECTORS, WINDOW)
@@ -131,6 +131,35 @@ class ImplTestMixin(OTPTestMixin):
     def test_totp_validate_from_otk_tests(self):
         self.assertValidatedTOTPsFromOTK()
 
+    def test_totp_validate_many(self):
+        now = 1111111109
+        time_step_size = 30
+        start_offset = 0
+        window = 10
+        otps = [b'07081804', b'14050471', b'00000000']
+        result = self.oath.totp_validate_many([OTK_SECRET] * len(otps), otps,
+                                              now, time_step_size,
+                                              start_offset, window)
+        self.assertEqual([0, 1, -6], list(result))
+        with self.assertRaises(ValueError):
+            self.oath.totp_validate_many([OTK_SECRET], otps, now,
+                                         time_step_size, start_offset, window)
+
+    def test_buffer_inputs(self):
+        now = 1111111109
+        for secret in (bytearray(OTK_SECRET), memoryview(OTK_SECRET)):
+            self.assertEqual(b'755224', self.oath.hotp_generate(secret, 0, 6,
+                                                                False, -1))
+            self.assertEqual(OTPPosition(None, 1), self.oath.hotp_validate(
+                secret, 0, 1, memoryview(b'287082')))
+            self.assertEqual(b'07081804', self.oath.totp_generate(
+                secret, now, 30, 0, 8))
+            self.assertEqual(OTPPosition(0, 0), self.oath.totp_validate(
+                secret, now, 30, 0, 1, bytearray(b'07081804')))
+        with self.assertRaises(OATHError):
+            self.oath.totp_validate(memoryview(OTK_SECRET), now, 30, 0, 1,
+                                    bytearray(b'123456789'))
+
     def test_hotp(self):
         moving_factor = 12
         otp = self.oath.hotp_generate(SECRET, moving_factor, DIGITS,
@@ -188,6 +217,19 @@ class ImplTestMixin(OTPTestMixin):
         with self.assertRaises(OATHError):  # outside of window
             self.oath.totp_validate(SECRET, now + 60, -1, 30, 0, otp)
 
+    def test_try_hotp_validate(self):
+        self.assertEqual(1, self.oath.try_hotp_validate(OTK_SECRET, 0, 1,
+                                                        b'287082'))
+        self.assertEqual(OATH_INVALID_OTP, self.oath.try_hotp_validate(
+            OTK_SECRET, 0, 1, b'000000'))
+
+    def test_try_totp_validate(self):
+        now = 1111111109
+        self.assertEqual((1, 1), self.oath.try_totp_validate(
+            OTK_SECRET, now - 30, 30, 0, 1, b'07081804'))
+        self.assertEqual(OATH_INVALID_OTP, self.oath.try_totp_validate(
+            OTK_SECRET, now, 30, 0, 1, b'00000000')[0])
+
     def test_library_version(self):
         version = self.oath.library_version
         self.assertIsNotNone(version)
@@ -197,6 +239,10 @@ class ImplTestMixin(OTPTestMixin):
         self.assertTrue(self.oath.check_library_version(b'0'))
         self.assertFalse(self.oath.check_library_version(b'999'))
 
+    def test_strerror(self):
+        self.assertEqual(b'The OTP is not valid',
+                         self.oath.strerror(OATH_INVALID_OTP))
+
     def test_base32_decode(self):
         # From oath-toolkit, liboath/tests/tst_coding.c
         with self.assertRaises((OATHError, TypeError)):
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2013, 2014 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from .. import backend, get_backend, impl_hashlib, set_backend
+from . import unittest
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+
+class BackendTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.addCleanup(set_backend, get_backend())
+
+    def set_environment(self, value):
+        original = os.environ.get(backend.ENVIRONMENT_VARIABLE)
+        if original is None:
+            self.addCleanup(os.environ.pop, backend.ENVIRONMENT_VARIABLE,
+                            None)
+        else:
+            self.addCleanup(os.environ.__setitem__,
+                            backend.ENVIRONMENT_VARIABLE, original)
+        os.environ[backend.ENVIRONMENT_VARIABLE] = value
+
+    def test_lazy_import(self):
+        code = ('import oath_toolkit, sys; '
+                'print(sorted(m for m in sys.modules if "impl_" in m)); '
+                'print(oath_toolkit.get_backend() in oath_toolkit.BACKENDS)')
+        output = subprocess.check_output([sys.executable, '-c', code])
+        self.assertEqual([b'[]', b'True'], output.split())
+
+    def test_load(self):
+        self.set_environment('hashlib')
+        proxy = backend.LazyBackend()
+        self.assertIn('not loaded', repr(proxy))
+        self.assertIs(impl_hashlib.hotp_generate, proxy.hotp_generate)
+        self.assertEqual('oath_toolkit.impl_hashlib',
+                         proxy.capabilities.backend)
+        with self.assertRaises(AttributeError):
+            proxy.missing
+
+    def test_load_unknown(self):
+        self.set_environment('java')
+        with self.assertRaises(ValueError):
+            backend.LazyBackend().hotp_generate
+
+    def test_set_backend(self):
+        capabilities = set_backend('hashlib')
+        self.assertEqual('oath_toolkit.impl_hashlib', capabilities.backend)
+        self.assertEqual('hashlib', get_backend())
+        self.assertIs(impl_hashlib.totp_generate, backend.oath.totp_generate)
+        with self.assertRaises(ValueError):
+            set_backend('java')
+
+    def use_profile(self, profile=None):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'profile', 'backend.json')
+        if profile is not None:
+            os.mkdir(os.path.dirname(path))
+            with open(path, 'w') as f:
+                f.write(profile)
+        original = os.environ.get(backend.PROFILE_VARIABLE)
+        if original is not None:
+            self.addCleanup(os.environ.__setitem__, backend.PROFILE_VARIABLE,
+                            original)
+        else:
+            self.addCleanup(os.environ.pop, backend.PROFILE_VARIABLE, None)
+        os.environ[backend.PROFILE_VARIABLE] = path
+        return path
+
+    def test_calibrate(self):
+        timings = backend.calibrate(['hashlib'], duration=0.001, repeat=1)
+        self.assertEqual(['hashlib'], list(timings))
+        self.assertGreater(timings['hashlib'], 0)
+
+    def test_auto(self):
+        path = self.use_profile()
+        self.set_environment('auto')
+        proxy = backend.LazyBackend()
+        proxy.hotp_generate
+        with open(path) as f:
+            profile = json.load(f)
+        entry = profile[backend._profile_key()]
+        self.assertIn('hashlib', entry['timings'])
+        self.assertEqual(sorted(entry['timings']), entry['backends'])
+        self.assertEqual(min(entry['timings'], key=entry['timings'].get),
+                         entry['backend'])
+        self.assertEqual('oath_toolkit.impl_' + entry['backend'],
+                         proxy.capabilities.backend)
+
+    def test_auto_from_profile(self):
+        profile = {backend._profile_key(): {
+            'backend': 'hashlib', 'backends': sorted(backend._importable()),
+            'timings': {}}}
+        path = self.use_profile(json.dumps(profile))
+        self.assertEqual('oath_toolkit.impl_hashlib',
+                         set_backend('auto').backend)
+        with open(path) as f:
+            self.assertEqual(profile, json.load(f))
+
+    def test_auto_backends_changed(self):
+        profile = {backend._profile_key(): {'backend': 'hashlib',
+                                            'backends': ['hashlib', 'java'],
+                                            'timings': {}}}
+        path = self.use_profile(json.dumps(profile))
+        set_backend('auto')
+        with open(path) as f:
+            entry = json.load(f)[backend._profile_key()]
+        self.assertEqual(sorted(backend._importable()), entry['backends'])
+        self.assertIn('hashlib', entry['timings'])
+
+    def test_auto_invalid_profile(self):
+        path = self.use_profile('{')
+        set_backend('auto')
+        with open(path) as f:
+            self.assertIn(backend._profile_key(), json.load(f))
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2013, 2014 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from .. import base32
+from ..exc import OATH_INVALID_BASE32, OATHError
+from . import unittest
+from base64 import b32encode
+import os
+
+
+class Base32TestCase(unittest.TestCase):
+
+    def test_encode(self):
+        self.assertEqual(b'', base32.encode(None))
+        self.assertEqual(b'MZXW6===', base32.encode(b'foo'))
+        self.assertEqual(b'MZXW 6', base32.encode(b'foo', True))
+        self.assertEqual(b'ME', base32.encode(b'a', True))
+        self.assertEqual(b'MFRG GZDF', base32.encode(b'abcde', True))
+
+    def test_encode_many(self):
+        for size in (5, 7, 40):
+            data = os.urandom(size * 3)
+            pieces = [data[i:i + size] for i in range(0, len(data), size)]
+            expected = [b32encode(piece) for piece in pieces]
+            self.assertEqual(expected, base32.encode_many(pieces))
+            self.assertEqual(expected, base32.encode_many(data, size))
+            self.assertEqual(expected, base32.encode_many(bytearray(data),
+                                                          size))
+            self.assertEqual([base32.encode(piece, True) for piece in pieces],
+                             base32.encode_many(data, size, True))
+        with self.assertRaises(ValueError):
+            base32.encode_many(b'abcdef', 5)
+
+    def test_decode(self):
+        for encoded in (b'MZXW6===', b'MZXW6', b'mzxw6', b'MZ XW 6',
+                        b'mz xw 6==='):
+            self.assertEqual(b'foo', base32.decode(encoded))
+        dropbox = b'gr6d 5br7 25s6 vnck v4vl hlao re'
+        self.assertEqual(16, len(base32.decode(dropbox)))
+        for encoded in (b'', None, b'*', b'NIXnix', b'MZXW6=1=', b'MZXW6A==',
+                        b'MZ_W6===', b'MZXW1===', b'-MZXW6==', b'========'):
+            with self.assertRaises(OATHError) as cm:
+                base32.decode(encoded)
+            self.assertEqual(OATH_INVALID_BASE32, cm.exception.code)
+
+    def test_decode_many(self):
+        data = [os.urandom(size) for size in (1, 10, 20, 40)]
+        self.assertEqual(data, base32.decode_many(
+            base32.encode_many(data, human_readable=True)))
+
+    def test_decode_with_decoder(self):
+        decoded = []
+
+        def decoder(data):
+            decoded.append(data)
+            return b'foo'
+
+        self.assertEqual(b'foo', base32.decode(b'MZ XW 6', decoder))
+        self.assertEqual([b'MZ XW 6'], decoded)
+        with self.assertRaises(OATHError):
+            base32.decode(b'NIXnix', decoder)
+        with self.assertRaises(OATHError):
+            base32.decode(b'', decoder)
+        self.assertEqual([b'MZ XW 6'], decoded)
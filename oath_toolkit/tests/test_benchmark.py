@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2013, 2014 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from . import benchmark, unittest
+import json
+
+
+class BenchmarkTestCase(unittest.TestCase):
+
+    def test_names(self):
+        names = [name for name, _ in benchmark.cases(['hashlib'])]
+        self.assertEqual(len(names), len(set(names)))
+        for name in ('hashlib.hotp_generate', 'hashlib.totp_generate',
+                     'hashlib.hotp_validate.window_10.valid',
+                     'hashlib.totp_validate.window_0.invalid',
+                     'base32.decode.human_readable', 'uri.generate'):
+            self.assertIn(name, names)
+
+    def test_load_backends(self):
+        backends = benchmark.load_backends(['hashlib', 'missing'])
+        self.assertEqual(['hashlib'], [name for name, _ in backends])
+        oath = backends[0][1]
+        seconds = benchmark.time_per_call(
+            lambda: oath.hotp_generate(benchmark.SECRET, 0, 6), 10, 1)
+        self.assertGreater(seconds, 0)
+
+    def test_run(self):
+        results = benchmark.run(['hashlib'], duration=0.001, repeat=1,
+                                match='window_1.')
+        self.assertEqual(benchmark.FORMAT, results['format'])
+        self.assertEqual(4, len(results['results']))
+        for result in results['results'].values():
+            self.assertGreater(result['seconds'], 0)
+        self.assertEqual(results, json.loads(json.dumps(results)))
+
+    def test_compare(self):
+        def run(**timings):
+            return {'results': dict((name, {'seconds': seconds})
+                                    for name, seconds in timings.items())}
+
+        baseline = run(a=1.0, b=1.0, c=1.0)
+        current = run(a=1.1, b=1.5, c=0.5, d=9.0)
+        self.assertEqual([('b', 1.0, 1.5, 1.5)],
+                         benchmark.compare(current, baseline, 0.2))
+        self.assertEqual(['b', 'a'], [regression[0] for regression in
+                                      benchmark.compare(current, baseline,
+                                                        0.05)])
@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2015 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from .. import OATH, TOTP, cache, impl_hashlib
+from ..exc import OATH_INVALID_OTP, OATHError
+from ..types import CacheStats, OTPPosition
+from . import unittest
+from .fixtures import HOTP_VECTORS, OTK_SECRET, TOTPV_VECTORS
+
+
+class FakeTimer(object):
+
+    def __init__(self, now=0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class LRUCacheTestCase(unittest.TestCase):
+
+    def test_eviction(self):
+        lru = cache.LRUCache(maxsize=2)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        self.assertEqual(1, lru.get('a'))
+        lru.set('c', 3)  # evicts 'b', the least recently used entry
+        self.assertIsNone(lru.get('b'))
+        self.assertEqual(1, lru.get('a'))
+        self.assertEqual(3, lru.get('c'))
+        self.assertEqual(CacheStats(hits=3, misses=1, evictions=1, size=2,
+                                    maxsize=2), lru.stats())
+
+    def test_ttl(self):
+        timer = FakeTimer()
+        lru = cache.LRUCache(maxsize=2, ttl=30, timer=timer)
+        lru.set('a', 1)
+        timer.now = 29
+        self.assertEqual(1, lru.get('a'))
+        timer.now = 30
+        self.assertEqual('expired', lru.get('a', 'expired'))
+        self.assertEqual(0, len(lru))
+
+    def test_expires(self):
+        timer = FakeTimer()
+        lru = cache.LRUCache(maxsize=4, ttl=60, timer=timer)
+        lru.set('a', 1, expires=10)
+        lru.set('b', 2)
+        self.assertEqual(1, lru.get('a', now=9))
+        self.assertIsNone(lru.get('a', now=10))
+        lru.set('c', 3, expires=20)
+        lru.set('d', 4, now=20)
+        # 'c' has expired, but is only removed once it is the least recently
+        # used entry.
+        self.assertEqual(['b', 'c', 'd'], list(lru._data))
+        self.assertEqual(2, lru.get('b', now=20))
+        lru.set('e', 5, now=20)
+        self.assertEqual(['d', 'b', 'e'], list(lru._data))
+
+    def test_clear(self):
+        lru = cache.LRUCache(maxsize=1)
+        lru.set('a', 1)
+        lru.get('a')
+        lru.clear()
+        self.assertEqual(CacheStats(hits=0, misses=0, evictions=0, size=0,
+                                    maxsize=1), lru.stats())
+
+    def test_invalid_maxsize(self):
+        with self.assertRaises(ValueError):
+            cache.LRUCache(maxsize=0)
+
+
+class KeyScheduleCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = cache.enable_key_schedule_cache(maxsize=4)
+
+    def tearDown(self):
+        cache.disable_key_schedule_cache()
+
+    def test_validate(self):
+        for counter, otp in enumerate(HOTP_VECTORS[6]):
+            result = impl_hashlib.hotp_validate(OTK_SECRET, 0, 20, otp)
+            self.assertEqual(counter, result.relative)
+        stats = self.cache.stats()
+        self.assertEqual(1, stats.misses)
+        self.assertEqual(len(HOTP_VECTORS[6]) - 1, stats.hits)
+        self.assertEqual(1, stats.size)
+
+    def test_evict(self):
+        for i in range(6):
+            impl_hashlib.hotp_generate(bytearray([i]) * 20, 0, 6)
+        impl_hashlib.hotp_generate(bytearray([5]) * 20, 1, 6)
+        stats = self.cache.stats()
+        self.assertEqual(6, stats.misses)
+        self.assertEqual(1, stats.hits)
+        self.assertEqual(2, stats.evictions)
+        self.assertEqual(4, stats.size)
+
+    def test_recency(self):
+        secrets = [bytearray([i]) * 20 for i in range(5)]
+        for secret in secrets[:4]:
+            impl_hashlib.hotp_generate(secret, 0, 6)
+        impl_hashlib.hotp_generate(secrets[0], 1, 6)
+        impl_hashlib.hotp_generate(secrets[4], 0, 6)
+        self.assertEqual(1, self.cache.stats().evictions)
+        impl_hashlib.hotp_generate(secrets[0], 2, 6)
+        self.assertEqual((2, 5), (self.cache.stats().hits,
+                                  self.cache.stats().misses))
+
+    def test_ttl(self):
+        timer = FakeTimer()
+        key_cache = cache.KeyScheduleCache(maxsize=2, ttl=30, timer=timer)
+        keyed = key_cache.get_or_set(OTK_SECRET, impl_hashlib._new_hmac)
+        self.assertIs(keyed, key_cache.get_or_set(OTK_SECRET, None))
+        timer.now = 30
+        self.assertIsNot(keyed, key_cache.get_or_set(
+            bytearray(OTK_SECRET), impl_hashlib._new_hmac))
+
+    def test_disabled(self):
+        cache.disable_key_schedule_cache()
+        impl_hashlib.hotp_generate(OTK_SECRET, 0, 6)
+        self.assertEqual(0, self.cache.stats().misses)
+
+
+class TOTPWindowCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = cache.enable_totp_window_cache(maxsize=4)
+        self.oath = OATH()
+
+    def tearDown(self):
+        cache.disable_totp_window_cache()
+
+    def test_vectors(self):
+        for i, tv in enumerate(TOTPV_VECTORS):
+            result = self.oath.totp_validate(OTK_SECRET, tv.now, 30, 0,
+                                             tv.window, tv.otp)
+            self.assertEqual(OTPPosition(tv.expected_rc, tv.otp_pos), result,
+                             'index {0}'.format(i))
+
+    def test_same_step(self):
+        now = 1111111109
+        totp = TOTP(OTK_SECRET, 8, 30)
+        self.assertEqual(OTPPosition(0, 0), totp.verify(b'07081804', now, 1))
+        self.assertEqual(OTPPosition(1, 1),
+                         totp.verify(b'14050471', now - 1, 1))
+        with self.assertRaises(OATHError) as ctx:
+            totp.verify(b'00000000', now, 1)
+        self.assertEqual(OATH_INVALID_OTP, ctx.exception.code)
+        stats = self.cache.stats()
+        self.assertEqual((2, 1, 1), (stats.hits, stats.misses, stats.size))
+
+    def test_step_rollover(self):
+        now = 1111111109
+        totp = TOTP(OTK_SECRET, 8, 30)
+        totp.verify(b'07081804', now, 1)
+        # The next time step: the previous entry is replaced.
+        self.assertEqual(OTPPosition(1, -1),
+                         totp.verify(b'07081804', now + 30, 1))
+        stats = self.cache.stats()
+        self.assertEqual((0, 2, 1), (stats.hits, stats.misses, stats.size))
+
+    def test_expiry(self):
+        now = 1111111109
+        other_secret = b'\x00' * 20
+        self.oath.try_totp_validate(OTK_SECRET, now, 30, 0, 1, b'07081804')
+        self.oath.try_totp_validate(other_secret, now + 30, 30, 0, 1,
+                                    b'00000000')
+        # The first secret's step has ended.
+        self.assertEqual(1, self.cache.stats().size)
+
+    def test_invalid_digits(self):
+        with self.assertRaises(OATHError):
+            self.oath.totp_validate(OTK_SECRET, 0, 30, 0, 1, b'12345')
+        self.assertEqual(0, self.cache.stats().misses)
+
+    def test_try_validate(self):
+        now = 1111111109
+        self.assertEqual((0, 0), self.oath.try_totp_validate(
+            OTK_SECRET, now, 30, 0, 1, b'07081804'))
+        self.assertEqual((OATH_INVALID_OTP, 0), self.oath.try_totp_validate(
+            OTK_SECRET, now, 30, 0, 1, b'00000000'))
+        self.assertEqual(1, self.cache.stats().hits)
+
+    def test_lazy(self):
+        now = 1111111109
+        backend = CountingTOTPBackend(impl_hashlib)
+        self.assertEqual((0, 0), self.cache.try_validate(
+            backend, OTK_SECRET, now, 30, 0, 2, b'07081804'))
+        self.assertEqual(1, backend.generated)
+        self.assertEqual((1, 1), self.cache.try_validate(
+            backend, OTK_SECRET, now, 30, 0, 2, b'14050471'))
+        self.assertEqual(2, backend.generated)
+        self.assertEqual((0, 0), self.cache.try_validate(
+            backend, OTK_SECRET, now, 30, 0, 2, b'07081804'))
+        self.assertEqual(2, backend.generated)
+        for _ in range(2):
+            self.assertEqual((OATH_INVALID_OTP, 0), self.cache.try_validate(
+                backend, OTK_SECRET, now, 30, 0, 2, b'00000000'))
+            self.assertEqual(5, backend.generated)
+
+
+class CountingTOTPBackend(object):
+
+    """Counts the TOTPs generated by a backend."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.generated = 0
+
+    def hotp_generate(self, secret, moving_factor, digits, add_checksum,
+                      truncation_offset):
+        self.generated += 1
+        return self.backend.hotp_generate(secret, moving_factor, digits,
+                                          add_checksum, truncation_offset)
+
+
+class CountingBackend(object):
+
+    """Counts the OTPs generated by a backend."""
+
+    def __init__(self, backend, codes=None):
+        self.backend = backend
+        self.codes = codes
+        self.generated = 0
+
+    def hotp_generate(self, secret, moving_factor, digits, add_checksum,
+                      truncation_offset):
+        self.generated += 1
+        if self.codes is not None:
+            return self.codes[moving_factor]
+        return self.backend.hotp_generate(secret, moving_factor, digits,
+                                          add_checksum, truncation_offset)
+
+    def try_hotp_validate(self, secret, start_moving_factor, window, otp):
+        return self.backend.try_hotp_validate(secret, start_moving_factor,
+                                              window, otp)
+
+
+class HOTPLookAheadCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = cache.enable_hotp_lookahead_cache(maxsize=4)
+
+    def tearDown(self):
+        cache.disable_hotp_lookahead_cache()
+
+    def test_vectors(self):
+        oath = OATH()
+        for digits, otps in enumerate(HOTP_VECTORS):
+            for counter, otp in enumerate(otps):
+                self.assertEqual(OTPPosition(None, counter),
+                                 oath.hotp_validate(OTK_SECRET, 0, 20, otp))
+        with self.assertRaises(OATHError) as ctx:
+            oath.hotp_validate(OTK_SECRET, 1, 20, HOTP_VECTORS[6][0])
+        self.assertEqual(OATH_INVALID_OTP, ctx.exception.code)
+        self.assertEqual(OATH_INVALID_OTP,
+                         oath.try_hotp_validate(OTK_SECRET, 0, 0, b'000000'))
+        with self.assertRaises(OATHError):
+            oath.hotp_validate(OTK_SECRET, 0, 20, b'12345')
+
+    def test_incremental(self):
+        backend = CountingBackend(impl_hashlib)
+        otps = HOTP_VECTORS[6]
+        validate = self.cache.try_validate
+        self.assertEqual(3, validate(backend, OTK_SECRET, 0, 5, otps[3]))
+        self.assertEqual(6, backend.generated)
+        # The counter moves past the accepted OTP: only the tail is new.
+        self.assertEqual(1, validate(backend, OTK_SECRET, 4, 5, otps[5]))
+        self.assertEqual(10, backend.generated)
+        self.assertEqual(OATH_INVALID_OTP,
+                         validate(backend, OTK_SECRET, 4, 5, otps[3]))
+        self.assertEqual(10, backend.generated)
+        # A smaller window only looks at the beginning of the table.
+        self.assertEqual(OATH_INVALID_OTP,
+                         validate(backend, OTK_SECRET, 4, 1, otps[9]))
+        self.assertEqual(5, validate(backend, OTK_SECRET, 4, 5, otps[9]))
+        self.assertEqual(10, backend.generated)
+        # Moving backwards recomputes the window.
+        self.assertEqual(0, validate(backend, OTK_SECRET, 0, 0, otps[0]))
+        self.assertEqual(11, backend.generated)
+
+    def test_collisions(self):
+        codes = [b'111111', b'222222', b'111111', b'333333', b'111111']
+        backend = CountingBackend(impl_hashlib, codes)
+        validate = self.cache.try_validate
+        self.assertEqual(0, validate(backend, OTK_SECRET, 0, 3, b'111111'))
+        self.assertEqual(1, validate(backend, OTK_SECRET, 1, 3, b'111111'))
+        self.assertEqual(0, validate(backend, OTK_SECRET, 2, 2, b'111111'))
+        self.assertEqual(OATH_INVALID_OTP,
+                         validate(backend, OTK_SECRET, 3, 0, b'111111'))
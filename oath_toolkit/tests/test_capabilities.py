@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2013, 2014 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import oath_toolkit
+from .. import OATH, capabilities, impl_hashlib
+from .fixtures import OTK_SECRET
+from . import unittest
+
+
+class FakeLibrary(object):
+
+    oath_totp_validate2 = None
+
+
+class CapabilitiesTestCase(unittest.TestCase):
+
+    def test_version_info(self):
+        self.assertEqual((2, 6, 1), capabilities.version_info(b'2.6.1'))
+        self.assertEqual((1, 12), capabilities.version_info('1.12'))
+        self.assertEqual((2, 4, 1), capabilities.version_info(b'2.4.1-rc1'))
+
+    def test_probe(self):
+        caps = capabilities.probe(impl_hashlib)
+        self.assertIs(caps, capabilities.probe(impl_hashlib))
+        self.assertEqual('oath_toolkit.impl_hashlib', caps.backend)
+        self.assertEqual(impl_hashlib.library_version, caps.version)
+        self.assertTrue(caps.base32_decode)
+        self.assertTrue(caps.totp_validate2)
+        self.assertEqual(('sha1',), caps.algorithms)
+
+    def test_has_symbol(self):
+        self.assertTrue(capabilities._has_symbol(impl_hashlib,
+                                                 'oath_totp_validate2'))
+
+        class Backend(object):
+            c = FakeLibrary()
+
+        self.assertTrue(capabilities._has_symbol(Backend,
+                                                 'oath_totp_validate2'))
+        self.assertFalse(capabilities._has_symbol(Backend,
+                                                  'oath_base32_decode'))
+
+    def test_check_library_version(self):
+        oath = OATH()
+        self.assertEqual(oath.capabilities.version, oath.library_version)
+        self.assertTrue(oath.check_library_version(b'0'))
+        self.assertFalse(oath.check_library_version(b'999'))
+
+    def test_without_totp_validate2(self):
+        backend = oath_toolkit.oath
+        original = backend.capabilities
+        self.addCleanup(setattr, backend, 'capabilities', original)
+        backend.capabilities = original._replace(totp_validate2=False)
+        oath = OATH()
+        now = 1111111109
+        self.assertEqual((1, -1), oath.try_totp_validate(
+            OTK_SECRET, now + 30, 30, 0, 1, b'07081804'))
+        self.assertEqual([0, 1, -6], list(oath.totp_validate_many(
+            [OTK_SECRET] * 3, [b'07081804', b'14050471', b'00000000'], now,
+            30, 0, 10)))
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2015 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+from .. import enrollment, uri
+from . import unittest
+import os
+import shutil
+import stat
+import tempfile
+import zipfile
+
+ENTRIES = [(u'alice@example.com', b'Hello!\xDE\xAD\xBE\xEF'),
+           (u'bob "the builder"', b'\x00' * 20),
+           (u'carol', b'\xff' * 20)]
+
+
+class EnrollmentTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def assertManifest(self, manifest, key_type='totp', counter=None):
+        lines = manifest.decode('utf-8').splitlines()
+        self.assertEqual(u'"filename","user","uri"', lines[0])
+        for i, (user, secret) in enumerate(ENTRIES):
+            name = enrollment.filename(i, user)
+            oath_uri = uri.generate(key_type, secret, user, u'Example',
+                                    counter)
+            self.assertIn(u'"{0}","{1}","{2}"'.format(
+                name, user.replace(u'"', u'""'), oath_uri), lines)
+
+    def test_filename(self):
+        self.assertEqual('000012_bob__the_builder_.png',
+                         enrollment.filename(12, u'bob "the builder"'))
+
+    def test_directory(self):
+        output = os.path.join(self.tmpdir, 'kits')
+        progress = []
+        stats = enrollment.generate(ENTRIES, output, u'Example',
+                                    key_type='hotp', processes=0,
+                                    batch_size=2, progress=progress.append)
+        self.assertEqual(3, stats.count)
+        self.assertEqual([2, 3], [p.count for p in progress])
+        names = sorted(os.listdir(output))
+        self.assertEqual(4, len(names))
+        for name in names[:-1]:
+            with open(os.path.join(output, name), 'rb') as f:
+                self.assertEqual(b'\x89PNG', f.read(4))
+        self.assertEqual(stats.bytes, sum(
+            os.path.getsize(os.path.join(output, name))
+            for name in names[:-1]))
+        with open(os.path.join(output, enrollment.MANIFEST_NAME), 'rb') as f:
+            self.assertManifest(f.read(), 'hotp', 0)
+        if os.name == 'posix':
+            self.assertEqual(0o700, stat.S_IMODE(os.stat(output).st_mode))
+            for name in names:
+                self.assertEqual(0o600, stat.S_IMODE(
+                    os.stat(os.path.join(output, name)).st_mode))
+
+    def test_zip_with_pool(self):
+        output = os.path.join(self.tmpdir, 'kits.zip')
+        stats = enrollment.generate(iter(ENTRIES), output, u'Example',
+                                    processes=2, batch_size=2)
+        self.assertEqual(3, stats.count)
+        with zipfile.ZipFile(output) as archive:
+            self.assertEqual(4, len(archive.namelist()))
+            self.assertManifest(archive.read(enrollment.MANIFEST_NAME))
+            for info in archive.infolist():
+                self.assertEqual(0o600, stat.S_IMODE(info.external_attr >> 16))
+        if os.name == 'posix':
+            self.assertEqual(0o600, stat.S_IMODE(os.stat(output).st_mode))
+        self.assertEqual(['kits.zip'], os.listdir(self.tmpdir))
+
+    def test_error_terminates_pool(self):
+        def entries():
+            for entry in ENTRIES:
+                yield entry
+            raise RuntimeError('entries')
+
+        output = os.path.join(self.tmpdir, 'kits.zip')
+        with self.assertRaises(RuntimeError):
+            enrollment.generate(entries(), output, u'Example', processes=2,
+                                batch_size=2)
+        self.assertEqual(['kits.zip'], os.listdir(self.tmpdir))
+
+    def test_pool_error_removes_manifest(self):
+        class BrokenMultiprocessing(object):
+            def Pool(self, processes):
+                raise OSError('no processes')
+
+        self.addCleanup(setattr, enrollment, 'multiprocessing',
+                        enrollment.multiprocessing)
+        enrollment.multiprocessing = BrokenMultiprocessing()
+        output = os.path.join(self.tmpdir, 'kits')
+        with self.assertRaises(OSError):
+            enrollment.generate(ENTRIES, output, u'Example', processes=2)
+        self.assertEqual([], os.listdir(output))
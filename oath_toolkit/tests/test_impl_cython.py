@@ -14,6 +14,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from ..exc import OATHError
+from .fixtures import HOTP_VECTORS, OTK_SECRET
 from .impl_base import ImplTestMixin
 try:  # pragma: no cover
     from .. import impl_cython as oath
@@ -34,3 +36,22 @@ class CythonTestCase(ImplTestMixin, unittest.TestCase):
 
     test_base32_decode = \
         skipUnlessBase32Decode(ImplTestMixin.test_base32_decode)
+
+    def test_hotp_generate_range(self):
+        for digits, otps in enumerate(HOTP_VECTORS):
+            if not otps:
+                continue
+            result = self.oath.hotp_generate_range(OTK_SECRET, 0, len(otps),
+                                                   digits)
+            self.assertEqual(list(otps), result)
+        self.assertEqual([], self.oath.hotp_generate_range(OTK_SECRET, 0, 0,
+                                                           6))
+        with self.assertRaises(OATHError):
+            self.oath.hotp_generate_range(OTK_SECRET, 0, 10, 9)
+
+    def test_totp_generate_range(self):
+        result = self.oath.totp_generate_range(OTK_SECRET, 1111111109, 2, 30,
+                                               0, 8)
+        self.assertEqual([b'07081804', b'14050471'], result)
+        with self.assertRaises(OATHError):
+            self.oath.totp_generate_range(OTK_SECRET, 0, 10, 30, 0, 9)
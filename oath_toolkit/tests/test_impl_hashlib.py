@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2015 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from .. import impl_hashlib as oath
+from ..exc import OATH_INVALID_OTP, OATHError
+from . import unittest
+from .fixtures import OTK_SECRET
+from .impl_base import ImplTestMixin
+
+
+class HashlibTestCase(ImplTestMixin, unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.oath = oath
+
+    def test_base32_decode_human_readable(self):
+        self.assertEqual(b'foo', self.oath.base32_decode(b'mzxw 6'))
+
+    def test_truncation_offset(self):
+        # The HMAC-SHA1 value for counter 0 in RFC 4226, appendix D is
+        # cc93cf18508d94934c64b65d8ba7667fb7cde4b0, so its dynamic truncation
+        # offset is 0.
+        self.assertEqual(b'755224',
+                         self.oath.hotp_generate(OTK_SECRET, 0, 6, False, 0))
+        self.assertEqual(b'339280',
+                         self.oath.hotp_generate(OTK_SECRET, 0, 6, False, 1))
+
+    def test_error_code(self):
+        with self.assertRaises(OATHError) as ctx:
+            self.oath.hotp_validate(OTK_SECRET, 0, 0, b'000000')
+        self.assertEqual(OATH_INVALID_OTP, ctx.exception.code)
@@ -16,10 +16,11 @@
 
 import hashlib
 from .. import HOTP, OATH, TOTP
-from ..exc import OATHError
+from ..exc import OATH_INVALID_OTP, OATHError
 from . import unittest
 from . import impl_base
 from .fixtures import OTK_SECRET
+from ..types import OTPPosition
 
 
 class OTPTestMixin(impl_base.OTPTestMixin):
@@ -79,6 +80,39 @@ class TOTPTestCase(OTPTestMixin, unittest.TestCase):
     def test_verify_from_otk_tests(self):
         self.assertValidatedTOTPsFromOTK()
 
+    def test_verify_with_drift(self):
+        now = 1111111109
+        totp = TOTP(OTK_SECRET, 8, 30)
+        # 14050471 is one step after now.
+        for drift in (1, 0, -1, 5):
+            self.assertEqual(OTPPosition(1, 1),
+                             totp.verify(b'14050471', now, 1, drift))
+        # The drift does not widen the window.
+        with self.assertRaises(OATHError):
+            totp.verify(b'14050471', now, 0, 1)
+        with self.assertRaises(OATHError):
+            totp.verify(b'00000000', now, 1, 1)
+
+    def test_verify_asymmetric_window(self):
+        now = 1111111109
+        totp = TOTP(OTK_SECRET, 8, 30)
+        past = totp.generate(now - 60)
+        self.assertEqual(OTPPosition(2, -2),
+                         totp.verify(past, now, past_window=2,
+                                     future_window=0))
+        self.assertEqual(OTPPosition(1, 1),
+                         totp.verify(b'14050471', now, 3, past_window=0))
+        with self.assertRaises(OATHError) as ctx:
+            totp.verify(b'14050471', now, 1, future_window=0)
+        self.assertEqual(OATH_INVALID_OTP, ctx.exception.code)
+        with self.assertRaises(OATHError):
+            totp.verify(past, now, 2, past_window=1)
+        with self.assertRaises(OATHError):
+            totp.verify(b'1405047', now, past_window=1)
+        self.assertEqual(OTPPosition(1, 1),
+                         totp.verify(b'14050471', now, 0, drift=1,
+                                     past_window=0, future_window=1))
+
 
 class OATHTestCase(impl_base.ImplTestMixin, unittest.TestCase):
 
@@ -16,11 +16,16 @@
 
 from __future__ import absolute_import
 
-from .. import qrcode as oath_qrcode
+from .. import _qrencode, cache, qrcode as oath_qrcode
 from .._compat import url_quote
+from .. import uri
 from . import unittest
+import io
 import qrcode
+from qrcode.util import MODE_8BIT_BYTE, QRData
+import subprocess
 import sys
+from xml.dom import minidom
 
 
 skipIfPy32 = unittest.skipIf(sys.version_info[:2] == (3, 2),
@@ -61,3 +66,115 @@ secret={0}&issuer=Example&counter=42\
         img = oath_qrcode.generate('hotp', self.key,
                                    'alice@google.com', 'Example', 42)
         self.assertEqual(expected, list(img.getdata()))
+
+    def test_from_uri(self):
+        builder = uri.URIBuilder('totp', 'Example')
+        oath_uri = builder(self.key, 'alice@google.com')
+        expected = list(qrcode.make(oath_uri).getdata())
+        img = oath_qrcode.from_uri(oath_uri)
+        self.assertEqual(expected, list(img.getdata()))
+
+    def test_render(self):
+        image = oath_qrcode.render('totp', self.key, 'alice@google.com',
+                                   'Example')
+        self.assertEqual('image/png', image.content_type)
+        self.assertTrue(image.data.startswith(b'\x89PNG'))
+        self.assertNotIn(self.secret.decode('ascii'), image.etag)
+        svg = oath_qrcode.render('totp', self.key, 'alice@google.com',
+                                 'Example', image_format='svg')
+        self.assertEqual('image/svg+xml', svg.content_type)
+        self.assertIn(b'<svg', svg.data)
+        self.assertNotEqual(image.etag, svg.etag)
+        with self.assertRaises(ValueError):
+            oath_qrcode.render('totp', self.key, 'alice@google.com',
+                               'Example', image_format='gif')
+
+    def test_render_cached(self):
+        image_cache = cache.enable_qr_image_cache()
+        self.addCleanup(cache.disable_qr_image_cache)
+        image = oath_qrcode.render('totp', self.key, 'alice@google.com',
+                                   'Example', box_size=4)
+        self.assertIs(image, oath_qrcode.render(
+            'totp', self.key, 'alice@google.com', 'Example', box_size=4))
+        other = oath_qrcode.render('totp', self.key, 'alice@google.com',
+                                   'Example', box_size=5)
+        self.assertNotEqual(image.etag, other.etag)
+        self.assertEqual(2, len(image_cache))
+
+    def test_fit_version(self):
+        for length in (1, 14, 15, 100, 500, 2331):
+            qr = qrcode.QRCode()
+            qr.add_data(QRData(b'x' * length, mode=MODE_8BIT_BYTE))
+            self.assertEqual(qr.best_fit(), oath_qrcode.fit_version(length))
+        with self.assertRaises(ValueError):
+            oath_qrcode.fit_version(2332)
+
+    def test_modules(self):
+        oath_uri = uri.generate('totp', self.key, 'alice@google.com',
+                                'Example')
+        qr = qrcode.QRCode()
+        qr.add_data(QRData(oath_uri.encode('utf-8'), mode=MODE_8BIT_BYTE))
+        qr.make(fit=True)
+        self.assertEqual(qr.modules, oath_qrcode.modules(oath_uri))
+
+    def test_modules_versions(self):
+        for error_correction in (qrcode.ERROR_CORRECT_L,
+                                 qrcode.ERROR_CORRECT_H):
+            for version in (1, 7, 40):
+                data = bytes(bytearray(range(256))) * 12
+                data = data[:oath_qrcode._capacities(error_correction)[
+                    version - 1]]
+                qr = qrcode.QRCode(version=version,
+                                   error_correction=error_correction)
+                qr.add_data(QRData(data, mode=MODE_8BIT_BYTE))
+                qr.make(fit=False)
+                self.assertEqual(qr.modules, _qrencode.encode(
+                    data, version, error_correction))
+
+    def test_fast_path_imports(self):
+        script = ('import sys\n'
+                  'from oath_toolkit import qrcode\n'
+                  'qrcode.render("totp", b"key", "alice", "Example")\n'
+                  'qrcode.render("totp", b"key", "alice", "Example", "svg")\n'
+                  'print(sorted(set(["PIL", "qrcode"]) & set(sys.modules)))\n')
+        process = subprocess.Popen([sys.executable, '-c', script],
+                                   stdout=subprocess.PIPE)
+        output = process.communicate()[0]
+        self.assertEqual(0, process.returncode)
+        self.assertEqual(b'[]', output.strip())
+
+    def test_to_png(self):
+        from PIL import Image
+        rows = oath_qrcode.modules(uri.generate('totp', self.key,
+                                                'alice@google.com',
+                                                'Example'))
+        box_size = 3
+        border = 2
+        img = Image.open(io.BytesIO(oath_qrcode.to_png(rows, box_size,
+                                                       border)))
+        width = (len(rows) + 2 * border) * box_size
+        self.assertEqual((width, width), img.size)
+        for y in range(width):
+            for x in range(width):
+                row = y // box_size - border
+                col = x // box_size - border
+                dark = (0 <= row < len(rows) and 0 <= col < len(rows) and
+                        rows[row][col])
+                self.assertEqual(0 if dark else 1,
+                                 bool(img.getpixel((x, y))))
+
+    def test_to_svg(self):
+        rows = [[True, True, False], [False, True, False], [True] * 3]
+        svg = minidom.parseString(oath_qrcode.to_svg(rows, 5, 1))
+        root = svg.documentElement
+        self.assertEqual('25', root.getAttribute('width'))
+        self.assertEqual('0 0 5 5', root.getAttribute('viewBox'))
+        path = root.getElementsByTagName('path')[0].getAttribute('d')
+        self.assertEqual('M1 1h2v1h-2zM2 2h1v1h-1zM1 3h3v1h-3z', path)
+
+    def test_render_image_factory(self):
+        from qrcode.image.svg import SvgImage
+        image = oath_qrcode.render('totp', self.key, 'alice@google.com',
+                                   'Example', image_format='svg',
+                                   image_factory=SvgImage)
+        self.assertIn(b'svg:rect', image.data)
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2015 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from ..replay import ReplayStore
+from . import unittest
+from .test_cache import FakeTimer
+
+
+class ReplayStoreTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.timer = FakeTimer(1000)
+        self.store = ReplayStore(slots=4, resolution=30, timer=self.timer)
+
+    def test_replay(self):
+        self.assertTrue(self.store.accept(b'alice', 33, 1050))
+        self.assertFalse(self.store.accept(b'alice', 33, 1050))
+        self.assertTrue(self.store.accept(b'alice', 34, 1080))
+        self.assertTrue(self.store.accept(b'bob', 33, 1050))
+        self.assertIn((b'alice', 33), self.store)
+        self.assertEqual(3, len(self.store))
+
+    def test_expiry(self):
+        self.store.accept(b'alice', 33, 1050)
+        self.store.accept(b'alice', 34, 1080)
+        self.timer.now = 1049
+        self.assertIn((b'alice', 33), self.store)
+        self.timer.now = 1050
+        self.assertNotIn((b'alice', 33), self.store)
+        self.assertIn((b'alice', 34), self.store)
+        self.assertTrue(self.store.accept(b'alice', 33, 1050))
+        self.store.accept(b'alice', 35, 1110)
+        self.timer.now = 5000  # past the whole wheel
+        self.assertNotIn((b'alice', 35), self.store)
+        self.assertEqual(0, len(self.store))
+
+    def test_already_expired(self):
+        self.assertTrue(self.store.accept(b'alice', 30, 990))
+        self.assertTrue(self.store.accept(b'alice', 30, 990))
+        self.assertEqual(0, len(self.store))
+
+    def test_beyond_span(self):
+        with self.assertRaises(ValueError):
+            self.store.accept(b'alice', 40, 1200)
+
+    def test_maxsize(self):
+        store = ReplayStore(slots=4, resolution=30, maxsize=2,
+                            timer=self.timer)
+        store.accept(b'alice', 34, 1080)
+        store.accept(b'bob', 33, 1050)
+        store.accept(b'carol', 34, 1080)
+        self.assertEqual(2, len(store))
+        self.assertEqual(1, store.evictions)
+        self.assertNotIn((b'bob', 33), store)
+
+    def test_accept_totp(self):
+        # now = 1000 is in step 33; with a window of 1, the OTP of step 34 is
+        # valid until the end of step 35.
+        self.assertTrue(self.store.accept_totp(b'alice', 1, 1000, 30, 0, 1))
+        self.assertFalse(self.store.accept_totp(b'alice', 0, 1020, 30, 0, 1))
+        self.timer.now = 1079
+        self.assertIn((b'alice', 34), self.store)
+        self.timer.now = 1080
+        self.assertNotIn((b'alice', 34), self.store)
@@ -16,7 +16,9 @@
 
 from .. import uri
 from .._compat import url_quote
+from ..types import OTPAuthURI
 from . import unittest
+import io
 
 
 class URITestCase(unittest.TestCase):
@@ -45,3 +47,65 @@ secret={0}&issuer=Example&counter=42\
         actual = uri.generate('hotp', self.key, 'alice@google.com',
                               'Example', 42)
         self.assertEqual(expected, actual)
+
+    def test_builder(self):
+        build = uri.URIBuilder('totp', 'Example Co')
+        for user in ('alice@google.com', 'bob'):
+            self.assertEqual(uri.generate('totp', self.key, user,
+                                          'Example Co'),
+                             build(self.key, user))
+        build = uri.URIBuilder('hotp', 'Example')
+        with self.assertRaises(ValueError):
+            build(self.key, 'alice@google.com')
+        self.assertEqual(uri.generate('hotp', self.key, 'alice@google.com',
+                                      'Example', 42),
+                         build(self.key, 'alice@google.com', 42))
+
+    def test_parse(self):
+        self.assertEqual(
+            OTPAuthURI('totp', self.key, 'alice@google.com', 'Example', 6, 30,
+                       None),
+            uri.parse(uri.generate('totp', self.key, 'alice@google.com',
+                                   'Example')))
+        self.assertEqual(
+            OTPAuthURI('hotp', self.key, 'alice', None, 8, None, 42),
+            uri.parse('otpauth://HOTP/alice?secret=jbswy3dpehpk3pxp'
+                      '&counter=42&digits=8&algorithm=sha1'))
+        self.assertEqual(
+            OTPAuthURI('totp', self.key, 'alice', 'ACME Co', 6, 60, None),
+            uri.parse(b'otpauth://totp/ACME%20Co:%20alice'
+                      b'?secret=JBSWY3DPEHPK3PXP&period=60'))
+
+    def test_parse_invalid(self):
+        for oath_uri in [
+            'http://totp/alice?secret=JBSWY3DPEHPK3PXP',
+            'otpauth://motp/alice?secret=JBSWY3DPEHPK3PXP',
+            'otpauth://totp/alice',
+            'otpauth://totp/alice?secret=JBSWY3DPEHPK3PX1',
+            'otpauth://totp/alice?secret=JBSWY3DPEHPK3PXP&algorithm=SHA256',
+            'otpauth://totp/alice?secret=JBSWY3DPEHPK3PXP&digits=10',
+            'otpauth://totp/alice?secret=JBSWY3DPEHPK3PXP&digits=six',
+            'otpauth://totp/alice?secret=JBSWY3DPEHPK3PXP&period=0',
+            'otpauth://hotp/alice?secret=JBSWY3DPEHPK3PXP',
+            'otpauth://hotp/alice?secret=JBSWY3DPEHPK3PXP&counter=-1',
+        ]:
+            with self.assertRaises(ValueError):
+                uri.parse(oath_uri)
+
+    def test_iter_parse(self):
+        stream = io.StringIO(u'''\
+# exported tokens
+otpauth://totp/Example:alice?secret=JBSWY3DPEHPK3PXP
+
+otpauth://totp/Example:bob?secret=INVALID!
+otpauth://hotp/Example:carol?secret=JBSWY3DPEHPK3PXP&counter=3
+''')
+        errors = []
+        parsed = list(uri.iter_parse(stream, lambda *args:
+                                     errors.append(args[:2])))
+        self.assertEqual(['alice', 'carol'], [p.user for p in parsed])
+        self.assertEqual(
+            [(4, 'otpauth://totp/Example:bob?secret=INVALID!')], errors)
+        stream.seek(0)
+        with self.assertRaises(ValueError):
+            list(uri.iter_parse(stream))
@@ -17,7 +17,9 @@
 from __future__ import absolute_import
 
 from . import unittest
+from .. import wtforms as oath_wtforms
 from .._compat import to_bytes
+from ..replay import ReplayStore
 from ..wtforms import HOTPValidator, TOTPValidator
 from time import time
 from wtforms import ValidationError
@@ -51,6 +53,17 @@ class DummyField(object):
         return self._translations.gettext(string)
 
 
+class FrozenTime(object):
+
+    """Stands in for the :mod:`time` module, at a fixed timestamp."""
+
+    def __init__(self, now):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
 class WTFormsTestCase(unittest.TestCase):
 
     def setUp(self):
@@ -74,6 +87,39 @@ class WTFormsTestCase(unittest.TestCase):
                                        time_step_size=300)
         self.assert_validations(totp_validator)
 
+    def freeze_time(self, now):
+        """Fix the time used by the validators, so that no step rolls over."""
+        self.addCleanup(setattr, oath_wtforms, 'time', oath_wtforms.time)
+        oath_wtforms.time = FrozenTime(now)
+
+    def test_totp_replay(self):
+        now = 1111111109
+        self.freeze_time(now)
+        digits = 6
+        totp_validator = TOTPValidator(digits, 0, verbose_errors=True,
+                                       replay_store=ReplayStore(
+                                           timer=lambda: now))
+        secret = DummyUser.oath_secret
+        otp = totp_validator.oath.totp_generate(secret, now, 30, 0, digits)
+        self.assert_validation_passes(totp_validator, otp)
+        with self.assertRaises(ValidationError) as ctx:
+            self.validate_value(totp_validator, otp)
+        self.assertIn(u'replayed', str(ctx.exception))
+
+    def test_totp_drift(self):
+        now = 1111111109
+        self.freeze_time(now)
+        digits = 6
+        drifts = {}
+        totp_validator = TOTPValidator(
+            digits, 1, get_drift=lambda fm, fd: drifts.get('drift', 0),
+            set_drift=lambda fm, fd, drift: drifts.update(drift=drift))
+        secret = DummyUser.oath_secret
+        otp = totp_validator.oath.totp_generate(secret, now - 30, 30, 0,
+                                                digits)
+        self.assert_validation_passes(totp_validator, otp)
+        self.assertEqual({'drift': -1}, drifts)
+
     def validate_value(self, validator, value):
         return validator(self.form, DummyField(value))
 
@@ -17,3 +17,13 @@
 from collections import namedtuple
 
 OTPPosition = namedtuple('OTPPosition', ['absolute', 'relative'])
+CacheStats = namedtuple('CacheStats', ['hits', 'misses', 'evictions', 'size',
+                                       'maxsize'])
+EnrollmentStats = namedtuple('EnrollmentStats', ['count', 'bytes', 'elapsed',
+                                                 'rate'])
+QRImage = namedtuple('QRImage', ['data', 'content_type', 'etag'])
+OTPAuthURI = namedtuple('OTPAuthURI', ['key_type', 'secret', 'user', 'issuer',
+                                       'digits', 'period', 'counter'])
+Capabilities = namedtuple('Capabilities', [
+    'backend', 'version', 'version_info', 'base32_decode', 'totp_validate2',
+    'algorithms'])
@@ -14,10 +14,60 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from ._compat import url_quote
+from . import base32
+from ._compat import url_quote, url_unquote
+from .exc import OATHError
+from .types import OTPAuthURI
 from base64 import b32encode
 
 URI = 'otpauth://{key_type}/{issuer}:{user}?secret={secret}&issuer={issuer}'
+SCHEME = 'otpauth://'
+KEY_TYPES = ('hotp', 'totp')
+DEFAULT_DIGITS = 6
+DEFAULT_PERIOD = 30
+
+
+class URIBuilder(object):
+    """
+    Generate URIs suitable for Google Authenticator, for many users of the
+    same issuer.
+
+    The parts of the URI which only depend on the key type and the issuer are
+    quoted and formatted once, when the builder is created.
+
+    :param str key_type: the auth type, either ``totp`` or ``hotp``
+    :param str issuer: issuer name
+    """
+
+    def __init__(self, key_type, issuer):
+        self.key_type = key_type
+        self.issuer = issuer
+        quoted_issuer = url_quote(issuer)
+        self._prefix = 'otpauth://{0}/{1}:'.format(url_quote(key_type),
+                                                   quoted_issuer)
+        self._suffix = '&issuer=' + quoted_issuer
+        self._counter_required = key_type == 'hotp'
+
+    def __call__(self, key, user, counter=None):
+        """
+        Generate a URI.
+
+        :param str key: the secret key
+        :param str user: the username
+        :param counter: initial counter value (HOTP only)
+        :type counter: :func:`int` or :data:`None`
+        :returns: a URI
+        :rtype: :func:`str`
+        """
+        if counter is None:
+            if self._counter_required:
+                raise ValueError(
+                    'Using the key_type "hotp" requires a counter')
+            suffix = self._suffix
+        else:
+            suffix = self._suffix + '&counter=' + url_quote(str(counter))
+        return (self._prefix + url_quote(user) + '?secret=' +
+                url_quote(b32encode(key)) + suffix)
 
 
 def generate(key_type, key, user, issuer, counter=None):
@@ -25,6 +75,8 @@ def generate(key_type, key, user, issuer, counter=None):
     Generate a URI suitable for Google Authenticator.
     See: https://code.google.com/p/google-authenticator/wiki/KeyUriFormat
 
+    To generate URIs for many users, use a :class:`URIBuilder`.
+
     :param str key_type: the auth type, either ``totp`` or ``hotp``
     :param str key: the secret key
     :param str user: the username
@@ -34,21 +86,119 @@ def generate(key_type, key, user, issuer, counter=None):
     :returns: a URI
     :rtype: :func:`str`
     """
-    if key_type == 'hotp' and counter is None:
-        raise ValueError('Using the key_type "hotp" requires a counter')
-    secret = b32encode(key)
-    keys = [
-        'key_type',
-        'issuer',
-        'user',
-        'secret',
-    ]
-    tpl = str(URI)
-    if counter is not None:
-        counter = str(counter)
-        keys.append('counter')
-        tpl += '&counter={counter}'
-    l = locals()
-    params = dict([(k, url_quote(l[k]))
-                   for k in keys])
-    return tpl.format(**params)
+    return URIBuilder(key_type, issuer)(key, user, counter)
+
+
+def _decode_secret(secret):
+    """
+    Decode a Base32 secret, which may be lowercase and/or lack its padding.
+    """
+    try:
+        return base32.decode(secret.encode('ascii'))
+    except (OATHError, UnicodeEncodeError):
+        raise ValueError('Invalid Base32 secret')
+
+
+def _parse_int(params, name, default):
+    value = params.get(name)
+    if value is None:
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        value = -1
+    if value < 0:
+        raise ValueError('Invalid {0}: {1!r}'.format(name, params[name]))
+    return value
+
+
+def _parse_query(query):
+    params = {}
+    for param in query.split('&'):
+        name, _, value = param.partition('=')
+        if name:
+            params[name.lower()] = url_unquote(value)
+    return params
+
+
+def _parse_label(label, params):
+    """Split the label into the username and the issuer name."""
+    label = url_unquote(label)
+    issuer, sep, user = label.partition(':')
+    if sep:
+        user = user.lstrip()
+    else:
+        issuer, user = None, label
+    return user, params.get('issuer', issuer)
+
+
+def parse(oath_uri):
+    """
+    Parse and validate a URI in the Google Authenticator format.
+
+    :param str oath_uri: The URI to parse.
+    :rtype: :class:`oath_toolkit.types.OTPAuthURI`
+    :raise: :class:`ValueError` if the URI is invalid
+    """
+    if isinstance(oath_uri, bytes):
+        oath_uri = oath_uri.decode('utf-8')
+    oath_uri = oath_uri.strip()
+    if not oath_uri.startswith(SCHEME):
+        raise ValueError('Not an otpauth URI: {0!r}'.format(oath_uri))
+    key_type, _, rest = oath_uri[len(SCHEME):].partition('/')
+    key_type = key_type.lower()
+    if key_type not in KEY_TYPES:
+        raise ValueError('Invalid key type: {0!r}'.format(key_type))
+    label, _, query = rest.partition('?')
+    params = _parse_query(query)
+    user, issuer = _parse_label(label, params)
+
+    if 'secret' not in params:
+        raise ValueError('Missing secret')
+    secret = _decode_secret(params['secret'])
+    if params.get('algorithm', 'SHA1').upper() != 'SHA1':
+        raise ValueError('Unsupported algorithm: {0!r}'.format(
+            params['algorithm']))
+    digits = _parse_int(params, 'digits', DEFAULT_DIGITS)
+    if not 6 <= digits <= 8:
+        raise ValueError('Invalid digits: {0!r}'.format(params['digits']))
+    if key_type == 'hotp':
+        counter = _parse_int(params, 'counter', None)
+        if counter is None:
+            raise ValueError('Using the key_type "hotp" requires a counter')
+        period = None
+    else:
+        counter = None
+        period = _parse_int(params, 'period', DEFAULT_PERIOD)
+        if period == 0:
+            raise ValueError('Invalid period: {0!r}'.format(params['period']))
+    return OTPAuthURI(key_type, secret, user, issuer, digits, period, counter)
+
+
+def iter_parse(lines, on_error=None):
+    """
+    Parse and validate URIs in the Google Authenticator format, one per line.
+
+    Blank lines, and lines starting with ``#``, are skipped.
+
+    :param lines: The URIs to parse, e.g. an open file.
+    :type lines: iterable of :func:`str` or :func:`bytes`
+    :param on_error: If set, called with the line number (starting at ``1``),
+                     the line and the :class:`ValueError` for each invalid
+                     URI, which is then skipped. Otherwise, the
+                     :class:`ValueError` is raised.
+    :type on_error: callable
+    :rtype: iterator of :class:`oath_toolkit.types.OTPAuthURI`
+    """
+    for lineno, line in enumerate(lines, 1):
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        try:
+            yield parse(line)
+        except ValueError as e:
+            if on_error is None:
+                raise
+            on_error(lineno, line, e)
@@ -21,9 +21,9 @@
 
 from __future__ import absolute_import
 
-from . import OATH
+from . import OATH, cache
 from ._compat import to_bytes
-from .exc import OATHError
+from .exc import OATH_REPLAYED_OTP, OATHError
 from abc import ABCMeta, abstractmethod
 import time
 from wtforms import ValidationError
@@ -69,10 +69,11 @@ class OTPValidator(object):
     @abstractmethod
     def otp_validate(self, form, field):
         """
-        This should call the appropriate OTP validation method.
+        This should call the appropriate non-raising OTP validation method.
 
-        :return: :data:`True` on success
-        :raises: :class:`OATHError` on failure
+        :return: The position in the OTP window on success, or a negative
+                 ``oath_rc`` error code on failure.
+        :rtype: int
         """
         raise NotImplementedError
 
@@ -90,10 +91,15 @@ class OTPValidator(object):
             msg = self._error_msg(field, u'OTP must be {digits} digits.')
             raise ValidationError(msg.format(digits=self.digits))
         try:
-            self.otp_validate(form, field)
-        except OATHError as e:
-            msg = self._error_msg(field, u'Error validating OTP: {err}')
-            raise ValidationError(msg.format(err=str(e)))
+            retval = self.otp_validate(form, field)
+        except OATHError as e:  # validators which raise on failure
+            err = str(e)
+        else:
+            if retval is None or retval >= 0:
+                return
+            err = self.oath.strerror(retval).decode('utf-8')
+        msg = self._error_msg(field, u'Error validating OTP: {err}')
+        raise ValidationError(msg.format(err=err))
 
 
 class HOTPValidator(OTPValidator):
@@ -118,9 +124,9 @@ class HOTPValidator(OTPValidator):
         self.start_moving_factor = start_moving_factor
 
     def otp_validate(self, form, field):
-        self.oath.hotp_validate(self.get_oath_secret(form, field),
-                                self.start_moving_factor, self.window,
-                                to_bytes(field.data))
+        return self.oath.try_hotp_validate(self.get_oath_secret(form, field),
+                                           self.start_moving_factor,
+                                           self.window, to_bytes(field.data))
 
 
 class TOTPValidator(OTPValidator):
@@ -138,16 +144,51 @@ class TOTPValidator(OTPValidator):
                            time steps (usually should be ``0``).
     :param int time_step_size: Unsigned, the time step system parameter. If
                                set to a negative value, defaults to ``30``.
+    :param replay_store: If specified, rejects OTPs that were already accepted.
+    :type replay_store: :class:`oath_toolkit.replay.ReplayStore`
+    :param callable get_device_id: If specified, a callable which returns the
+                                   identifier of the device in the replay
+                                   store. Defaults to the fingerprint of the
+                                   secret.
+    :param callable get_drift: If specified, a callable which returns the
+                               device's clock drift (in time steps) recorded
+                               by ``set_drift``. That time step is tested
+                               first, before the rest of the window.
+    :param callable set_drift: If specified, a callable which records the
+                               device's clock drift, called as
+                               ``set_drift(form, field, drift)`` when it
+                               changes.
     """
 
     def __init__(self, digits, window, verbose_errors=False, get_secret=None,
-                 start_time=0, time_step_size=30):
+                 start_time=0, time_step_size=30, replay_store=None,
+                 get_device_id=None, get_drift=None, set_drift=None):
         super(TOTPValidator, self).__init__(digits, window, verbose_errors,
                                             get_secret)
         self.start_time = int(start_time)
         self.time_step_size = time_step_size
+        self.replay_store = replay_store
+        self.get_device_id = get_device_id
+        self.get_drift = get_drift
+        self.set_drift = set_drift
 
     def otp_validate(self, form, field):
-        self.oath.totp_validate(self.get_oath_secret(form, field), time.time(),
-                                self.time_step_size, self.start_time,
-                                self.window, to_bytes(field.data))
+        secret = self.get_oath_secret(form, field)
+        now = time.time()
+        drift = self.get_drift(form, field) if self.get_drift else 0
+        retval, otp_pos = self.oath.try_totp_validate(
+            secret, now, self.time_step_size, self.start_time, self.window,
+            to_bytes(field.data), drift)
+        if retval >= 0 and self.replay_store is not None:
+            if self.get_device_id:
+                device_id = self.get_device_id(form, field)
+            else:
+                device_id = cache.fingerprint(secret)
+            if not self.replay_store.accept_totp(device_id, otp_pos, now,
+                                                 self.time_step_size,
+                                                 self.start_time,
+                                                 self.window):
+                return OATH_REPLAYED_OTP
+        if retval >= 0 and self.set_drift and otp_pos != drift:
+            self.set_drift(form, field, otp_pos)
+        return retval
@@ -42,9 +42,15 @@ try:
     from Cython.Build import cythonize
 except ImportError:
     cythonize = None
+try:
+    import cffi
+except ImportError:
+    cffi = None
 from functools import partial
 from platform import python_implementation
 import re
+import shutil
+import tempfile
 from setuptools import find_packages, setup
 from setuptools.extension import Extension
 
@@ -98,6 +104,52 @@ def liboath_version():
     check_version.restype = ctypes.c_char_p
     return tuple(int(x) for x in check_version(b'0').split(b'.'))
 
+OPENMP_TEST_PROGRAM = '''\
+#include <omp.h>
+int main(void) { return omp_get_max_threads() > 0 ? 0 : 1; }
+'''
+
+
+def openmp_args():
+    """
+    Determine the compiler and linker flags which enable OpenMP, by compiling
+    and linking a test program. Returns empty lists if the compiler does not
+    support OpenMP (e.g. Apple clang).
+    """
+    from distutils.ccompiler import new_compiler
+    from distutils.errors import CCompilerError, DistutilsError
+    from distutils.sysconfig import customize_compiler
+    compiler = new_compiler()
+    customize_compiler(compiler)
+    if compiler.compiler_type == 'msvc':
+        compile_args, link_args = ['/openmp'], []
+    else:
+        compile_args, link_args = ['-fopenmp'], ['-fopenmp']
+    tmp_dir = tempfile.mkdtemp()
+    source = os.path.join(tmp_dir, 'openmp_test.c')
+    with open(source, 'w') as f:
+        f.write(OPENMP_TEST_PROGRAM)
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    saved_fds = os.dup(1), os.dup(2)
+    try:
+        # Hide the compiler's error output, which is expected on failure.
+        os.dup2(devnull, 1)
+        os.dup2(devnull, 2)
+        objects = compiler.compile([source], output_dir=tmp_dir,
+                                   extra_postargs=compile_args)
+        compiler.link_executable(objects, 'openmp_test', output_dir=tmp_dir,
+                                 extra_postargs=link_args)
+    except (CCompilerError, DistutilsError, OSError):
+        return [], []
+    finally:
+        os.dup2(saved_fds[0], 1)
+        os.dup2(saved_fds[1], 2)
+        for fd in saved_fds + (devnull,):
+            os.close(fd)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return compile_args, link_args
+
+
 with utf8_open(os.path.join(THIS_DIR, 'README.rst')) as f:
     long_description = f.read()
 
@@ -115,7 +167,7 @@ attrs = dict(name='pyoath-toolkit',
              author='Mark Lee',
              author_email='pyoath-toolkit.no.spam@lazymalevolence.com',
              url='https://pyoath-toolkit.readthedocs.org/',
-             packages=find_packages(),
+             packages=find_packages(exclude=['benchmarks']),
              install_requires=requires,
              extras_require=extra_req,
              zip_safe=False,
@@ -126,11 +178,24 @@ sans_cython_flag_exists = SANS_CYTHON_FLAG in sys.argv
 with_cython = (python_implementation() != 'PyPy' and
                not sans_cython_flag_exists and
                not READTHEDOCS)
+# OpenMP is used by the bulk OTP generators in the Cython extension, if the
+# compiler supports it. Without it, the prange loops compile to serial loops:
+# they still work, but only use a single core.
+SANS_OPENMP_FLAG = '--without-openmp'
+with_openmp = SANS_OPENMP_FLAG not in sys.argv
+if not with_openmp:
+    sys.argv.remove(SANS_OPENMP_FLAG)
 if with_cython:
     src_ext = 'pyx' if cythonize else 'c'
+    if with_openmp:
+        openmp_compile_args, openmp_link_args = openmp_args()
+    else:
+        openmp_compile_args, openmp_link_args = [], []
     ext = Extension('oath_toolkit.impl_cython',
                     ['oath_toolkit/impl_cython.{0}'.format(src_ext)],
-                    libraries=['oath'])
+                    libraries=['oath'],
+                    extra_compile_args=openmp_compile_args,
+                    extra_link_args=openmp_link_args)
     if cythonize:
         cy_kwargs = {
             'compile_time_env': {
@@ -144,4 +209,13 @@ if with_cython:
 elif sans_cython_flag_exists:
     sys.argv.remove(SANS_CYTHON_FLAG)
 
+# The CFFI extension module is built in API mode (out-of-line), which is
+# faster than loading liboath at runtime in ABI mode.
+SANS_CFFI_API_FLAG = '--without-cffi-api'
+sans_cffi_api_flag_exists = SANS_CFFI_API_FLAG in sys.argv
+if cffi and not sans_cffi_api_flag_exists and not READTHEDOCS:
+    attrs['cffi_modules'] = ['oath_toolkit/_cffi_build.py:build_ffi']
+elif sans_cffi_api_flag_exists:
+    sys.argv.remove(SANS_CFFI_API_FLAG)
+
 setup(**attrs)
@@ -58,6 +58,16 @@ def parse_args(prog, args):
     parser.add_argument('--no-core-tests', dest='core', default=True,
                         action='store_false',
                         help='Disable running core tests')
+    parser.add_argument('--benchmark', action='store_true', default=False,
+                        help='Run the benchmarks after the tests')
+    parser.add_argument('--benchmark-output', metavar='FILE',
+                        help='Write the benchmark results (JSON) to FILE')
+    parser.add_argument('--benchmark-baseline', metavar='FILE',
+                        help='Fail if the benchmarks regressed compared to '
+                             'the results in FILE')
+    parser.add_argument('--benchmark-threshold', type=float, default=0.2,
+                        help='Tolerated slowdown compared to the baseline '
+                             '(default: %(default)s)')
     if argcomplete:
         argcomplete.autocomplete(parser)
     return parser.parse_args(args)
@@ -80,6 +90,16 @@ def run_core_tests(verbosity):
         return 1
 
 
+def run_benchmarks(prog, args):
+    from oath_toolkit.tests import benchmark
+    argv = [prog, '--threshold', str(args.benchmark_threshold)]
+    if args.benchmark_output:
+        argv.extend(['--output', args.benchmark_output])
+    if args.benchmark_baseline:
+        argv.extend(['--baseline', args.benchmark_baseline])
+    return benchmark.main(argv)
+
+
 def run_django_testrunner(prog, verbosity):
     # django_otp unit tests need to be run via Django's testrunner
     sys.path.append(THIS_DIR)
@@ -116,6 +136,9 @@ def main(argv):
 
     if args.django:
         run_django_testrunner(prog, verbosity)
+
+    if args.benchmark:
+        return run_benchmarks(prog, args)
     return 0
 
 if __name__ == '__main__':